@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,7 +12,25 @@ celery_app = Celery(
     backend=os.getenv("REDIS_BROKER_URL")
 )
 
+# Chroma's PersistentClient is not safe with several processes writing to
+# one store, so every task that writes to Chroma goes to this queue, which
+# is served by a single-process worker (celery_chroma_writer in
+# docker-compose.yml). Parsing, splitting, planning and batch embedding
+# of parallel ingestion only read Chroma and stay on the default pool.
+CHROMA_WRITE_QUEUE = os.getenv("CHROMA_WRITE_QUEUE", "chroma_writes")
+
 celery_app.conf.task_routes = {
-    "app.worker.process_and_embed_document": {"queue": "default"}
+    "finalize_document_ingestion": {"queue": CHROMA_WRITE_QUEUE},
+    "embed_document_on_writer": {"queue": CHROMA_WRITE_QUEUE},
+    "process_bulk_upload": {"queue": CHROMA_WRITE_QUEUE},
 }
 
+# Run by `celery beat` (the celery_beat service in docker-compose.yml)
+celery_app.conf.beat_schedule = {
+    "maintain-chat-history": {
+        "task": "maintain_chat_history",
+        "schedule": crontab(
+            hour=int(os.getenv("CHATLOG_MAINTENANCE_HOUR", "3")), minute=0
+        ),
+    },
+}
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+import time
+
+from redis.exceptions import RedisError
+
+from app.redis_client import get_async_redis, get_redis
+
+
+PROGRESS_KEY_PREFIX = "ingest_progress:"
+PROGRESS_TTL = 7 * 24 * 3600
+TERMINAL_STATES = ("completed", "failed")
+# Counters and timestamps written by the workers; every other field (user
+# id, file name, `file:<name>` summaries) is returned as the string stored
+INT_FIELDS = frozenset({
+    "pages", "chunks", "new", "skipped", "removed",
+    "total_batches", "done_batches", "failed_batches",
+    "files", "files_done", "files_failed", "files_skipped", "written_chunks",
+    "version", "started_at", "updated_at",
+})
+
+
+def _key(job_id: str) -> str:
+    return f"{PROGRESS_KEY_PREFIX}{job_id}"
+
+
+def progress_channel(job_id: str) -> str:
+    """
+    Pub/sub channel on which every change to a job's progress is announced.
+    """
+    return f"{PROGRESS_KEY_PREFIX}{job_id}:events"
+
+
+def _record(job_id: str, update, fields: dict):
+    # Every write bumps `version`, so readers can tell whether anything
+    # changed since their last snapshot, and is announced on the channel
+    now = int(time.time())
+    key = _key(job_id)
+    try:
+        pipe = get_redis().pipeline()
+        update(pipe, key)
+        pipe.hsetnx(key, "started_at", now)
+        pipe.hset(key, "updated_at", now)
+        pipe.hincrby(key, "version", 1)
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.publish(progress_channel(job_id), json.dumps(fields))
+        return pipe.execute()[0]
+    except RedisError as e:
+        logging.warning(f"[{job_id}] Could not record progress: {e}")
+        return None
+
+
+def set_progress(job_id: str, **fields):
+    """
+    Set fields of an ingestion job's progress record.
+    """
+    mapping = {k: str(v) for k, v in fields.items()}
+    _record(job_id, lambda pipe, key: pipe.hset(key, mapping=mapping), mapping)
+
+
+def increment_progress(job_id: str, field: str, amount: int = 1):
+    """
+    Atomically increment a counter of an ingestion job's progress record.
+
+    Returns:
+        int: The new value, or None if Redis is unreachable.
+    """
+    value = _record(
+        job_id, lambda pipe, key: pipe.hincrby(key, field, amount), {field: f"+{amount}"}
+    )
+    return int(value) if value is not None else None
+
+
+def _decode(raw: dict):
+    if not raw:
+        return None
+
+    progress = {}
+    for key, value in raw.items():
+        key, value = key.decode(), value.decode()
+        progress[key] = int(value) if key in INT_FIELDS else value
+
+    # Derived fields: completion and a linear ETA over embedded batches
+    done, total = progress.get("done_batches"), progress.get("total_batches")
+    if isinstance(done, int) and isinstance(total, int) and total:
+        progress["percent"] = round(100 * done / total, 1)
+        elapsed = progress.get("updated_at", 0) - progress.get("started_at", 0)
+        if done and progress.get("state") not in TERMINAL_STATES:
+            progress["eta_seconds"] = round(elapsed * (total - done) / done, 1)
+    return progress
+
+
+def get_progress(job_id: str):
+    """
+    Return an ingestion job's progress record, or None if there is none.
+    Counter and timestamp fields (INT_FIELDS) are returned as ints; `percent` and `eta_seconds` are
+    added once the number of batches is known.
+    """
+    try:
+        raw = get_redis().hgetall(_key(job_id))
+    except RedisError as e:
+        logging.warning(f"[{job_id}] Could not read progress: {e}")
+        return None
+    return _decode(raw)
+
+
+async def aget_progress(job_id: str):
+    """
+    Async version of `get_progress`, for the API's event loop.
+    """
+    try:
+        raw = await get_async_redis().hgetall(_key(job_id))
+    except RedisError as e:
+        logging.warning(f"[{job_id}] Could not read progress: {e}")
+        return None
+    return _decode(raw)
+
+
+async def iter_progress_updates(job_id: str, since: int = 0, timeout: float = None):
+    """
+    Yield progress snapshots of a job as they change.
+
+    The first snapshot newer than version `since` is yielded right away;
+    after that a snapshot is yielded whenever the worker announces a change.
+    Yields None when `timeout` seconds pass without a change, and stops
+    after a terminal state.
+    """
+    pubsub = get_async_redis().pubsub()
+    # Subscribe before reading, so no change between the two is missed
+    await pubsub.subscribe(progress_channel(job_id))
+    try:
+        progress = await aget_progress(job_id)
+        if progress and progress.get("version", 0) > since:
+            yield progress
+            since = progress["version"]
+            if progress.get("state") in TERMINAL_STATES:
+                return
+
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = loop.time() + timeout if timeout else None
+            message = None
+            while message is None and (deadline is None or loop.time() < deadline):
+                remaining = deadline - loop.time() if deadline else 1.0
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=max(remaining, 0.0)
+                )
+            if message is None:
+                yield None
+                continue
+
+            progress = await aget_progress(job_id)
+            if progress and progress.get("version", 0) > since:
+                yield progress
+                since = progress["version"]
+                if progress.get("state") in TERMINAL_STATES:
+                    return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -1,10 +1,38 @@
 import os
 import traceback
 import logging
-import json
+import uuid
+
+from celery import chord
+from celery.signals import worker_process_init
 
 from app.celery.celery_app import celery_app
-from app.utility.embedder import embed_single_file_into_chroma
+from app.celery.progress import increment_progress, set_progress
+from app.utility.embedder import (
+    add_embedded_chunks,
+    assign_chunk_ids,
+    delete_chunks,
+    embed_single_file_into_chroma,
+    embedding_model,
+    get_collection_if_exists,
+    get_or_create_collection,
+    load_and_clean_documents,
+    plan_chunk_sync,
+    split_documents,
+)
+from app.utility.bulk_ingestion import ingest_files, iter_archive_files
+from app.utility.chat_history_retention import archive_expired_partitions, ensure_partitions
+from app.utility.collection_versions import bump_collection_version
+from app.utility.ingestion_staging import (
+    discard_staged_job,
+    load_batch_embeddings,
+    load_chunk_batch,
+    load_job_manifest,
+    save_batch_embeddings,
+    save_job_manifest,
+    stage_chunk_batches,
+)
+from app.utility.streaming_ingestion import stream_file_into_chroma
 
 
 logging.basicConfig(
@@ -13,41 +41,382 @@ logging.basicConfig(
 )
 
 
-@celery_app.task(name="process_and_embed_document")
-def process_and_embed_document(file_path: str, user_id: str):
+PERSIST_DIR = "app/document_embedding/legal_chroma_db"
+WORKER_PREWARM = os.getenv("WORKER_PREWARM", "true").lower() == "true"
+# "parallel" parses the file and fans chunk batches out to the worker pool,
+# and only the final write runs on the Chroma writer queue; "serial" embeds
+# the whole file inside one task, and "streaming" as a page-by-page
+# pipeline with bounded memory, both on the writer queue because they
+# write to Chroma as they go
+INGESTION_MODE = os.getenv("INGESTION_MODE", "parallel").lower()
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "64"))
+BATCH_MAX_RETRIES = int(os.getenv("INGESTION_BATCH_MAX_RETRIES", "2"))
+
+
+@worker_process_init.connect
+def prewarm_embedding_model(**kwargs):
+    """
+    Load the embedding model when a worker process starts rather than in
+    the first task it runs.
+    """
+    if WORKER_PREWARM:
+        embedding_model.encode(["warm up"])
+
+
+def _fail(job_id: str, user_id: str, error: Exception):
+    logging.error(f"[{user_id}] Embedding failed: {str(error)}")
+    traceback.print_exc()
+
+    set_progress(job_id, state="failed", error=str(error))
+    return {"status": "error", "error": str(error)}
+
+
+@celery_app.task(name="process_and_embed_document", bind=True)
+def process_and_embed_document(self, file_path: str, user_id: str):
     """
     Celery task to embed a single file into Chroma vector store for a specific user.
-    Logs status and writes a `.status.json` to track completion.
+    Progress is published to Redis as the file is parsed and embedded.
+
+    In parallel mode the file is parsed, split and diffed against the
+    collection here, on the worker pool; the chunk batches are embedded by
+    `embed_chunk_batch` tasks across the pool, and
+    `finalize_document_ingestion` writes them to Chroma on the writer
+    queue. In serial and streaming mode the file is handed to
+    `embed_document_on_writer`. Progress is recorded in Redis under this
+    task's id in every mode.
     """
-    status_dir = "../status_logs"
-    os.makedirs(status_dir, exist_ok=True)
-    status_path = os.path.join(status_dir, f"{user_id}.status.json")
+    job_id = self.request.id or str(uuid.uuid4())
+    filename = os.path.basename(file_path)
+    set_progress(job_id, state="parsing", user_id=user_id, filename=filename)
+
+    if INGESTION_MODE == "parallel":
+        return _dispatch_parallel_ingestion(job_id, file_path, user_id)
 
+    embed_document_on_writer.delay(job_id, file_path, user_id)
+    return {"status": "dispatched", "job_id": job_id, "filename": filename}
+
+
+@celery_app.task(name="embed_document_on_writer")
+def embed_document_on_writer(job_id: str, file_path: str, user_id: str):
+    """
+    Parse, embed and store a whole file in one task, for the serial and
+    streaming ingestion modes. Runs on the Chroma writer queue, since both
+    write to the collection while they embed.
+    """
     try:
         logging.info(f"[{user_id}] Starting embedding task for file: {file_path}")
-        result = embed_single_file_into_chroma(
-            file_path=file_path,
+        if INGESTION_MODE == "streaming":
+            result = stream_file_into_chroma(
+                file_path=file_path,
+                user_id=user_id,
+                persist_dir=PERSIST_DIR,
+                batch_size=INGESTION_BATCH_SIZE,
+                progress_callback=lambda counts: set_progress(
+                    job_id, state="embedding", **counts
+                )
+            )
+            logging.info(f"[{user_id}] Stage timings: {result['stage_seconds']}")
+        else:
+            result = embed_single_file_into_chroma(
+                file_path=file_path,
+                user_id=user_id,
+                persist_dir=PERSIST_DIR,
+                progress_callback=lambda fields: set_progress(job_id, **fields)
+            )
+
+        if result["new"] or result["removed"]:
+            # New content invalidates retrievers cached for this user
+            bump_collection_version(f"user_{user_id}")
+
+        # Write success status
+        set_progress(
+            job_id,
+            state="completed",
+            chunks=result["chunks"],
+            new=result["new"],
+            skipped=result["skipped"],
+            removed=result["removed"]
+        )
+
+        logging.info(
+            f"[{user_id}] Embedding completed: {result['new']} new, "
+            f"{result['skipped']} skipped, {result['removed']} removed"
+        )
+        return result
+
+    except Exception as e:
+        return _fail(job_id, user_id, e)
+
+
+def _complete(job_id: str, user_id: str, file_path: str, manifest: dict, new: int):
+    # Removal happens only after new chunks are stored, so a failed upload
+    # never leaves the user with less than they had
+    if manifest["removed_ids"]:
+        delete_chunks(get_or_create_collection(user_id, PERSIST_DIR), manifest["removed_ids"])
+
+    if new or manifest["removed_ids"]:
+        # New content invalidates retrievers cached for this user
+        bump_collection_version(f"user_{user_id}")
+
+    result = {
+        "collection_name": f"user_{user_id}",
+        "chunks": manifest["chunks"],
+        "new": new,
+        "skipped": manifest["skipped"],
+        "removed": len(manifest["removed_ids"]),
+        "filename": os.path.basename(file_path)
+    }
+    set_progress(
+        job_id,
+        state="completed",
+        new=result["new"],
+        skipped=result["skipped"],
+        removed=result["removed"]
+    )
+
+    logging.info(
+        f"[{user_id}] Embedding completed: {result['new']} new, "
+        f"{result['skipped']} skipped, {result['removed']} removed"
+    )
+    return result
+
+
+def _dispatch_parallel_ingestion(job_id: str, file_path: str, user_id: str):
+    try:
+        logging.info(f"[{user_id}] Parsing file for parallel embedding: {file_path}")
+        docs = load_and_clean_documents(file_path)
+        chunks = split_documents(docs)
+        if not chunks:
+            raise ValueError(f"No usable chunks created from: {file_path}")
+
+        chunks, ids = assign_chunk_ids(chunks, file_path)
+        # Read-only, so it runs here rather than on the writer queue
+        plan = plan_chunk_sync(
+            get_collection_if_exists(user_id, PERSIST_DIR), chunks, ids, file_path
+        )
+        manifest = {
+            "chunks": len(chunks),
+            "skipped": plan["skipped"],
+            "removed_ids": plan["removed_ids"]
+        }
+        if not plan["new_chunks"] and not plan["removed_ids"]:
+            # Unchanged file, nothing to write
+            return _complete(job_id, user_id, file_path, manifest, new=0)
+
+        save_job_manifest(job_id, manifest)
+        if not plan["new_chunks"]:
+            # Removing stale chunks is a write, so it goes to the writer queue
+            finalize_document_ingestion.delay([], job_id, file_path, user_id)
+            return {
+                "status": "dispatched",
+                "job_id": job_id,
+                "chunks": len(chunks),
+                "new": 0,
+                "skipped": plan["skipped"],
+                "batches": 0,
+                "filename": os.path.basename(file_path)
+            }
+
+        total_batches = stage_chunk_batches(
+            job_id, plan["new_chunks"], plan["new_ids"], INGESTION_BATCH_SIZE
+        )
+        set_progress(
+            job_id,
+            state="embedding",
+            pages=len(docs),
+            chunks=len(chunks),
+            new=len(plan["new_chunks"]),
+            skipped=plan["skipped"],
+            total_batches=total_batches,
+            done_batches=0,
+            failed_batches=0
+        )
+
+        chord(
+            [embed_chunk_batch.s(job_id, index) for index in range(total_batches)]
+        )(finalize_document_ingestion.s(job_id, file_path, user_id))
+
+        logging.info(
+            f"[{user_id}] Dispatched {total_batches} batches "
+            f"({len(plan['new_chunks'])} new chunks) for {file_path}"
+        )
+        return {
+            "status": "dispatched",
+            "job_id": job_id,
+            "chunks": len(chunks),
+            "new": len(plan["new_chunks"]),
+            "skipped": plan["skipped"],
+            "batches": total_batches,
+            "filename": os.path.basename(file_path)
+        }
+
+    except Exception as e:
+        discard_staged_job(job_id)
+        return _fail(job_id, user_id, e)
+
+
+@celery_app.task(name="embed_chunk_batch", bind=True, max_retries=BATCH_MAX_RETRIES)
+def embed_chunk_batch(self, job_id: str, index: int):
+    """
+    Embed one staged chunk batch with this worker process's preloaded model.
+
+    Failures are retried with backoff; once retries are exhausted the batch
+    is reported as failed instead of raising, so the chord still reaches
+    `finalize_document_ingestion`, which then writes nothing.
+    """
+    try:
+        batch = load_chunk_batch(job_id, index)
+        vectors = embedding_model.encode(
+            [chunk["page_content"] for chunk in batch], use_cache=True
+        )
+        save_batch_embeddings(job_id, index, vectors)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+        logging.error(f"[{job_id}] Batch {index} failed: {str(e)}")
+        increment_progress(job_id, "failed_batches")
+        return {"index": index, "ok": False, "error": str(e)}
+
+    increment_progress(job_id, "done_batches")
+    return {"index": index, "ok": True, "chunks": len(batch)}
+
+
+@celery_app.task(name="finalize_document_ingestion", bind=True)
+def finalize_document_ingestion(self, batch_results, job_id: str, file_path: str, user_id: str):
+    """
+    Write all embedded batches of a document to the user's collection once
+    every batch has succeeded, then clean up the staging area.
+    """
+    try:
+        failed = [r for r in batch_results if not r.get("ok")]
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} of {len(batch_results)} batches failed; "
+                f"nothing was written. First error: {failed[0]['error']}"
+            )
+
+        set_progress(job_id, state="writing")
+        collection = get_or_create_collection(user_id, PERSIST_DIR)
+
+        new = 0
+        for index in sorted(r["index"] for r in batch_results):
+            batch = load_chunk_batch(job_id, index)
+            add_embedded_chunks(
+                collection,
+                texts=[chunk["page_content"] for chunk in batch],
+                metadatas=[chunk["metadata"] for chunk in batch],
+                embeddings=load_batch_embeddings(job_id, index),
+                ids=[chunk["id"] for chunk in batch]
+            )
+            new += len(batch)
+
+        return _complete(job_id, user_id, file_path, load_job_manifest(job_id), new)
+
+    except Exception as e:
+        return _fail(job_id, user_id, e)
+
+    finally:
+        discard_staged_job(job_id)
+
+
+def _bulk_inputs(job_id: str, user_id: str, files, archive_paths, upload_dir: str, extracted):
+    # Archives are extracted lazily, one entry each time the parse pool
+    # asks for another file
+    for file_path, source in files:
+        yield file_path, source
+    for archive_path in archive_paths:
+        entries = iter_archive_files(archive_path, upload_dir, prefix=f"{user_id}_")
+        for entry, path, source, error in entries:
+            if path is None:
+                increment_progress(job_id, "files_skipped")
+                set_progress(job_id, **{f"file:{entry}": f"skipped: {error}"})
+                continue
+            extracted.append(path)
+            yield path, source
+
+
+@celery_app.task(name="process_bulk_upload", bind=True)
+def process_bulk_upload(self, user_id: str, files, archive_paths, upload_dir: str):
+    """
+    Ingest the files and archive entries of one bulk upload as a single job.
+
+    `files` holds [file path, source] pairs: the uniquely named copy of
+    each plain file and the source its chunks are stored under. Files are
+    parsed in parallel and their chunks embedded and written to the user's
+    collection in combined batches (see
+    `app.utility.bulk_ingestion.ingest_files`). Overall counters and one
+    `file:<name>` field per file are recorded in the job's progress record
+    under this task's id. The copies, archives and extracted entries are
+    deleted once processed.
+    """
+    job_id = self.request.id or str(uuid.uuid4())
+    set_progress(
+        job_id,
+        state="embedding",
+        user_id=user_id,
+        files_done=0,
+        files_failed=0,
+        files_skipped=0,
+        written_chunks=0
+    )
+
+    def on_file(source, state, details):
+        name = os.path.basename(source)
+        increment_progress(job_id, "files_failed" if state == "failed" else "files_done")
+        summary = details.get("error") or (
+            f"{details['new']} new, {details['skipped']} skipped of {details['chunks']} chunks"
+        )
+        set_progress(job_id, **{f"file:{name}": f"{state}: {summary}"})
+
+    extracted = []
+    try:
+        logging.info(
+            f"[{user_id}] Starting bulk ingestion of {len(files)} files "
+            f"and {len(archive_paths)} archives"
+        )
+        totals = ingest_files(
+            _bulk_inputs(job_id, user_id, files, archive_paths, upload_dir, extracted),
             user_id=user_id,
-            persist_dir="app/document_embedding/legal_chroma_db"
+            persist_dir=PERSIST_DIR,
+            on_file=on_file,
+            on_flush=lambda written: set_progress(job_id, written_chunks=written)
         )
 
-        # Write success status
-        with open(status_path, "w") as f:
-            json.dump({"status": "completed", "details": result}, f, indent=2)
+        if totals["new"] or totals["removed"]:
+            # New content invalidates retrievers cached for this user
+            bump_collection_version(f"user_{user_id}")
+
+        result = {"collection_name": f"user_{user_id}", **totals}
+        set_progress(job_id, state="completed", **totals)
 
-        logging.info(f"[{user_id}] Embedding completed: {result['chunks']} chunks embedded")
+        logging.info(
+            f"[{user_id}] Bulk ingestion completed: {totals['files']} files "
+            f"({totals['files_failed']} failed), {totals['new']} new chunks, "
+            f"{totals['skipped']} skipped, {totals['removed']} removed"
+        )
         return result
 
     except Exception as e:
-        logging.error(f"[{user_id}] Embedding failed: {str(e)}")
-        traceback.print_exc()
-
-        # Write failure status
-        with open(status_path, "w") as f:
-            json.dump({
-                "status": "error",
-                "error": str(e),
-                "traceback": traceback.format_exc()
-            }, f, indent=2)
-
-        return {"status": "error", "error": str(e)}
+        return _fail(job_id, user_id, e)
+
+    finally:
+        copies = [file_path for file_path, _ in files]
+        for path in copies + list(archive_paths) + extracted:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@celery_app.task(name="maintain_chat_history")
+def maintain_chat_history():
+    """
+    Periodic chat history maintenance, scheduled daily by Celery beat.
+
+    Creates the monthly partitions of the coming months and archives
+    partitions older than CHATLOG_RETENTION_MONTHS to compressed files
+    before dropping them (see `app.utility.chat_history_retention`).
+    """
+    created = ensure_partitions()
+    if created:
+        logging.info(f"Created chat history partitions: {', '.join(created)}")
+    archived = archive_expired_partitions()
+    return {"created": created, "archived": archived}
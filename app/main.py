@@ -1,16 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 
+from app import startup
+from app.db import async_engine
+from app.utility.chat_log_writer import get_chat_log_writer
 from app.routes import upload
 from app.routes import query
 from app.routes import status
 from app.routes import chatlog
+from app.routes import metrics
+from app.routes import health
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create heavy resources in a startup phase instead of at import time,
+    and write out queued chat log rows and close database connections on
+    shutdown.
+    """
+    if startup.PREWARM == "blocking":
+        await asyncio.to_thread(startup.run_startup)
+    else:
+        startup.start_in_background()
+    get_chat_log_writer().start()
+    yield
+    await get_chat_log_writer().stop()
+    await async_engine.dispose()
 
 
-app = FastAPI(title="Legal Document Chatbot")
+app = FastAPI(title="Legal Document Chatbot", lifespan=lifespan)
 
 
 app.include_router(upload.router, prefix="/upload", tags=["Upload"])
 app.include_router(status.router, prefix="/status", tags=["Status"])
 app.include_router(query.router, prefix="/query", tags=["Query"])
 app.include_router(chatlog.router, prefix="/chat_log", tags=["ChatLog"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(health.router, prefix="/health", tags=["Health"])
@@ -0,0 +1,60 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, text
+
+from app.db import DATABASE_URL
+from app.models import Base
+
+
+config = context.config
+
+# `app.db.run_migrations` keeps the application's logging setup
+if config.config_file_name and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Arbitrary key of the advisory lock that serializes concurrent upgrades,
+# e.g. several API workers starting at once
+MIGRATION_LOCK_ID = 72160431
+
+
+def run_migrations_offline():
+    """
+    Emit the migration SQL to stdout instead of running it
+    (`alembic upgrade head --sql`).
+    """
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """
+    Run migrations against the chat log database.
+    """
+    connectable = create_engine(DATABASE_URL)
+    with connectable.connect() as connection:
+        # Session-level lock, held across the migration transactions
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        connection.commit()
+        try:
+            context.configure(connection=connection, target_metadata=target_metadata)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+    connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,36 @@
+"""
+Create the chat_history table.
+
+Baseline matching what `Base.metadata.create_all` created before the
+schema was managed by migrations; databases created that way already have
+the table and are left as they are.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id SERIAL PRIMARY KEY,
+            user_id VARCHAR,
+            user_query TEXT NOT NULL,
+            assistant_response TEXT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_chat_history_id ON chat_history (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_chat_history_user_id ON chat_history (user_id)")
+
+
+def downgrade():
+    op.execute("DROP TABLE chat_history")
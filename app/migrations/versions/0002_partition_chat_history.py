@@ -0,0 +1,121 @@
+"""
+Partition chat_history by month and index it by (user_id, timestamp, id).
+
+The table becomes range-partitioned on `timestamp`, one partition per
+month named `chat_history_yYYYYmMM`, plus a default partition for rows
+outside every month range. Partitions are created from the oldest stored
+month to three months ahead; `chat_history_create_partition(month)` adds
+later ones (see `app.utility.chat_history_retention`). A partitioned
+table's primary key must contain the partition key, so it becomes
+(id, timestamp); ids keep coming from the existing sequence.
+
+Existing rows are copied into the new table inside the migration's
+transaction.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, user_id, user_query, assistant_response, timestamp"
+
+
+def upgrade():
+    op.execute("ALTER TABLE chat_history RENAME TO chat_history_unpartitioned")
+    op.execute(
+        "ALTER TABLE chat_history_unpartitioned "
+        "RENAME CONSTRAINT chat_history_pkey TO chat_history_unpartitioned_pkey"
+    )
+    op.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE chat_history_id_seq AS BIGINT")
+
+    op.execute("""
+        CREATE TABLE chat_history (
+            id BIGINT NOT NULL DEFAULT nextval('chat_history_id_seq'),
+            user_id VARCHAR,
+            user_query TEXT NOT NULL,
+            assistant_response TEXT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT chat_history_pkey PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY chat_history.id")
+    op.execute(
+        "CREATE INDEX ix_chat_history_user_timestamp_id "
+        "ON chat_history (user_id, timestamp, id)"
+    )
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION chat_history_create_partition(month DATE)
+        RETURNS TEXT AS $$
+        DECLARE
+            start_at DATE := date_trunc('month', month);
+            partition_name TEXT := 'chat_history_' || to_char(start_at, '"y"YYYY"m"MM');
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF chat_history '
+                'FOR VALUES FROM (%L) TO (%L)',
+                partition_name, start_at, (start_at + INTERVAL '1 month')::DATE
+            );
+            RETURN partition_name;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        DO $$
+        DECLARE
+            month DATE;
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(timestamp), now()))::DATE
+            INTO month FROM chat_history_unpartitioned;
+            WHILE month <= date_trunc('month', now()) + INTERVAL '3 months' LOOP
+                PERFORM chat_history_create_partition(month);
+                month := (month + INTERVAL '1 month')::DATE;
+            END LOOP;
+        END
+        $$
+    """)
+    op.execute("CREATE TABLE chat_history_default PARTITION OF chat_history DEFAULT")
+
+    op.execute(
+        f"INSERT INTO chat_history ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM chat_history_unpartitioned"
+    )
+    op.execute("DROP TABLE chat_history_unpartitioned")
+
+
+def downgrade():
+    op.execute("ALTER TABLE chat_history RENAME TO chat_history_partitioned")
+    op.execute(
+        "ALTER TABLE chat_history_partitioned "
+        "RENAME CONSTRAINT chat_history_pkey TO chat_history_partitioned_pkey"
+    )
+    op.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE chat_history (
+            id BIGINT NOT NULL DEFAULT nextval('chat_history_id_seq'),
+            user_id VARCHAR,
+            user_query TEXT NOT NULL,
+            assistant_response TEXT NOT NULL,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT chat_history_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE chat_history_id_seq OWNED BY chat_history.id")
+    op.execute("CREATE INDEX ix_chat_history_id ON chat_history (id)")
+    op.execute("CREATE INDEX ix_chat_history_user_id ON chat_history (user_id)")
+
+    op.execute(
+        f"INSERT INTO chat_history ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM chat_history_partitioned"
+    )
+    op.execute("DROP TABLE chat_history_partitioned")
+    op.execute("DROP FUNCTION chat_history_create_partition(DATE)")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import BigInteger, Column, Index, String, Text, DateTime, and_, select, tuple_
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -9,20 +9,61 @@ class ChatHistory(Base):
     """
     SQLAlchemy model for storing chat history between a user and the assistant.
 
+    The table is range-partitioned by month on `timestamp` (see
+    `app/migrations`), so the primary key includes it. The schema is
+    managed by Alembic migrations, not `create_all`.
+
     Attributes:
-        id (int): Primary key for the chat record.
+        id (int): Identifier of the chat record, unique across partitions.
         user_id (str): Identifier for the user (can be used to track user sessions).
         user_query (str): The query or message sent by the user.
         assistant_response (str): The assistant's response to the user query.
         timestamp (datetime): The UTC time when the interaction occurred. Defaults to current time.
     """
     __tablename__ = "chat_history"
+    __table_args__ = (
+        # Every chat log read is a range of one user's turns in time order.
+        # The range is found with an index-only scan over these keys, and
+        # only the rows it returns are read from the table (see
+        # `user_turn_keys`). The texts are not INCLUDEd: btree entries are
+        # capped at about 2.7 kB, which long answers exceed
+        Index("ix_chat_history_user_timestamp_id", "user_id", "timestamp", "id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, index=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(String)
     user_query = Column(Text, nullable=False)
     assistant_response = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def user_turn_keys(cls, user_id: str, newest_first: bool = False, after=None, limit: int = None):
+        """
+        Return a subquery of the (timestamp, id) keys of a user's turns,
+        answered by an index-only scan of ix_chat_history_user_timestamp_id.
+
+        Args:
+            user_id (str): The user whose turns to select.
+            newest_first (bool): Order by (timestamp, id) descending.
+            after (tuple): Only keys after this (timestamp, id), in ascending order.
+            limit (int): Keep at most this many keys.
+        """
+        order = (cls.timestamp.desc(), cls.id.desc()) if newest_first else (cls.timestamp.asc(), cls.id.asc())
+        query = select(cls.timestamp, cls.id).where(cls.user_id == user_id).order_by(*order)
+        if after is not None:
+            query = query.where(tuple_(cls.timestamp, cls.id) > after)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.subquery()
+
+    @classmethod
+    def join_keys(cls, query, keys):
+        """
+        Join `query` on the rows whose primary key is in `keys`, so only
+        those rows are read from the table.
+        """
+        return query.join(keys, and_(cls.timestamp == keys.c.timestamp, cls.id == keys.c.id))
 
     def __repr__(self):
         return f"<ChatHistory(id={self.id}, user_id={self.user_id}, timestamp={self.timestamp})>"
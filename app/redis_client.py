@@ -0,0 +1,38 @@
+import os
+
+import redis
+import redis.asyncio
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_BROKER_URL")
+
+_redis_client = None
+_async_redis_client = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return the process-wide Redis client for the instance we already run
+    as the Celery broker.
+
+    The client is created on first use; redis-py keeps its own connection
+    pool, so sharing one client across threads is safe.
+    """
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """
+    Return the process-wide asyncio Redis client, for code running on the
+    API's event loop (long-polling and pub/sub).
+    """
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = redis.asyncio.Redis.from_url(REDIS_URL)
+    return _async_redis_client
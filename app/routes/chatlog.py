@@ -1,95 +1,192 @@
+import base64
+import binascii
 import json
-from io import BytesIO
+import os
+import zlib
+from datetime import datetime
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse, JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import SessionLocal
+from app.db import AsyncSessionLocal, get_async_db
 from app.models import ChatHistory
 
 
 router = APIRouter()
 
+# Rows fetched per round trip from the server-side cursor
+CHATLOG_EXPORT_FETCH_SIZE = int(os.getenv("CHATLOG_EXPORT_FETCH_SIZE", "1000"))
+# Bytes of encoded rows collected before a chunk is sent
+_EXPORT_CHUNK_BYTES = 64 * 1024
+VIEW_PAGE_SIZE = 50
+VIEW_MAX_PAGE_SIZE = 500
+
+
+def _user_history(user_id: str):
+    return (
+        select(ChatHistory)
+        .where(ChatHistory.user_id == user_id)
+        .order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc())
+    )
 
-def get_db():
-    """
-    Provides a database session and ensures it is closed after use.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+async def _has_history(db: AsyncSession, user_id: str) -> bool:
+    result = await db.execute(
+        select(ChatHistory.id).where(ChatHistory.user_id == user_id).limit(1)
+    )
+    return result.first() is not None
+
+
+def _entry(chat: ChatHistory) -> dict:
+    return {
+        "timestamp": str(chat.timestamp),
+        "user_query": chat.user_query,
+        "model_response": chat.assistant_response,
+    }
+
+
+async def _iter_export(user_id: str, fmt: str):
+    # Runs while the response is sent, after request dependencies have
+    # closed, so it opens its own session
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream_scalars(
+            _user_history(user_id).execution_options(yield_per=CHATLOG_EXPORT_FETCH_SIZE)
+        )
+
+        if fmt == "ndjson":
+            async for chat in rows:
+                yield json.dumps(_entry(chat)) + "\n"
+            return
+
+        yield '{"user_id": ' + json.dumps(user_id) + ', "chatlog": ['
+        separator = "\n  "
+        async for chat in rows:
+            yield separator + json.dumps(_entry(chat))
+            separator = ",\n  "
+        yield "\n]}\n"
+
+
+async def _encode_chunks(parts, compress: bool):
+    # Coalesces the small per-row strings into chunks of about 64 KiB,
+    # gzip-compressed on the fly if asked for
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer, size = [], 0
+    async for part in parts:
+        data = part.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= _EXPORT_CHUNK_BYTES:
+            chunk = b"".join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
 
 
 @router.get("/chatlog/download/{user_id}")
-def download_chat_history_file(
+async def download_chat_history_file(
     user_id: str,
-    db: Session = Depends(get_db)
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Download chat history for a given user as a JSON file.
-    """
-    chats = (
-        db.query(ChatHistory)
-        .filter(ChatHistory.user_id == user_id)
-        .order_by(ChatHistory.timestamp.asc())
-        .all()
-    )
+    Download chat history for a given user as a file.
 
-    if not chats:
-        return {"message": "No chat history found for this user."}
+    Rows are read from a server-side cursor and encoded as they are sent,
+    so memory use does not grow with the size of the history.
 
-    log = [
-        {
-            "timestamp": str(chat.timestamp),
-            "user_query": chat.user_query,
-            "model_response": chat.assistant_response,
-        }
-        for chat in chats
-    ]
+    Parameters:
+    - user_id (str): The user whose history to export.
+    - format (str): "json" (one document with a `chatlog` array) or
+      "ndjson" (one JSON object per line).
+    - gzip (bool): Send the file gzip-compressed, as `.gz`.
 
-    json_data = json.dumps({"user_id": user_id, "chatlog": log}, indent=2)
-    buffer = BytesIO(json_data.encode("utf-8"))
+    Returns:
+    - The chat log as a file attachment, oldest turn first.
+    """
+    if not await _has_history(db, user_id):
+        return {"message": "No chat history found for this user."}
+
+    filename = f"chatlog_{user_id}.{format}"
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
 
     return StreamingResponse(
-        buffer,
-        media_type="application/json",
+        _encode_chunks(_iter_export(user_id, format), gzip),
+        media_type=media_type,
         headers={
-            "Content-Disposition": f"attachment; filename=chatlog_{user_id}.json"
+            "Content-Disposition": f"attachment; filename={filename}"
         },
     )
 
 
+def _encode_cursor(chat: ChatHistory) -> str:
+    payload = json.dumps([chat.timestamp.isoformat(), chat.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(chat_id)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
 @router.get("/chatlog/view/{user_id}")
-def view_chat_history(
+async def view_chat_history(
     user_id: str,
-    db: Session = Depends(get_db)
+    limit: int = Query(VIEW_PAGE_SIZE, ge=1, le=VIEW_MAX_PAGE_SIZE),
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Display chat history for a given user as formatted JSON in the browser.
+    Display chat history for a given user as formatted JSON in the browser,
+    one page at a time.
+
+    Pages are read with keyset pagination on (timestamp, id), so a page
+    costs the same however deep into the history it is.
+
+    Parameters:
+    - user_id (str): The user whose history to show.
+    - limit (int): Turns per page, up to 500.
+    - cursor (str): The `next_cursor` of the previous page; omit for the
+      first page.
+
+    Returns:
+    - The page's turns, oldest first, and `next_cursor`, which is null on
+      the last page.
     """
-    chats = (
-        db.query(ChatHistory)
-        .filter(ChatHistory.user_id == user_id)
-        .order_by(ChatHistory.timestamp.asc())
-        .all()
+    # The page is found on the index alone; only its rows are read
+    keys = ChatHistory.user_turn_keys(
+        user_id, after=_decode_cursor(cursor) if cursor else None, limit=limit + 1
     )
+    chats = (await db.execute(
+        ChatHistory.join_keys(select(ChatHistory), keys)
+        .order_by(keys.c.timestamp.asc(), keys.c.id.asc())
+    )).scalars().all()
 
-    if not chats:
+    if not chats and not cursor:
         return {"message": "No chat history found for this user."}
 
-    log = [
-        {
-            "timestamp": str(chat.timestamp),
-            "user_query": chat.user_query,
-            "model_response": chat.assistant_response,
-        }
-        for chat in chats
-    ]
+    page = chats[:limit]
+    next_cursor = _encode_cursor(page[-1]) if len(chats) > limit else None
 
     return JSONResponse(
-        content={"user_id": user_id, "chatlog": log},
+        content={
+            "user_id": user_id,
+            "chatlog": [_entry(chat) for chat in page],
+            "next_cursor": next_cursor,
+        },
         media_type="application/json"
     )
@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.startup import readiness
+
+
+router = APIRouter()
+
+
+@router.get("/live")
+def liveness():
+    """
+    Report that the process is up and serving requests.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+def ready():
+    """
+    Report whether startup finished and which models are loaded.
+
+    Returns:
+    - 200 with the startup report when ready, 503 with the same report
+      while the database or warm-up steps are still pending or failed.
+    """
+    report = readiness()
+    return JSONResponse(content=report, status_code=200 if report["ready"] else 503)
@@ -0,0 +1,105 @@
+from fastapi import APIRouter
+
+from app.db import get_pool_stats
+from app.utility.answer_cache import get_answer_cache_stats
+from app.utility.chat_log_writer import get_chat_log_writer_stats
+from app.utility.conversation_memory import get_conversation_memory_stats
+from app.utility.embedding_cache import get_embedding_cache_stats
+from app.utility.embedding_engine import get_embedding_engine
+from app.utility.legal_nature import get_legal_gate_stats
+from app.utility.retriever import get_retriever_pool_stats
+
+
+router = APIRouter()
+
+
+@router.get("/retriever_pool")
+def retriever_pool_metrics():
+    """
+    Report hit, miss and eviction counters of the per-user retriever pool.
+
+    Returns:
+    - Dictionary with pool size, limits and counters.
+    """
+    return get_retriever_pool_stats()
+
+
+@router.get("/legal_gate")
+def legal_gate_metrics():
+    """
+    Report how many queries each tier of the legal-nature gate decided.
+
+    Returns:
+    - Dictionary with per-tier decision counts and the active thresholds.
+    """
+    return get_legal_gate_stats()
+
+
+@router.get("/answer_cache")
+def answer_cache_metrics():
+    """
+    Report hit rate and lookup latency of the semantic answer cache.
+
+    Returns:
+    - Dictionary with cache counters and the similarity threshold.
+    """
+    return get_answer_cache_stats()
+
+
+@router.get("/embedding")
+def embedding_metrics():
+    """
+    Report backend, encode throughput and memory use of the shared
+    embedding engine.
+
+    Returns:
+    - Dictionary with engine configuration and counters.
+    """
+    return get_embedding_engine().stats()
+
+
+@router.get("/embedding_cache")
+def embedding_cache_metrics():
+    """
+    Report hit rate, size and evictions of the shared embedding cache.
+
+    Returns:
+    - Dictionary with cache counters and the size cap.
+    """
+    return get_embedding_cache_stats()
+
+
+@router.get("/chat_log")
+def chat_log_metrics():
+    """
+    Report queue depth, batch sizes and flush latency of the write-behind
+    chat log writer.
+
+    Returns:
+    - Dictionary with writer configuration and counters.
+    """
+    return get_chat_log_writer_stats()
+
+
+@router.get("/conversation_memory")
+def conversation_memory_metrics():
+    """
+    Report hit rate, rebuilds from the database and evictions of the
+    shared conversation memory.
+
+    Returns:
+    - Dictionary with memory limits and counters.
+    """
+    return get_conversation_memory_stats()
+
+
+@router.get("/db_pool")
+def db_pool_metrics():
+    """
+    Report usage, saturation and checkout wait times of the database
+    connection pools.
+
+    Returns:
+    - Dictionary with pool settings and per-engine counters.
+    """
+    return get_pool_stats()
@@ -1,13 +1,17 @@
+import json
+import logging
+
 from fastapi import APIRouter, Form
+from fastapi.responses import StreamingResponse
 
-from app.services.chat_engine import handle_chat_query
+from app.services.chat_engine import handle_chat_query, stream_chat_query
 
 
 router = APIRouter()
 
 
 @router.post("/")
-def query_legal_bot(
+async def query_legal_bot(
     user_id: str = Form(...),
     user_query: str = Form(...)
 ):
@@ -21,5 +25,44 @@ def query_legal_bot(
     Returns:
     - JSON response from the chat engine.
     """
-    result = handle_chat_query(user_id, user_query)
+    result = await handle_chat_query(user_id, user_query)
     return result
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/stream")
+async def stream_legal_bot(
+    user_id: str = Form(...),
+    user_query: str = Form(...)
+):
+    """
+    Handle POST request to query the legal bot with a streamed answer.
+
+    Parameters:
+    - user_id (str): Unique identifier for the user.
+    - user_query (str): User's legal query.
+
+    Returns:
+    - Server-Sent Events stream: a `meta` event with intent and confidence,
+      `token` events with generated text, then a `done` event with the full
+      response (or an `error` event if the pipeline fails).
+    """
+    async def event_stream():
+        try:
+            async for event, data in stream_chat_query(user_id, user_query):
+                yield _sse_event(event, data)
+        except Exception as e:
+            logging.exception(f"[{user_id}] Streaming query failed")
+            yield _sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,30 +1,100 @@
-from fastapi import APIRouter
+import asyncio
+import json
+from contextlib import aclosing
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
 
 from celery.result import AsyncResult
 
 from app.celery.celery_app import celery_app
+from app.celery.progress import aget_progress, iter_progress_updates
 
 
 router = APIRouter()
+MAX_WAIT_SECONDS = 60
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _task_status(task_id: str, progress) -> dict:
+    result = AsyncResult(task_id, app=celery_app)
+    ready = result.ready()
+    # Task results are dicts; exceptions and anything else are shown as text
+    value = result.result if ready else None
+    if value is not None and not isinstance(value, (dict, list)):
+        value = str(value)
+
+    return {
+        "task_id": task_id,
+        "status": result.status,
+        "ready": ready,
+        "successful": result.successful(),
+        "result": value,
+        "progress": progress,
+    }
 
 
 @router.get("/{task_id}")
-def get_task_status(task_id: str):
+async def get_task_status(
+    task_id: str,
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS),
+    since: int = Query(0, ge=0)
+):
     """
     Retrieve the status and result of a Celery task by task ID.
 
+    With `wait`, the request is held until the job's progress record is
+    newer than version `since` or `wait` seconds pass (long-polling), so
+    clients can pass back the `progress.version` they last saw instead of
+    polling in a loop.
+
     Parameters:
     - task_id (str): The ID of the task to check.
+    - wait (float): Seconds to wait for a change, up to 60. 0 answers at once.
+    - since (int): The progress version the client already has.
 
     Returns:
-    - Dictionary containing task status, readiness, success, and result.
+    - Dictionary containing task status, readiness, success, result and,
+      for ingestion tasks, the progress record: state, pages, chunks,
+      done/total batches, percent, eta_seconds and version. In parallel
+      ingestion mode the Celery task finishes once batches are dispatched,
+      so `progress.state` is what reports completion.
     """
-    result = AsyncResult(task_id, app=celery_app)
+    progress = None
+    if wait:
+        async with aclosing(iter_progress_updates(task_id, since, timeout=wait)) as updates:
+            progress = await anext(updates, None)
+    progress = progress or await aget_progress(task_id)
+    # AsyncResult reads the Celery backend with the blocking client
+    return await asyncio.to_thread(_task_status, task_id, progress)
 
-    return {
-        "task_id": task_id,
-        "status": result.status,
-        "ready": result.ready(),
-        "successful": result.successful(),
-        "result": str(result.result) if result.ready() else None,
-    }
+
+@router.get("/{task_id}/events")
+async def stream_task_status(task_id: str):
+    """
+    Stream an ingestion job's progress as Server-Sent Events.
+
+    Parameters:
+    - task_id (str): The ID of the task to follow.
+
+    Returns:
+    - A `progress` event with the full progress record on every change,
+      a keep-alive comment every 15 seconds without one, and a final
+      `done` event once the job is completed or failed.
+    """
+    async def event_stream():
+        async for progress in iter_progress_updates(task_id, timeout=SSE_KEEPALIVE_SECONDS):
+            if progress is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+        yield f"event: done\ndata: {json.dumps({'task_id': task_id})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,14 +1,111 @@
+import asyncio
+import hashlib
 import os
-import shutil
+import uuid
+from typing import List
 
-from fastapi import APIRouter, UploadFile, File, Form
+import aiofiles
+import aiofiles.os
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.routing import APIRoute
 
-from app.celery.worker import process_and_embed_document
+from app.celery.worker import process_and_embed_document, process_bulk_upload
+from app.utility.bulk_ingestion import ARCHIVE_EXTENSIONS, is_archive, unique_upload_path
+from app.utility.embedder import LOADER_MAP
+from app.utility.upload_dedup import find_duplicate_upload, record_upload
 
 
-router = APIRouter()
+load_dotenv()
+
 UPLOAD_DIR = "app/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_ARCHIVE_MAX_BYTES = int(os.getenv("UPLOAD_ARCHIVE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Whole request body of a bulk upload
+UPLOAD_BULK_MAX_BYTES = int(os.getenv("UPLOAD_BULK_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for the multipart boundaries, part headers and form fields
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class _UploadRoute(APIRoute):
+    """
+    Route that turns away a request whose Content-Length is over the
+    endpoint's limit before its multipart body is read and spooled to disk.
+    The per-file limits are still enforced while each file is streamed,
+    which also covers requests sent without a Content-Length.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request):
+            max_bytes = _REQUEST_MAX_BYTES.get(self.name)
+            length = request.headers.get("content-length", "")
+            if max_bytes and length.isdigit() and int(length) > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Request body exceeds {max_bytes} bytes"
+                )
+            return await handler(request)
+
+        return limited_handler
+
+
+_REQUEST_MAX_BYTES = {
+    "upload_document": UPLOAD_MAX_BYTES + _MULTIPART_OVERHEAD,
+    "upload_documents_bulk": UPLOAD_BULK_MAX_BYTES + _MULTIPART_OVERHEAD,
+}
+
+router = APIRouter(route_class=_UploadRoute)
+
+
+def _check_extension(filename: str):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in LOADER_MAP:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported file type '{ext}'. Supported: {', '.join(sorted(LOADER_MAP))}"
+        )
+
+
+async def stream_to_temp_file(file: UploadFile, directory: str, max_bytes: int = UPLOAD_MAX_BYTES):
+    """
+    Stream an upload to a temporary file in `directory` in chunks without
+    blocking the event loop, hashing it on the way. The temporary file is
+    removed if the upload exceeds `max_bytes` or fails.
+
+    Returns:
+        tuple: (temporary file path, SHA-256 hex digest).
+    """
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"'{file.filename}' exceeds {max_bytes} bytes"
+                    )
+                digest.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        await _remove_quietly(tmp_path)
+        raise
+
+    return tmp_path, digest.hexdigest()
+
+
+async def _remove_quietly(path: str):
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
 
 
 @router.post("/")
@@ -19,25 +116,155 @@ async def upload_document(
     """
     Upload a document and trigger a Celery task for processing and embedding.
 
+    The file is streamed to disk and hashed before it is moved into place;
+    if the user's current version of this file has identical content, the
+    earlier task is returned, the copy is dropped and nothing is enqueued.
+
     Parameters:
     - user_id (str): Unique identifier for the user.
     - file (UploadFile): The document to upload and process.
 
     Returns:
     - A JSON response with task info and confirmation.
+    - 413 if the file is larger than UPLOAD_MAX_BYTES (checked against
+      Content-Length before the body is read), 415 if its type is not
+      supported.
     """
-    file_path = os.path.join(UPLOAD_DIR, f"{user_id}_{file.filename}")
+    filename = os.path.basename(file.filename or "")
+    _check_extension(filename)
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    tmp_path, sha256 = await stream_to_temp_file(file, UPLOAD_DIR)
+
+    previous_task_id = await asyncio.to_thread(find_duplicate_upload, user_id, filename, sha256)
+    if previous_task_id:
+        await _remove_quietly(tmp_path)
+        return {
+            "message": f"File '{filename}' was already uploaded. Nothing to process.",
+            "user_id": user_id,
+            "task_id": previous_task_id,
+            "sha256": sha256,
+            "duplicate": True,
+        }
+
+    file_path = os.path.join(UPLOAD_DIR, f"{user_id}_{filename}")
+    await aiofiles.os.replace(tmp_path, file_path)
 
     task = process_and_embed_document.delay(
         file_path=file_path,
         user_id=user_id
     )
+    await asyncio.to_thread(record_upload, user_id, filename, sha256, task.id)
 
     return {
-        "message": f"File '{file.filename}' received. Processing started.",
+        "message": f"File '{filename}' received. Processing started.",
         "user_id": user_id,
         "task_id": task.id,
+        "sha256": sha256,
+        "duplicate": False,
+    }
+
+
+@router.post("/bulk")
+async def upload_documents_bulk(
+    user_id: str = Form(...),
+    files: List[UploadFile] = File(...)
+):
+    """
+    Upload many documents, or zip/tar archives of documents, and ingest
+    them all as one Celery job.
+
+    Every upload is checked and streamed to disk before anything is
+    enqueued. Plain files whose current version the user already uploaded
+    unchanged are skipped.
+    Archives are extracted by the worker entry by entry. Progress for the
+    whole job and for each file is reported under the returned task id.
+
+    Parameters:
+    - user_id (str): Unique identifier for the user.
+    - files (List[UploadFile]): Documents and/or archives to ingest.
+
+    Returns:
+    - A JSON response with the job's task id, the accepted files and
+      archives, and the files skipped as duplicates.
+    - 413 if a file exceeds UPLOAD_MAX_BYTES (UPLOAD_ARCHIVE_MAX_BYTES for
+      archives) or the request exceeds UPLOAD_BULK_MAX_BYTES, 415 if a file
+      type is not supported.
+    """
+    names = [os.path.basename(file.filename or "") for file in files]
+    for name in names:
+        if not is_archive(name) and os.path.splitext(name)[1].lower() not in LOADER_MAP:
+            raise HTTPException(
+                status_code=415,
+                detail=(
+                    f"Unsupported file '{name}'. Supported: "
+                    f"{', '.join(sorted(LOADER_MAP) + list(ARCHIVE_EXTENSIONS))}"
+                )
+            )
+
+    job_id = str(uuid.uuid4())
+    archive_dir = os.path.join(UPLOAD_DIR, "bulk")
+    files_to_ingest, archive_paths, duplicates, hashes = [], [], [], []
+    # Every file moved into place, removed again if the request fails
+    placed = []
+    try:
+        for file, name in zip(files, names):
+            if is_archive(name):
+                tmp_path, _ = await stream_to_temp_file(file, archive_dir, UPLOAD_ARCHIVE_MAX_BYTES)
+                archive_path = unique_upload_path(archive_dir, name)
+                await aiofiles.os.replace(tmp_path, archive_path)
+                placed.append(archive_path)
+                archive_paths.append(archive_path)
+                continue
+
+            tmp_path, sha256 = await stream_to_temp_file(file, UPLOAD_DIR)
+            placed.append(tmp_path)
+            if await asyncio.to_thread(find_duplicate_upload, user_id, name, sha256):
+                await _remove_quietly(tmp_path)
+                duplicates.append(name)
+                continue
+            # Same-named files of one request or of concurrent requests get
+            # their own copies; their chunks are kept under the name a
+            # single upload of the file would have
+            file_path = unique_upload_path(UPLOAD_DIR, f"{user_id}_{name}")
+            await aiofiles.os.replace(tmp_path, file_path)
+            placed.append(file_path)
+            files_to_ingest.append((file_path, os.path.join(UPLOAD_DIR, f"{user_id}_{name}")))
+            hashes.append((name, sha256))
+
+        if not files_to_ingest and not archive_paths:
+            return {
+                "message": "All files were already uploaded. Nothing to process.",
+                "user_id": user_id,
+                "task_id": None,
+                "duplicates": duplicates,
+            }
+
+        process_bulk_upload.apply_async(
+            kwargs={
+                "user_id": user_id,
+                "files": files_to_ingest,
+                "archive_paths": archive_paths,
+                "upload_dir": UPLOAD_DIR,
+            },
+            task_id=job_id
+        )
+    except BaseException:
+        # Nothing is enqueued for a partly rejected request
+        for path in placed:
+            await _remove_quietly(path)
+        raise
+
+    for name, sha256 in hashes:
+        await asyncio.to_thread(record_upload, user_id, name, sha256, job_id)
+
+    return {
+        "message": (
+            f"{len(files_to_ingest)} files and {len(archive_paths)} archives received. "
+            "Processing started."
+        ),
+        "user_id": user_id,
+        "task_id": job_id,
+        "files": [name for name, _ in hashes],
+        "archives": [name for name in names if is_archive(name)],
+        "duplicates": duplicates,
     }
@@ -1,99 +1,266 @@
+import asyncio
 import os
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any
 
 from dotenv import load_dotenv
 from google import generativeai as genai
 
+from app.utility.answer_cache import lookup_answer, store_answer
+from app.utility.chat_log_writer import get_chat_log_writer
+from app.utility.conversation_memory import append_turn, get_recent_turns
 from app.utility.intent_classification import classify_intent
-from app.utility.legal_nature import detect_legal_nature
+from app.utility.legal_nature import adetect_legal_nature
 from app.utility.prompts_module import (
     definition_prompt,
     clause_retrieval_prompt,
     comparative_analysis_prompt,
 )
-from app.utility.retriever import get_compressed_context
-from app.db import SessionLocal
-from app.models import ChatHistory
+from app.utility.retriever import aget_compressed_context
 
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY_gen_ai"))
-model = genai.GenerativeModel(model_name="gemini-2.5-flash")
 
-session_history = defaultdict(list)
-MAX_HISTORY = 6
+_model = None
 
+REJECTION_MESSAGE = "❌ I only respond to legal questions. Please ask something related to law, contracts, or compliance."
+INVALID_INTENT_MESSAGE = "❌ Unable to identify a valid legal intent. Please rephrase your legal question."
 
-def handle_chat_query(user_id: str, user_query: str):
+
+@dataclass
+class ClassifiedQuery:
     """
-    Handles a user's query, verifying legal nature using Gemini,
-    then classifying intent and generating a legal response.
+    A query that passed the legal check, with its intent and the retrieval
+    task that is still running in the background.
+    """
+    intent: str
+    confidence: float
+    prompt_template: Any
+    context_task: asyncio.Task
+
+
+@dataclass
+class PreparedQuery:
+    """
+    A query that is ready for answer generation.
+    """
+    intent: str
+    confidence: float
+    full_prompt: str
+    cache_ticket: Any
+
+
+def get_model():
+    """
+    Configure Gemini and create the answer-generation model on first use.
+    """
+    global _model
+    if _model is None:
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY_gen_ai"))
+        _model = genai.GenerativeModel(model_name="gemini-2.5-flash")
+    return _model
+
+
+async def _cancel_pending(*tasks):
+    """
+    Cancel speculative pipeline stages that are no longer needed and reap
+    them so their exceptions are not reported as never retrieved.
+    """
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def classify_chat_query(user_id: str, user_query: str):
+    """
+    Run the legal-nature check, intent classification and context retrieval
+    concurrently and return as soon as the intent is known.
+
+    The three stages are independent, so they are started together; intent
+    classification runs in a worker thread to keep the CPU-bound model off
+    the event loop. If the legal check rejects the query, the other two
+    stages are cancelled.
+
+    Returns:
+        tuple: (final response dict, None) when the query is rejected, or
+        (None, ClassifiedQuery) with retrieval still in flight.
     """
+    legal_task = asyncio.create_task(adetect_legal_nature(user_query))
+    intent_task = asyncio.create_task(asyncio.to_thread(classify_intent, user_query))
+    context_task = asyncio.create_task(aget_compressed_context(user_query, user_id))
 
-    legal_check = detect_legal_nature(user_query)
+    try:
+        legal_check = await legal_task
+    except BaseException:
+        await _cancel_pending(intent_task, context_task)
+        raise
 
     if legal_check != "LEGAL":
+        await _cancel_pending(intent_task, context_task)
         return {
             "intent": "Rejected",
             "confidence": 1.0,
-            "response": "❌ I only respond to legal questions. Please ask something related to law, contracts, or compliance."
-        }
-
-    intent, confidence = classify_intent(user_query)
-
-    context = get_compressed_context(user_query, user_id)
+            "response": REJECTION_MESSAGE
+        }, None
 
-    history = session_history[user_id][-MAX_HISTORY:]
-    formatted_history = "\n".join(
-        [f"User: {q}\nAssistant: {r}" for q, r in history]
-    )
+    try:
+        intent, confidence = await intent_task
+    except BaseException:
+        await _cancel_pending(context_task)
+        raise
 
     # Routing
     if intent == "DefinitionQuery":
-        prompt = definition_prompt.format(
-            user_query=user_query,
-            context=context
-        )
+        prompt_template = definition_prompt
     elif intent == "ClauseRetrieval":
-        prompt = clause_retrieval_prompt.format(
-            user_query=user_query,
-            context=context
-        )
+        prompt_template = clause_retrieval_prompt
     elif intent == "ComparativeAnalysis":
-        prompt = comparative_analysis_prompt.format(
-            user_query=user_query,
-            context=context
-        )
+        prompt_template = comparative_analysis_prompt
     else:
+        await _cancel_pending(context_task)
         return {
             "intent": intent,
             "confidence": confidence,
-            "response": "❌ Unable to identify a valid legal intent. Please rephrase your legal question."
-        }
+            "response": INVALID_INTENT_MESSAGE
+        }, None
+
+    return None, ClassifiedQuery(intent, confidence, prompt_template, context_task)
+
+
+async def prepare_chat_query(user_id: str, user_query: str, classified: ClassifiedQuery):
+    """
+    Answer from the semantic cache if possible; otherwise wait for the
+    retrieved context and build the generation prompt.
+
+    Returns:
+        tuple: (final response dict, None) on a cache hit, or
+        (None, PreparedQuery) when an answer has to be generated.
+    """
+    try:
+        cached_answer, cache_ticket = await asyncio.to_thread(
+            lookup_answer, user_id, classified.intent, user_query
+        )
+    except BaseException:
+        await _cancel_pending(classified.context_task)
+        raise
 
+    if cached_answer is not None:
+        await _cancel_pending(classified.context_task)
+        await append_turn(user_id, user_query, cached_answer)
+        await get_chat_log_writer().record(user_id, user_query, cached_answer)
+        return {
+            "intent": classified.intent,
+            "confidence": classified.confidence,
+            "response": cached_answer
+        }, None
+
+    context = await classified.context_task
+
+    prompt = classified.prompt_template.format(
+        user_query=user_query,
+        context=context
+    )
+
+    history = await get_recent_turns(user_id)
+    formatted_history = "\n".join(
+        [f"User: {q}\nAssistant: {r}" for q, r in history]
+    )
 
     full_prompt = (
         f"{formatted_history}\n\nCurrent Query: {user_query}\n\n"
         f"Context: {context}\n\nAnswer the query."
     )
 
-    response = model.generate_content(full_prompt)
-    answer = response.text
+    return None, PreparedQuery(
+        classified.intent, classified.confidence, full_prompt, cache_ticket
+    )
 
-    session_history[user_id].append((user_query, answer))
 
-    db = SessionLocal()
-    chat = ChatHistory(
-        user_id=user_id,
-        user_query=user_query,
-        assistant_response=answer
-    )
-    db.add(chat)
-    db.commit()
-    db.close()
+async def finalize_chat_query(user_id: str, user_query: str, answer: str, prepared: PreparedQuery):
+    """
+    Record a generated answer in the conversation memory, the chat log and
+    the semantic answer cache. The chat log row is written behind, in batches.
+    """
+    await append_turn(user_id, user_query, answer)
+
+    await get_chat_log_writer().record(user_id, user_query, answer)
+    await asyncio.to_thread(store_answer, prepared.cache_ticket, user_query, answer)
+
+
+async def handle_chat_query(user_id: str, user_query: str):
+    """
+    Handles a user's query, verifying legal nature using Gemini,
+    then classifying intent and generating a legal response.
+    """
+    result, classified = await classify_chat_query(user_id, user_query)
+    if result is not None:
+        return result
+
+    result, prepared = await prepare_chat_query(user_id, user_query, classified)
+    if result is not None:
+        return result
+
+    response = await get_model().generate_content_async(prepared.full_prompt)
+    answer = response.text
+
+    await finalize_chat_query(user_id, user_query, answer, prepared)
 
     return {
-        "intent": intent,
-        "confidence": confidence,
+        "intent": prepared.intent,
+        "confidence": prepared.confidence,
         "response": answer
     }
+
+
+def _chunk_text(chunk) -> str:
+    # Chunks without text parts (e.g. the final safety-rating chunk) raise
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+async def stream_chat_query(user_id: str, user_query: str):
+    """
+    Streaming variant of `handle_chat_query`.
+
+    Yields (event, data) pairs: one "meta" event with the intent and
+    confidence as soon as they are known, "token" events with generated
+    text as Gemini produces it, and a final "done" event carrying the same
+    dict `handle_chat_query` returns. The complete answer is persisted once
+    generation finishes; an interrupted stream is not recorded.
+    """
+    result, classified = await classify_chat_query(user_id, user_query)
+    try:
+        if result is None:
+            yield "meta", {"intent": classified.intent, "confidence": classified.confidence}
+            result, prepared = await prepare_chat_query(user_id, user_query, classified)
+        else:
+            yield "meta", {"intent": result["intent"], "confidence": result["confidence"]}
+
+        if result is not None:
+            yield "token", {"text": result["response"]}
+            yield "done", result
+            return
+
+        parts = []
+        response = await get_model().generate_content_async(prepared.full_prompt, stream=True)
+        async for chunk in response:
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield "token", {"text": text}
+
+        answer = "".join(parts)
+        await finalize_chat_query(user_id, user_query, answer, prepared)
+
+        yield "done", {
+            "intent": prepared.intent,
+            "confidence": prepared.confidence,
+            "response": answer
+        }
+    finally:
+        # A client that disconnects right after "meta" closes the stream
+        # before retrieval is consumed
+        if classified is not None and not classified.context_task.done():
+            await _cancel_pending(classified.context_task)
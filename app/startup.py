@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from app.db import init_database
+
+
+load_dotenv()
+
+# "background" (serve immediately, warm up in a thread), "blocking" (warm up
+# before serving) or "off" (load models on first request)
+PREWARM = os.getenv("PREWARM", "background").lower()
+
+_status_lock = threading.Lock()
+_components = OrderedDict()
+_started_at = time.time()
+
+
+def _warm_embedding():
+    from app.utility.embedding_engine import get_embedding_engine
+
+    get_embedding_engine().encode(["warm up"])
+
+
+def _warm_intent_classifier():
+    from app.utility.intent_classification import warm_up_intent_classifier
+
+    warm_up_intent_classifier()
+
+
+def _warm_legal_gate():
+    from app.utility.legal_nature import get_model, warm_up_legal_gate
+
+    warm_up_legal_gate()
+    get_model()
+
+
+def _warm_retriever():
+    from app.utility.retriever import (
+        get_async_groq_client,
+        get_base_vectorstore,
+        get_compressor,
+        get_groq_client,
+        PERSIST_DIR,
+        CONTEXT_COMPRESSOR,
+    )
+
+    get_base_vectorstore(PERSIST_DIR)
+    get_compressor(CONTEXT_COMPRESSOR)
+    get_groq_client()
+    get_async_groq_client()
+
+
+def _warm_generator():
+    from app.services.chat_engine import get_model
+
+    get_model()
+
+
+WARM_UP_STEPS = OrderedDict([
+    ("embedding", _warm_embedding),
+    ("intent_classifier", _warm_intent_classifier),
+    ("legal_gate", _warm_legal_gate),
+    ("retriever", _warm_retriever),
+    ("generator", _warm_generator),
+])
+
+
+def _run_step(name: str, step) -> bool:
+    with _status_lock:
+        _components[name] = {"status": "loading"}
+    start = time.perf_counter()
+    try:
+        ok = step() is not False
+        error = None if ok else "step reported failure"
+    except Exception as e:
+        logging.exception(f"Startup step '{name}' failed")
+        ok, error = False, str(e)
+    with _status_lock:
+        _components[name] = {
+            "status": "ready" if ok else "failed",
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if error:
+            _components[name]["error"] = error
+    return ok
+
+
+def run_startup(prewarm: str = PREWARM):
+    """
+    Run the startup phase: make sure the database exists, then load the
+    models and clients that would otherwise be created on first request.
+    """
+    _run_step("database", init_database)
+    if prewarm == "off":
+        return
+    for name, step in WARM_UP_STEPS.items():
+        _run_step(name, step)
+
+
+def start_in_background(prewarm: str = PREWARM) -> threading.Thread:
+    """
+    Run the startup phase in a daemon thread so the server can accept
+    requests immediately; `readiness()` reports progress.
+    """
+    thread = threading.Thread(target=run_startup, args=(prewarm,), name="startup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _models_loaded() -> dict:
+    from app.utility.embedding_engine import get_embedding_engine
+    from app.utility.intent_classification import INTENT_CLASSIFIER, intent_classifier_loaded
+    from app.utility.retriever import get_base_vectorstore
+
+    return {
+        "embedding": get_embedding_engine().loaded,
+        f"intent_classifier_{INTENT_CLASSIFIER}": intent_classifier_loaded(),
+        "base_vectorstore": get_base_vectorstore.cache_info().currsize > 0,
+    }
+
+
+def readiness() -> dict:
+    """
+    Report startup progress and which models are loaded.
+
+    The service is ready once the database step succeeded and, unless
+    PREWARM is "off", every warm-up step has finished successfully.
+    """
+    with _status_lock:
+        components = {name: dict(state) for name, state in _components.items()}
+
+    expected = ["database"] + ([] if PREWARM == "off" else list(WARM_UP_STEPS))
+    ready = all(components.get(name, {}).get("status") == "ready" for name in expected)
+
+    return {
+        "ready": ready,
+        "prewarm": PREWARM,
+        "uptime_seconds": round(time.time() - _started_at, 1),
+        "components": components,
+        "models_loaded": _models_loaded(),
+    }
@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+
+from app.redis_client import get_redis
+from app.utility.collection_versions import get_collection_version
+from app.utility.embedding_engine import get_embedding_engine
+
+
+load_dotenv()
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "100"))
+
+KEY_PREFIX = "answer_cache:"
+BASE_COLLECTION_NAME = "legal_index"
+
+
+@dataclass
+class CacheTicket:
+    """
+    Result of a cache lookup, carried to `store_answer` so the scope and
+    query embedding are not computed twice.
+    """
+    scope: str
+    vector: np.ndarray
+
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0, "lookup_ms_total": 0.0}
+
+
+def _count(name: str, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_answer_cache_stats() -> dict:
+    """
+    Return hit/miss counters and the mean lookup latency of the answer cache.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "enabled": ANSWER_CACHE_ENABLED,
+        "threshold": ANSWER_CACHE_THRESHOLD,
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+        "stores": stats["stores"],
+        "errors": stats["errors"],
+        "mean_lookup_ms": round(stats["lookup_ms_total"] / lookups, 3) if lookups else 0.0,
+    }
+
+
+def _scope_key(user_id: str, intent: str):
+    # Versions change whenever either collection gets new content, which
+    # moves lookups to a fresh scope and lets the old one expire by TTL
+    base_version = get_collection_version(BASE_COLLECTION_NAME)
+    user_version = get_collection_version(f"user_{user_id}")
+    if base_version is None or user_version is None:
+        return None
+    return (
+        f"{KEY_PREFIX}{intent}:{BASE_COLLECTION_NAME}@{base_version}:"
+        f"user_{user_id}@{user_version}"
+    )
+
+
+def _embed(query: str) -> np.ndarray:
+    return get_embedding_engine().encode([" ".join(query.split())])[0]
+
+
+def lookup_answer(user_id: str, intent: str, query: str):
+    """
+    Look for a cached answer to a semantically equivalent query.
+
+    Entries are scoped by intent and by the version stamps of `legal_index`
+    and `user_{id}`. Conversation history is not part of the key, so a hit
+    reuses an answer given to the same question in an earlier turn.
+
+    Returns:
+        tuple: (answer or None, CacheTicket or None). Pass the ticket to
+        `store_answer` after generating a fresh answer on a miss.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+
+    start = time.perf_counter()
+    try:
+        scope = _scope_key(user_id, intent)
+        if scope is None:
+            return None, None
+        vector = _embed(query)
+
+        pipe = get_redis().pipeline()
+        pipe.lrange(f"{scope}:vectors", 0, -1)
+        pipe.lrange(f"{scope}:answers", 0, -1)
+        vectors, answers = pipe.execute()
+    except RedisError as e:
+        logging.warning(f"Answer cache lookup failed: {e}")
+        _count("errors")
+        return None, None
+
+    answer = None
+    count = min(len(vectors), len(answers))
+    if count:
+        matrix = np.frombuffer(b"".join(vectors[:count]), dtype=np.float32).reshape(count, -1)
+        similarities = matrix @ vector
+        best = int(similarities.argmax())
+        if similarities[best] >= ANSWER_CACHE_THRESHOLD:
+            answer = json.loads(answers[best])["answer"]
+
+    _count("hits" if answer is not None else "misses")
+    _count("lookup_ms_total", (time.perf_counter() - start) * 1000)
+    return answer, CacheTicket(scope=scope, vector=vector)
+
+
+def store_answer(ticket: CacheTicket, query: str, answer: str):
+    """
+    Cache a freshly generated answer under the scope of its lookup ticket.
+    Each scope keeps at most ANSWER_CACHE_MAX_ENTRIES newest entries and
+    expires ANSWER_CACHE_TTL seconds after its last write.
+    """
+    if ticket is None:
+        return
+
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        for key, value in (
+            (f"{ticket.scope}:vectors", ticket.vector.astype(np.float32).tobytes()),
+            (f"{ticket.scope}:answers", json.dumps({"query": query, "answer": answer})),
+        ):
+            pipe.lpush(key, value)
+            pipe.ltrim(key, 0, ANSWER_CACHE_MAX_ENTRIES - 1)
+            pipe.expire(key, ANSWER_CACHE_TTL)
+        pipe.execute()
+        _count("stores")
+    except RedisError as e:
+        logging.warning(f"Answer cache store failed: {e}")
+        _count("errors")
@@ -0,0 +1,254 @@
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from app.utility.embedder import (
+    LOADER_MAP,
+    add_embedded_chunks,
+    assign_chunk_ids,
+    delete_chunks,
+    embedding_model,
+    get_or_create_collection,
+    load_and_clean_documents,
+    plan_chunk_sync,
+    split_documents,
+)
+
+
+load_dotenv()
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2")
+# Files parsed concurrently. Threads rather than processes: Celery's prefork
+# pool processes are daemonic and may not start children.
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", "4"))
+# Chunks embedded and written to Chroma per combined batch, across files
+BULK_WRITE_BATCH_SIZE = int(os.getenv("BULK_WRITE_BATCH_SIZE", "1024"))
+BULK_MAX_ENTRY_BYTES = int(os.getenv("BULK_MAX_ENTRY_BYTES", str(100 * 1024 * 1024)))
+_COPY_BUFFER = 1024 * 1024
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _flatten_entry_name(name: str):
+    # "clients/acme/nda.pdf" -> "clients__acme__nda.pdf"; never a path
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    if not parts or parts[-1].startswith("."):
+        return None
+    if os.path.splitext(parts[-1])[1].lower() not in LOADER_MAP:
+        return None
+    return "__".join(parts)
+
+
+def _copy_entry(source, target_path: str, size: int):
+    if size > BULK_MAX_ENTRY_BYTES:
+        raise ValueError(f"entry larger than {BULK_MAX_ENTRY_BYTES} bytes")
+    tmp_path = f"{target_path}.part"
+    try:
+        with open(tmp_path, "wb") as target:
+            shutil.copyfileobj(source, target, _COPY_BUFFER)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, target_path)
+
+
+def unique_upload_path(directory: str, name: str) -> str:
+    """
+    Return a path in `directory` for a copy of the uploaded file `name`
+    that no other upload can share.
+    """
+    return os.path.join(directory, f"{uuid.uuid4().hex}_{name}")
+
+
+def _entry_paths(target_dir: str, prefix: str, name: str):
+    # (stable source, unique path the entry is extracted to)
+    return (
+        os.path.join(target_dir, f"{prefix}{name}"),
+        unique_upload_path(target_dir, f"{prefix}{name}")
+    )
+
+
+def iter_archive_files(archive_path: str, target_dir: str, prefix: str):
+    """
+    Extract the supported documents of a zip or tar archive one entry at a
+    time into `target_dir`.
+
+    Each entry is ingested as the source `{target_dir}/{prefix}{flattened
+    entry path}`, the path a single upload of that file would have, so a
+    later upload of the same document replaces its chunks. It is written to
+    that name behind a unique id, so entries of the same name from other
+    archives or concurrent jobs never overwrite each other.
+
+    Tar archives are read as a stream, without a seekable index. Entry paths
+    are flattened so no entry can be written outside `target_dir`, and
+    links, unsupported types and oversized entries are skipped.
+
+    Yields:
+        tuple: (entry name, extracted path or None, source, skip reason or None).
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                name = _flatten_entry_name(info.filename)
+                if name is None:
+                    yield info.filename, None, None, "unsupported file type"
+                    continue
+                source, path = _entry_paths(target_dir, prefix, name)
+                try:
+                    with archive.open(info) as entry:
+                        _copy_entry(entry, path, info.file_size)
+                except Exception as e:
+                    yield info.filename, None, source, str(e)
+                    continue
+                yield info.filename, path, source, None
+        return
+
+    with tarfile.open(archive_path, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            name = _flatten_entry_name(member.name)
+            if name is None:
+                yield member.name, None, None, "unsupported file type"
+                continue
+            source, path = _entry_paths(target_dir, prefix, name)
+            try:
+                _copy_entry(archive.extractfile(member), path, member.size)
+            except Exception as e:
+                yield member.name, None, source, str(e)
+                continue
+            yield member.name, path, source, None
+
+
+def _parse_file(file_path: str, source: str):
+    chunks = split_documents(load_and_clean_documents(file_path))
+    if not chunks:
+        raise ValueError("no usable chunks")
+    for chunk in chunks:
+        # Loaders record the uniquely named copy; chunks are kept under the
+        # document's stable source
+        chunk.metadata["source"] = source
+    return assign_chunk_ids(chunks, source)
+
+
+class _WriteBuffer:
+    """
+    Collects new chunks across files and embeds and writes them in
+    combined batches of BULK_WRITE_BATCH_SIZE.
+    """
+
+    def __init__(self, collection, on_flush):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.chunks = []
+        self.ids = []
+
+    def add(self, chunks, ids):
+        self.chunks.extend(chunks)
+        self.ids.extend(ids)
+        while len(self.chunks) >= BULK_WRITE_BATCH_SIZE:
+            self.flush(BULK_WRITE_BATCH_SIZE)
+
+    def flush(self, size: int = None):
+        size = size or len(self.chunks)
+        chunks, self.chunks = self.chunks[:size], self.chunks[size:]
+        ids, self.ids = self.ids[:size], self.ids[size:]
+        if not chunks:
+            return
+        add_embedded_chunks(
+            self.collection,
+            texts=[chunk.page_content for chunk in chunks],
+            metadatas=[chunk.metadata for chunk in chunks],
+            embeddings=embedding_model.encode(
+                [chunk.page_content for chunk in chunks], use_cache=True
+            ),
+            ids=ids
+        )
+        self.on_flush(chunks)
+
+
+def ingest_files(files, user_id: str, persist_dir: str, on_file=None, on_flush=None) -> dict:
+    """
+    Ingest many files into one user collection as a single job.
+
+    `files` yields (file path, source) pairs: the file to read and the
+    source its chunks are stored and replaced under.
+
+    Files are parsed and split on a pool of BULK_PARSE_WORKERS threads,
+    with at most twice that many parsed files waiting. Their new chunks are
+    pooled and embedded and written in combined batches instead of per
+    file. Chunk ids, skipping and removal of stale chunks follow
+    `embed_single_file_into_chroma`. A file that fails to parse is reported
+    and the job continues.
+
+    `on_file(source, state, details)` is called as each file is parsed
+    (state "parsed" or "failed") and `on_flush(written_so_far)` after each
+    combined write.
+
+    Returns:
+        dict: Per-job chunk and file counts.
+    """
+    collection = get_or_create_collection(user_id, persist_dir)
+    totals = {"files": 0, "files_failed": 0, "chunks": 0, "new": 0, "skipped": 0, "removed": 0}
+    removed_ids = []
+
+    def flushed(chunks):
+        totals["new"] += len(chunks)
+        if on_flush:
+            on_flush(totals["new"])
+
+    buffer = _WriteBuffer(collection, flushed)
+    pending = iter(files)
+
+    with ThreadPoolExecutor(max_workers=BULK_PARSE_WORKERS, thread_name_prefix="bulk-parse") as pool:
+        in_flight = {}
+
+        def submit_next():
+            item = next(pending, None)
+            if item is not None:
+                file_path, source = item
+                in_flight[pool.submit(_parse_file, file_path, source)] = source
+
+        for _ in range(BULK_PARSE_WORKERS * 2):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = in_flight.pop(future)
+                submit_next()
+                totals["files"] += 1
+                try:
+                    chunks, ids = future.result()
+                except Exception as e:
+                    totals["files_failed"] += 1
+                    if on_file:
+                        on_file(source, "failed", {"error": str(e)})
+                    continue
+
+                plan = plan_chunk_sync(collection, chunks, ids, source)
+                totals["chunks"] += len(chunks)
+                totals["skipped"] += plan["skipped"]
+                removed_ids.extend(plan["removed_ids"])
+                buffer.add(plan["new_chunks"], plan["new_ids"])
+                if on_file:
+                    on_file(source, "parsed", {
+                        "chunks": len(chunks),
+                        "new": len(plan["new_chunks"]),
+                        "skipped": plan["skipped"],
+                    })
+
+    buffer.flush()
+    # Stale chunks go only after every new chunk is stored
+    delete_chunks(collection, removed_ids)
+    totals["removed"] = len(removed_ids)
+    return totals
@@ -0,0 +1,216 @@
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import date, datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from app.db import engine
+
+
+load_dotenv()
+
+# Monthly partitions kept ahead of the current month
+CHATLOG_PARTITION_MONTHS_AHEAD = int(os.getenv("CHATLOG_PARTITION_MONTHS_AHEAD", "3"))
+# Months of chat history kept in Postgres, counting the current one; 0 keeps everything
+CHATLOG_RETENTION_MONTHS = int(os.getenv("CHATLOG_RETENTION_MONTHS", "0"))
+CHATLOG_ARCHIVE_DIR = os.getenv("CHATLOG_ARCHIVE_DIR", "chatlog_archive")
+# Rows fetched per round trip while a partition is archived
+_ARCHIVE_FETCH_SIZE = 5000
+
+_PARTITION_NAME = re.compile(r"^chat_history_y(\d{4})m(\d{2})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """
+    Return the name of the partition holding `month`, as named by
+    `chat_history_create_partition`.
+    """
+    return f"chat_history_y{month.year:04d}m{month.month:02d}"
+
+
+def _partitions_from(names) -> dict:
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def list_partitions() -> dict:
+    """
+    Return the monthly partitions of chat_history as {name: first day of month}.
+    The default partition is not included.
+    """
+    with engine.connect() as conn:
+        names = conn.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'chat_history'
+        """)).scalars().all()
+    return _partitions_from(names)
+
+
+def _list_detached_partitions() -> dict:
+    # Monthly tables that are no longer attached to chat_history: detached
+    # by `archive_expired_partitions`, which stopped before dropping them
+    with engine.connect() as conn:
+        names = conn.execute(text("""
+            SELECT c.relname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind = 'r'
+              AND n.nspname = current_schema()
+              AND c.relname LIKE 'chat_history_y%'
+              AND NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = c.oid)
+        """)).scalars().all()
+    return _partitions_from(names)
+
+
+def _create_partition(conn, month: date):
+    # A partition cannot be created while the default partition holds rows
+    # of its range, so those rows are moved out and back in around it. The
+    # lock keeps new rows from reaching the default partition meanwhile
+    bounds = {"start": month, "end": _add_months(month, 1)}
+    conn.execute(text("LOCK TABLE chat_history_default IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text(
+        "CREATE TEMP TABLE chat_history_moving (LIKE chat_history) ON COMMIT DROP"
+    ))
+    moved = conn.execute(text("""
+        WITH moved AS (
+            DELETE FROM chat_history_default
+            WHERE timestamp >= :start AND timestamp < :end
+            RETURNING *
+        )
+        INSERT INTO chat_history_moving SELECT * FROM moved
+    """), bounds).rowcount
+    conn.execute(text("SELECT chat_history_create_partition(:month)"), {"month": month})
+    if moved:
+        conn.execute(text("INSERT INTO chat_history SELECT * FROM chat_history_moving"))
+        logging.info(f"Moved {moved} rows from chat_history_default to {partition_name(month)}")
+
+
+def ensure_partitions(months_ahead: int = CHATLOG_PARTITION_MONTHS_AHEAD, today: date = None) -> list:
+    """
+    Create the monthly partitions from the current month to `months_ahead`
+    months ahead, so new rows never land in the default partition. Rows
+    already in the default partition for a new month are moved into it.
+
+    Returns:
+        list: Names of the partitions that did not exist yet.
+    """
+    month = (today or date.today()).replace(day=1)
+    existing = list_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        start = _add_months(month, offset)
+        name = partition_name(start)
+        if name in existing:
+            continue
+        # One transaction per month, so the default partition is locked
+        # only while its rows for that month are moved
+        with engine.begin() as conn:
+            _create_partition(conn, start)
+        created.append(name)
+    return created
+
+
+def _write_archive(conn, query: str, path: str, params: dict = None) -> int:
+    # Written to a temporary name first, so an archive file is complete
+    tmp_path = f"{path}.part"
+    rows = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+        result = conn.execution_options(yield_per=_ARCHIVE_FETCH_SIZE).execute(text(
+            f"SELECT id, user_id, user_query, assistant_response, timestamp "
+            f"{query} ORDER BY timestamp, id"
+        ), params or {})
+        for row in result.mappings():
+            out.write(json.dumps(dict(row), default=str) + "\n")
+            rows += 1
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return rows
+
+
+def _archive_partition(name: str, archive_dir: str) -> int:
+    with engine.connect() as conn:
+        return _write_archive(conn, f'FROM "{name}"', os.path.join(archive_dir, f"{name}.jsonl.gz"))
+
+
+def _archive_expired_default_rows(cutoff: date, archive_dir: str):
+    # Rows outside every monthly range (older than the first partition, or
+    # written before their month's partition existed) never expire with a
+    # partition, so they are archived and deleted here. The lock keeps rows
+    # from being added or moved between the archive and the delete; the
+    # archive file is complete before the delete commits, so an interrupted
+    # run archives rows twice rather than losing them
+    name = f"chat_history_default_{datetime.utcnow():%Y%m%dT%H%M%S}"
+    path = os.path.join(archive_dir, f"{name}.jsonl.gz")
+    expired = "FROM chat_history_default WHERE timestamp < :cutoff"
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE chat_history_default IN SHARE ROW EXCLUSIVE MODE"))
+        if conn.execute(text(f"SELECT 1 {expired} LIMIT 1"), {"cutoff": cutoff}).first() is None:
+            return None
+        rows = _write_archive(conn, expired, path, {"cutoff": cutoff})
+        conn.execute(text(f"DELETE {expired}"), {"cutoff": cutoff})
+    logging.info(f"Archived {rows} expired rows of chat_history_default to {path}")
+    return {"partition": "chat_history_default", "rows": rows, "path": path}
+
+
+def archive_expired_partitions(
+    retention_months: int = CHATLOG_RETENTION_MONTHS,
+    archive_dir: str = CHATLOG_ARCHIVE_DIR,
+    today: date = None
+) -> list:
+    """
+    Move monthly partitions older than the retention window out of Postgres.
+
+    Each expired partition is detached first, so no row can reach it while
+    it is archived, then written to `{archive_dir}/{partition}.jsonl.gz`,
+    one row per line, and dropped once its archive file is complete. Tables
+    left detached by an interrupted run are archived and dropped too. Rows
+    of the default partition older than the window are archived to a
+    timestamped `chat_history_default_*.jsonl.gz` file and deleted.
+
+    Returns:
+        list: One {"partition", "rows", "path"} dict per archived partition,
+        plus one for the default partition if it held expired rows.
+    """
+    if retention_months <= 0:
+        return []
+
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = _add_months((today or date.today()).replace(day=1), 1 - retention_months)
+    for name, month in list_partitions().items():
+        if month < cutoff:
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE chat_history DETACH PARTITION "{name}"'))
+
+    archived = []
+    for name, _ in sorted(_list_detached_partitions().items(), key=lambda item: item[1]):
+        rows = _archive_partition(name, archive_dir)
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+        logging.info(f"Archived chat history partition {name}: {rows} rows")
+        archived.append({
+            "partition": name,
+            "rows": rows,
+            "path": os.path.join(archive_dir, f"{name}.jsonl.gz"),
+        })
+
+    default_rows = _archive_expired_default_rows(cutoff, archive_dir)
+    if default_rows:
+        archived.append(default_rows)
+    return archived
@@ -0,0 +1,424 @@
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db import async_engine
+from app.models import ChatHistory
+
+
+load_dotenv()
+
+# Rows written per multi-row INSERT, and the longest a queued row waits
+CHATLOG_BATCH_SIZE = int(os.getenv("CHATLOG_BATCH_SIZE", "200"))
+CHATLOG_FLUSH_INTERVAL = float(os.getenv("CHATLOG_FLUSH_INTERVAL", "1.0"))
+# Rows held in memory before `record` makes callers wait for a flush
+CHATLOG_QUEUE_MAX = int(os.getenv("CHATLOG_QUEUE_MAX", "10000"))
+CHATLOG_SHUTDOWN_TIMEOUT = float(os.getenv("CHATLOG_SHUTDOWN_TIMEOUT", "10"))
+# Directory for the local spill log and dead letters; empty disables it
+CHATLOG_SPILL_DIR = os.getenv("CHATLOG_SPILL_DIR", "")
+# Longest a batch is retried while the database is unreachable
+CHATLOG_RETRY_TIMEOUT = float(os.getenv("CHATLOG_RETRY_TIMEOUT", "300"))
+_MAX_RETRY_SECONDS = 30.0
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+# Failures that go away once the database is reachable again; any other
+# error (bad data, a violated constraint) fails the same way on every attempt
+_RETRYABLE_ERRORS = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError, OSError)
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, _RETRYABLE_ERRORS) or getattr(error, "connection_invalidated", False)
+
+
+class ChatLogWriter:
+    """
+    Write-behind writer for `ChatHistory` rows.
+
+    `record` puts an interaction on an in-memory queue and returns; a
+    background task writes queued rows with one multi-row INSERT per batch
+    of up to CHATLOG_BATCH_SIZE rows, at the latest CHATLOG_FLUSH_INTERVAL
+    seconds after the first row of the batch arrived. A full queue makes
+    `record` wait for the next flush instead of growing without bound.
+
+    An INSERT that fails on a connection or availability error is retried
+    with backoff for at most CHATLOG_RETRY_TIMEOUT seconds. A batch
+    rejected for its data is split in halves until the offending rows are
+    isolated, so the rest is still written. Rows that cannot be written
+    are dead-lettered: appended to `dead-letter.jsonl` in the spill
+    directory with the error, or logged in full without one.
+
+    With CHATLOG_SPILL_DIR set, each row is also appended to a local JSONL
+    segment before it is queued. A segment is deleted once all of its rows
+    are in Postgres or dead-lettered, and segments left by a crash are
+    written on the next start, so rows are recorded at least once. Spill,
+    dead-letter and replay file IO runs in worker threads, off the event
+    loop.
+    """
+
+    def __init__(self, batch_size: int = CHATLOG_BATCH_SIZE, flush_interval: float = CHATLOG_FLUSH_INTERVAL,
+                 max_queue: int = CHATLOG_QUEUE_MAX, spill_dir: str = CHATLOG_SPILL_DIR,
+                 retry_timeout: float = CHATLOG_RETRY_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_dir = spill_dir or None
+        self.retry_timeout = retry_timeout
+        self._queue = None
+        self._task = None
+        self._segments = {}
+        self._current = None
+        # Guards the segments, which worker threads append to and delete
+        self._segments_lock = threading.Lock()
+        # Queued and in-flight rows by user, for `pending_turns`
+        self._pending = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "failures": 0,
+            "dead_lettered": 0,
+            "backpressure_waits": 0,
+            "replayed": 0,
+            "flush_ms_total": 0.0,
+            "flush_ms_max": 0.0,
+            "last_flush_ms": 0.0,
+        }
+
+    def _count(self, name: str, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def start(self):
+        """
+        Start the flush task on the running event loop. Spill segments left
+        by earlier processes are written first. Safe to call repeatedly.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="chat-log-writer")
+
+    async def record(self, user_id: str, user_query: str, answer: str):
+        """
+        Queue one user/assistant interaction for writing.
+        """
+        self.start()
+        row = {
+            "user_id": user_id,
+            "user_query": user_query,
+            "assistant_response": answer,
+            "timestamp": datetime.utcnow(),
+        }
+        segment = await asyncio.to_thread(self._spill, row) if self.spill_dir else None
+        self._pending.setdefault(user_id, []).append(row)
+        self._count("enqueued")
+        try:
+            self._queue.put_nowait((segment, row))
+        except asyncio.QueueFull:
+            self._count("backpressure_waits")
+            await self._queue.put((segment, row))
+
+    async def stop(self):
+        """
+        Write everything still queued and stop the flush task, waiting at
+        most CHATLOG_SHUTDOWN_TIMEOUT seconds. Rows not written by then stay
+        in the spill log, if enabled.
+        """
+        if self._task is None:
+            return
+
+        async def drain():
+            await self._queue.put(None)
+            await self._task
+
+        try:
+            await asyncio.wait_for(drain(), CHATLOG_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.error(
+                f"Chat log writer did not finish within {CHATLOG_SHUTDOWN_TIMEOUT}s; "
+                f"{self._queue.qsize()} rows not written"
+            )
+        finally:
+            self._task = None
+            await asyncio.to_thread(self._close_segments)
+
+    def _close_segments(self):
+        # Unwritten segments are closed, not deleted, so the next start
+        # replays them
+        with self._segments_lock:
+            for segment in self._segments.values():
+                segment["file"].close()
+            self._segments.clear()
+            self._current = None
+
+    def _spill(self, row: dict):
+        # Runs in a worker thread
+        with self._segments_lock:
+            if self._current is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._current = uuid.uuid4().hex
+                path = os.path.join(self.spill_dir, f"chatlog-{self._current}.jsonl")
+                spill_file = open(path, "a", encoding="utf-8")
+                # Held until the segment is written, so another process
+                # sharing the directory does not replay it
+                fcntl.flock(spill_file, fcntl.LOCK_EX)
+                self._segments[self._current] = {"file": spill_file, "path": path, "pending": 0}
+
+            segment = self._segments[self._current]
+            record = dict(row, timestamp=row["timestamp"].isoformat())
+            segment["file"].write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Flushed to the OS, so the row survives a crash of this process
+            segment["file"].flush()
+            segment["pending"] += 1
+            return self._current
+
+    def _seal_segment(self):
+        # Rows spilled from now on start a new segment
+        with self._segments_lock:
+            self._current = None
+
+    def _release(self, segment_ids):
+        # Runs in a worker thread
+        with self._segments_lock:
+            for segment_id in segment_ids:
+                if segment_id is not None:
+                    self._segments[segment_id]["pending"] -= 1
+            finished = [
+                segment_id for segment_id, segment in self._segments.items()
+                if not segment["pending"] and segment_id != self._current
+            ]
+            for segment_id in finished:
+                segment = self._segments.pop(segment_id)
+                os.remove(segment["path"])
+                segment["file"].close()
+
+    def _leftover_segments(self):
+        # Runs in a worker thread. Segments of this writer are still locked
+        # and skipped by `_replay` as well
+        with self._segments_lock:
+            own = {segment["path"] for segment in self._segments.values()}
+        paths = glob.glob(os.path.join(self.spill_dir, "chatlog-*.jsonl"))
+        return sorted(path for path in paths if path not in own)
+
+    async def _run(self):
+        if self.spill_dir:
+            for path in await asyncio.to_thread(self._leftover_segments):
+                await self._replay(path)
+
+        stopping = False
+        loop = asyncio.get_running_loop()
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            # The segments of this batch can be deleted once it is written
+            self._seal_segment()
+            rows = [row for _, row in batch]
+            await self._write(rows)
+            if self.spill_dir:
+                await asyncio.to_thread(self._release, [segment_id for segment_id, _ in batch])
+            self._forget(rows)
+
+    def _forget(self, rows):
+        for row in rows:
+            user_rows = self._pending.get(row["user_id"])
+            if user_rows is None:
+                continue
+            # Rows are written in the order they were queued
+            if user_rows and user_rows[0] is row:
+                user_rows.pop(0)
+            else:
+                user_rows[:] = [r for r in user_rows if r is not row]
+            if not user_rows:
+                del self._pending[row["user_id"]]
+
+    def pending_turns(self, user_id: str):
+        """
+        Return the user's turns that are queued or being written but not
+        yet in Postgres, oldest first.
+
+        Returns:
+            list: (user_query, answer) pairs.
+        """
+        return [(row["user_query"], row["assistant_response"]) for row in self._pending.get(user_id, ())]
+
+    async def _write(self, rows, deadline: float = None):
+        # Returns once every row is written or dead-lettered
+        if deadline is None:
+            deadline = time.monotonic() + self.retry_timeout
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                await _insert_rows(rows)
+            except Exception as e:
+                self._count("failures")
+                if not _is_retryable(e):
+                    await self._split_rejected(rows, e, deadline)
+                    return
+                attempt += 1
+                delay = min(2 ** attempt, _MAX_RETRY_SECONDS)
+                if time.monotonic() + delay > deadline:
+                    logging.error(
+                        f"Chat log flush of {len(rows)} rows still failing after "
+                        f"{self.retry_timeout:.0f}s ({e}); giving up"
+                    )
+                    await self._dead_letter(rows, e)
+                    return
+                logging.warning(
+                    f"Chat log flush of {len(rows)} rows failed ({e}); retrying in {delay:.0f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self._stats["written"] += len(rows)
+                self._stats["batches"] += 1
+                self._stats["flush_ms_total"] += elapsed_ms
+                self._stats["flush_ms_max"] = max(self._stats["flush_ms_max"], elapsed_ms)
+                self._stats["last_flush_ms"] = elapsed_ms
+            return
+
+    async def _split_rejected(self, rows, error: Exception, deadline: float):
+        if len(rows) == 1:
+            logging.error(f"Chat log row of user {rows[0]['user_id']} rejected: {error}")
+            await self._dead_letter(rows, error)
+            return
+        # Halves are written separately until the rejected rows are isolated
+        middle = len(rows) // 2
+        await self._write(rows[:middle], deadline)
+        await self._write(rows[middle:], deadline)
+
+    async def _dead_letter(self, rows, error: Exception):
+        self._count("dead_lettered", len(rows))
+        lines = [
+            json.dumps(dict(row, timestamp=row["timestamp"].isoformat(), error=str(error)),
+                       ensure_ascii=False)
+            for row in rows
+        ]
+        if self.spill_dir:
+            try:
+                await asyncio.to_thread(_append_lines, os.path.join(self.spill_dir, DEAD_LETTER_FILE), lines)
+                return
+            except OSError as e:
+                logging.error(f"Could not write chat log dead letters: {e}")
+        for line in lines:
+            logging.error(f"Dead-lettered chat log row: {line}")
+
+    async def _replay(self, path: str):
+        segment = await asyncio.to_thread(_read_segment, path)
+        if segment is None:
+            # Still owned by a running writer
+            return
+        f, rows = segment
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                await self._write(rows[i:i + self.batch_size])
+            await asyncio.to_thread(os.remove, path)
+        finally:
+            await asyncio.to_thread(f.close)
+        self._count("replayed", len(rows))
+        logging.info(f"Replayed {len(rows)} chat log rows from {path}")
+
+    def stats(self) -> dict:
+        """
+        Return queue depth, row counters and flush latency of the writer.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats.pop("batches")
+        flush_ms_total = stats.pop("flush_ms_total")
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "spill_enabled": bool(self.spill_dir),
+            "retry_timeout": self.retry_timeout,
+            "spill_segments": len(self._segments),
+            "batches": batches,
+            "mean_batch_rows": round(stats["written"] / batches, 1) if batches else 0.0,
+            "mean_flush_ms": round(flush_ms_total / batches, 3) if batches else 0.0,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()},
+        }
+
+
+def _append_lines(path: str, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+
+
+def _read_segment(path: str):
+    # Returns the open, locked segment and its rows, or None if another
+    # writer holds the lock. The lock is kept until the rows are written
+    f = open(path, encoding="utf-8")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    rows = []
+    for line in f:
+        # The last line written before a crash may be incomplete
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        rows.append(row)
+    return f, rows
+
+
+async def _insert_rows(rows):
+    # One transaction and one multi-row INSERT for the whole batch
+    async with async_engine.begin() as conn:
+        await conn.execute(ChatHistory.__table__.insert(), rows)
+
+
+_writer = ChatLogWriter()
+
+
+def get_chat_log_writer() -> ChatLogWriter:
+    """
+    Return the process-wide chat log writer.
+    """
+    return _writer
+
+
+def get_chat_log_writer_stats() -> dict:
+    """
+    Return queue depth and flush latency of the process-wide chat log writer.
+    """
+    return _writer.stats()
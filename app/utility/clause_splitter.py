@@ -0,0 +1,211 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+
+# Line-start patterns, most specific first. Each yields the kind of
+# boundary, its number and the rest of the line.
+_ARTICLE = re.compile(r"^(?:ARTICLE|Article)\s+([IVXLC]+|\d+)\b[.:)\-]?\s*(.*)$")
+_SECTION = re.compile(r"^(?:SECTION|Section|§)\s*(\d+(?:\.\d+)*)\b[.:)\-]?\s*(.*)$")
+# "1." or "12)" alone, or dotted "1.1" / "4.2.3" with or without a final dot
+_NUMBERED = re.compile(r"^(\d{1,3}(?:\.\d{1,3})+|\d{1,3}(?=[.)]\s))[.)]?\s+(.*)$")
+_LETTERED = re.compile(r"^\(([a-z]{1,2}|[ivx]{1,5}|\d{1,2})\)\s+(.*)$")
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z0-9 ,&'/\-]{2,79}$")
+
+_MAX_TITLE_CHARS = 80
+_MAX_TITLE_WORDS = 8
+# "Definitions. The following terms ..." -> "Definitions"
+_LEADING_TITLE = re.compile(r"^([A-Z][^.;:]{0,60}?)\.\s")
+
+
+@dataclass
+class _Segment:
+    kind: str
+    number: Optional[str]
+    title: Optional[str]
+    metadata: dict
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.lines)
+
+
+_TITLE_SMALL_WORDS = {"a", "an", "and", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+
+def _looks_like_title(phrase: str) -> bool:
+    words = phrase.split()
+    if not words or len(words) > _MAX_TITLE_WORDS or len(phrase) > _MAX_TITLE_CHARS:
+        return False
+    return phrase.isupper() or all(
+        word[0].isupper() or word in _TITLE_SMALL_WORDS for word in words
+    )
+
+
+def _title_from(rest: str) -> Optional[str]:
+    # A title is either the whole rest of a heading line, when it is short
+    # and capitalized like a heading, or a leading phrase such as
+    # "Definitions." in "1.1 Definitions. The following terms ..."
+    rest = rest.strip(" -")
+    bare = rest[:-1] if rest.endswith(".") else rest
+    if not re.search(r"[.;:,]", bare) and _looks_like_title(bare):
+        return bare
+    match = _LEADING_TITLE.match(rest)
+    if match and _looks_like_title(match.group(1)):
+        return match.group(1)
+    return None
+
+
+class ClauseSplitter:
+    """
+    Split contracts into one chunk per clause or sub-clause.
+
+    Boundaries are lines that start with clause numbering ("1.", "1.1",
+    "(a)", "Article IV", "Section 12", "§ 3") or are short all-caps
+    headings. Headings without a body are attached to the clause that
+    follows them, sub-clauses shorter than `min_chars` are merged into the
+    chunk before them while it stays under `chunk_size`, and clauses longer
+    than `chunk_size` are split without overlap. Sizes are measured with
+    `length_function`; ingestion passes the embedding model's token count,
+    so no chunk is truncated by the model. Each chunk carries
+    `clause_number` and `clause_title` metadata when they are known.
+
+    Input text must keep its line breaks (`normalize_text(...,
+    keep_newlines=True)`); text without numbering falls back to plain
+    size-capped chunks.
+
+    Args:
+        chunk_size (int): Maximum length per chunk, in `length_function`
+            units. The default 800 characters stay under 256 MiniLM tokens.
+        min_chars (int): Clauses shorter than this are merged into a neighbour.
+        length_function (callable): Length of a text; characters by default.
+    """
+
+    def __init__(self, chunk_size: int = 800, min_chars: int = 200,
+                 length_function: Callable[[str], int] = len):
+        self.chunk_size = chunk_size
+        self.min_chars = min_chars
+        self.length_function = length_function
+        self._fallback = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=0, length_function=length_function
+        )
+
+    def _boundary(self, line: str, context: dict):
+        match = _ARTICLE.match(line)
+        if match:
+            return "article", match.group(1), _title_from(match.group(2))
+        match = _SECTION.match(line)
+        if match:
+            return "section", match.group(1), _title_from(match.group(2))
+        match = _NUMBERED.match(line)
+        if match:
+            return "clause", match.group(1), _title_from(match.group(2))
+        match = _LETTERED.match(line)
+        if match:
+            parent = context.get("clause") or context.get("section") or ""
+            return "subclause", f"{parent}({match.group(1)})", None
+        if _CAPS_HEADING.match(line) and len(line.split()) <= 10:
+            return "heading", None, line.title()
+        return None
+
+    def _segments(self, docs: Iterable[Document]) -> Iterator[_Segment]:
+        # Clauses can run across pages, so the open segment is carried over
+        # and keeps the metadata of the page it started on
+        context = {}
+        current = None
+        for doc in docs:
+            for line in doc.page_content.splitlines():
+                boundary = self._boundary(line, context)
+                if boundary is None:
+                    if current is None:
+                        current = _Segment("text", None, None, dict(doc.metadata))
+                    current.lines.append(line)
+                    continue
+
+                if current is not None:
+                    yield current
+                kind, number, title = boundary
+                if kind in ("article", "section", "heading"):
+                    context = {kind: number, "title": title or context.get("title")}
+                elif kind == "clause":
+                    context["clause"] = number
+                    if title:
+                        context["clause_title"] = title
+                    else:
+                        context.pop("clause_title", None)
+                current = _Segment(
+                    kind,
+                    number or context.get("article") or context.get("section"),
+                    title or context.get("clause_title") or context.get("title"),
+                    dict(doc.metadata),
+                    [line]
+                )
+        if current is not None:
+            yield current
+
+    def _merged(self, segments: Iterable[_Segment]) -> Iterator[_Segment]:
+        pending_heading = None
+        previous = None
+        for segment in segments:
+            if pending_heading is not None:
+                segment.lines = pending_heading.lines + segment.lines
+                segment.title = segment.title or pending_heading.title
+                segment.number = segment.number or pending_heading.number
+                pending_heading = None
+
+            # A heading line with no body belongs to the clause after it
+            if segment.kind in ("article", "section", "heading") and len(segment.lines) == 1:
+                pending_heading = segment
+                continue
+
+            if (
+                previous is not None
+                and segment.kind in ("subclause", "text")
+                and len(segment.text) < self.min_chars
+                and self.length_function(f"{previous.text} {segment.text}") < self.chunk_size
+            ):
+                previous.lines.extend(segment.lines)
+                continue
+
+            if previous is not None:
+                yield previous
+            previous = segment
+
+        if pending_heading is not None:
+            # A trailing heading with nothing after it
+            if previous is not None:
+                yield previous
+            previous = pending_heading
+        if previous is not None:
+            yield previous
+
+    def split_stream(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """
+        Yield clause chunks as documents (pages) arrive, for the streaming
+        ingestion pipeline. At most one clause is held back at a time.
+        """
+        for segment in self._merged(self._segments(docs)):
+            metadata = dict(segment.metadata)
+            if segment.number:
+                metadata["clause_number"] = segment.number
+            if segment.title:
+                metadata["clause_title"] = segment.title
+
+            text = segment.text
+            if self.length_function(text) <= self.chunk_size:
+                yield Document(page_content=text, metadata=metadata)
+                continue
+            parts = self._fallback.split_text(text)
+            for part_index, part in enumerate(parts):
+                yield Document(page_content=part, metadata={**metadata, "clause_part": part_index})
+
+    def split_documents(self, docs: Iterable[Document]) -> List[Document]:
+        """
+        Split documents into clause chunks; drop-in for a LangChain text
+        splitter's `split_documents`.
+        """
+        return list(self.split_stream(docs))
@@ -0,0 +1,41 @@
+import logging
+
+from redis.exceptions import RedisError
+
+from app.redis_client import get_redis
+
+
+VERSION_KEY_PREFIX = "collection_version:"
+
+
+def get_collection_version(collection_name: str):
+    """
+    Return the current version stamp of a Chroma collection.
+
+    The stamp is a counter in Redis that is bumped every time new content is
+    embedded into the collection, so the API processes can tell whether
+    anything they cached for it is stale.
+
+    Returns:
+        int: The version (0 if never bumped), or None if Redis is unreachable.
+    """
+    try:
+        value = get_redis().get(f"{VERSION_KEY_PREFIX}{collection_name}")
+    except RedisError as e:
+        logging.warning(f"Could not read version of {collection_name}: {e}")
+        return None
+    return int(value) if value is not None else 0
+
+
+def bump_collection_version(collection_name: str):
+    """
+    Increment the version stamp of a Chroma collection.
+
+    Returns:
+        int: The new version, or None if Redis is unreachable.
+    """
+    try:
+        return int(get_redis().incr(f"{VERSION_KEY_PREFIX}{collection_name}"))
+    except RedisError as e:
+        logging.warning(f"Could not bump version of {collection_name}: {e}")
+        return None
@@ -0,0 +1,116 @@
+import re
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import Document
+from langchain_core.documents.compressor import BaseDocumentCompressor
+from pydantic import ConfigDict
+
+
+# Sentence ends before whitespace followed by something that starts a new
+# sentence or list item: a capital, a digit, an opening bracket, quote or §
+_sentence_boundary = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9(\[§\"“'‘])")
+
+
+def split_sentences(text: str, max_chars: int = 600, min_chars: int = 15):
+    """
+    Split text into sentences.
+
+    Fragments shorter than `min_chars` (clause numbers such as "1." or
+    "Section 4.") are joined to the sentence that follows them, and
+    sentences longer than `max_chars` are broken at the last space before
+    the limit so a single run-on clause cannot swallow the whole budget.
+    """
+    sentences = []
+    prefix = ""
+    for sentence in _sentence_boundary.split(text):
+        sentence = f"{prefix} {sentence}".strip() if prefix else sentence.strip()
+        if len(sentence) < min_chars:
+            prefix = sentence
+            continue
+        prefix = ""
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    if prefix:
+        sentences.append(prefix)
+    return sentences
+
+
+class EmbeddingSentenceExtractor(BaseDocumentCompressor):
+    """
+    Local extractive compressor that replaces one LLM call per document
+    with a single batched embedding pass.
+
+    Every retrieved chunk is split into sentences; the query and all
+    sentences are encoded together and the sentences most similar to the
+    query are kept, highest score first, until `max_chars` is reached.
+    Each document keeps its selected sentences in their original order and
+    documents with no selected sentence are dropped.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    embeddings: Any
+    max_chars: int = 4000
+    min_similarity: float = 0.25
+    min_sentence_chars: int = 20
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        candidates = []
+        seen = set()
+        for doc_index, doc in enumerate(documents):
+            for sentence_index, sentence in enumerate(split_sentences(doc.page_content)):
+                key = " ".join(sentence.lower().split())
+                if len(sentence) < self.min_sentence_chars or key in seen:
+                    continue
+                seen.add(key)
+                candidates.append((doc_index, sentence_index, sentence))
+
+        if not candidates:
+            return []
+
+        # Sentences of retrieved documents, not cached like ingested chunks
+        vectors = np.array(
+            self.embeddings.encode([query] + [c[2] for c in candidates]), dtype=np.float32
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        scores = vectors[1:] @ vectors[0]
+
+        selected = {}
+        used_chars = 0
+        for index in np.argsort(-scores):
+            score = float(scores[index])
+            if score < self.min_similarity:
+                break
+            doc_index, sentence_index, sentence = candidates[index]
+            if used_chars + len(sentence) > self.max_chars:
+                continue
+            used_chars += len(sentence) + 1
+            selected.setdefault(doc_index, []).append((sentence_index, sentence, score))
+
+        # Most relevant document first, sentences in reading order within it
+        compressed = []
+        for doc_index, sentences in sorted(
+            selected.items(), key=lambda item: -max(s[2] for s in item[1])
+        ):
+            sentences.sort()
+            doc = documents[doc_index]
+            compressed.append(
+                Document(
+                    page_content=" ".join(s[1] for s in sentences),
+                    metadata={**doc.metadata, "relevance_score": max(s[2] for s in sentences)},
+                )
+            )
+        return compressed
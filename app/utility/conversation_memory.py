@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import select
+
+from app.db import AsyncSessionLocal
+from app.models import ChatHistory
+from app.redis_client import get_async_redis
+from app.utility.chat_log_writer import get_chat_log_writer
+
+
+load_dotenv()
+
+# Turns kept per user; prompts use the newest ones that fit the token budget
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "2000"))
+# Idle seconds after which a user's turns leave Redis
+CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", str(24 * 3600)))
+# Users kept in Redis; the least recently active are evicted beyond this
+CONVERSATION_MAX_USERS = int(os.getenv("CONVERSATION_MAX_USERS", "10000"))
+# Rough characters per token for the generator's tokenizer
+_CHARS_PER_TOKEN = 4
+# Attempts to write a rebuilt conversation while other processes change it
+_REBUILD_ATTEMPTS = 3
+
+KEY_PREFIX = "conversation:"
+# Users' turn lists live in their own namespace, so no user id can name
+# the LRU index
+USER_KEY_PREFIX = f"{KEY_PREFIX}user:"
+LRU_KEY = f"{KEY_PREFIX}lru"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "rebuilds": 0, "appends": 0, "evictions": 0, "errors": 0, "trimmed_turns": 0}
+
+
+def _count(name: str, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_conversation_memory_stats() -> dict:
+    """
+    Return hit, rebuild and eviction counters of the conversation memory.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    reads = stats["hits"] + stats["rebuilds"]
+    return {
+        "max_turns": CONVERSATION_MAX_TURNS,
+        "token_budget": CONVERSATION_TOKEN_BUDGET,
+        "ttl_seconds": CONVERSATION_TTL,
+        "max_users": CONVERSATION_MAX_USERS,
+        **stats,
+        "hit_rate": round(stats["hits"] / reads, 4) if reads else 0.0,
+    }
+
+
+def _key(user_id: str) -> str:
+    return f"{USER_KEY_PREFIX}{user_id}"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def fit_token_budget(turns, token_budget: int = CONVERSATION_TOKEN_BUDGET):
+    """
+    Keep the newest turns whose combined size fits `token_budget` tokens.
+
+    Args:
+        turns (list): (user_query, answer) pairs, oldest first.
+
+    Returns:
+        list: The kept turns, oldest first.
+    """
+    kept, used = [], 0
+    for query, answer in reversed(turns):
+        cost = estimate_tokens(query) + estimate_tokens(answer)
+        if used + cost > token_budget:
+            break
+        kept.append((query, answer))
+        used += cost
+    _count("trimmed_turns", len(turns) - len(kept))
+    return kept[::-1]
+
+
+async def _load_from_database(user_id: str, limit: int):
+    keys = ChatHistory.user_turn_keys(user_id, newest_first=True, limit=limit)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            ChatHistory.join_keys(select(ChatHistory.user_query, ChatHistory.assistant_response), keys)
+            .order_by(keys.c.timestamp.desc(), keys.c.id.desc())
+        )).all()
+    return [(row.user_query, row.assistant_response) for row in reversed(rows)]
+
+
+def merge_turns(older, newer):
+    """
+    Append `newer` turns to `older`, skipping the leading ones that
+    `older` already ends with.
+
+    Rows the chat log writer flushes while a history is being loaded, and
+    turns another process rebuilt from the same table, show up in both
+    lists; the longest such overlap is kept once.
+
+    Args:
+        older (list): (user_query, answer) pairs, oldest first.
+        newer (list): (user_query, answer) pairs, oldest first.
+
+    Returns:
+        list: The merged turns, oldest first.
+    """
+    for overlap in range(min(len(older), len(newer)), 0, -1):
+        if older[-overlap:] == newer[:overlap]:
+            return older + newer[overlap:]
+    return older + newer
+
+
+async def _load_history(user_id: str):
+    # Turns still queued in this process's chat log writer are not in the
+    # table yet; read before the table, so a row written in between is in
+    # both and merged once instead of missing from both
+    pending = get_chat_log_writer().pending_turns(user_id)
+    turns = await _load_from_database(user_id, CONVERSATION_MAX_TURNS)
+    return merge_turns(turns, pending)[-CONVERSATION_MAX_TURNS:]
+
+
+async def _store_rebuilt(redis, user_id: str, turns):
+    # Turns appended by other processes since this read began are kept
+    # after the rebuilt ones instead of being overwritten
+    key = _key(user_id)
+    for _ in range(_REBUILD_ATTEMPTS):
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(key)
+                current = [tuple(json.loads(raw)) for raw in await pipe.lrange(key, 0, -1)]
+                merged = merge_turns(turns, current)[-CONVERSATION_MAX_TURNS:]
+                pipe.multi()
+                pipe.delete(key)
+                if merged:
+                    pipe.rpush(key, *[json.dumps(turn) for turn in merged])
+                pipe.expire(key, CONVERSATION_TTL)
+                await pipe.execute()
+                return merged
+        except WatchError:
+            continue
+    logging.warning(f"[{user_id}] Conversation changed during every rebuild attempt; kept as is")
+    return turns
+
+
+def _touch(pipe, user_id: str, now: float):
+    # Marks the user as recently active, drops idle users from the LRU
+    # index and reads its size for `_evict_overflow`
+    pipe.zadd(LRU_KEY, {user_id: now})
+    pipe.expire(_key(user_id), CONVERSATION_TTL)
+    pipe.zremrangebyscore(LRU_KEY, "-inf", now - CONVERSATION_TTL)
+    pipe.zcard(LRU_KEY)
+
+
+async def _evict_overflow(redis, size: int):
+    overflow = size - CONVERSATION_MAX_USERS
+    if overflow <= 0:
+        return
+    evicted = await redis.zpopmin(LRU_KEY, overflow)
+    if evicted:
+        await redis.delete(*[_key(user.decode()) for user, _ in evicted])
+        _count("evictions", len(evicted))
+
+
+async def get_recent_turns(user_id: str, token_budget: int = CONVERSATION_TOKEN_BUDGET):
+    """
+    Return the user's most recent turns that fit `token_budget`, oldest first.
+
+    Turns are read from Redis. A user who is not there (new, idle past
+    CONVERSATION_TTL or evicted) is rebuilt from the chat history table plus
+    the turns still queued in the chat log writer, and written back, so
+    every API process sees the same conversation.
+    """
+    redis = get_async_redis()
+    now = time.time()
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.zscore(LRU_KEY, user_id)
+        pipe.lrange(_key(user_id), 0, -1)
+        _touch(pipe, user_id, now)
+        score, raw_turns, *_, size = await pipe.execute()
+    except RedisError as e:
+        logging.warning(f"[{user_id}] Conversation memory unavailable: {e}")
+        _count("errors")
+        try:
+            turns = await _load_history(user_id)
+        except Exception as e:
+            # Answering without history beats failing the request
+            logging.warning(f"[{user_id}] Could not load conversation history: {e}")
+            _count("errors")
+            return []
+        return fit_token_budget(turns, token_budget)
+
+    if score is not None and score >= now - CONVERSATION_TTL:
+        _count("hits")
+        turns = [tuple(json.loads(raw)) for raw in raw_turns]
+    else:
+        _count("rebuilds")
+        try:
+            turns = await _load_history(user_id)
+        except Exception as e:
+            # Not marked as loaded, so the next read tries again
+            logging.warning(f"[{user_id}] Could not load conversation history: {e}")
+            _count("errors")
+            try:
+                await redis.zrem(LRU_KEY, user_id)
+            except RedisError:
+                pass
+            return []
+        try:
+            turns = await _store_rebuilt(redis, user_id, turns)
+        except RedisError as e:
+            logging.warning(f"[{user_id}] Could not rebuild conversation memory: {e}")
+            _count("errors")
+
+    try:
+        await _evict_overflow(redis, size)
+    except RedisError as e:
+        logging.warning(f"Conversation memory eviction failed: {e}")
+        _count("errors")
+    return fit_token_budget(turns, token_budget)
+
+
+async def append_turn(user_id: str, user_query: str, answer: str):
+    """
+    Add a turn to the user's conversation, keeping the newest
+    CONVERSATION_MAX_TURNS. The chat history table is written separately
+    by the chat log writer.
+    """
+    redis = get_async_redis()
+    try:
+        now = time.time()
+        score = await redis.zscore(LRU_KEY, user_id)
+        if score is None or score < now - CONVERSATION_TTL:
+            # Rebuild first, or the new turn would stand in for the
+            # user's whole history
+            await get_recent_turns(user_id)
+
+        pipe = redis.pipeline(transaction=True)
+        pipe.rpush(_key(user_id), json.dumps((user_query, answer)))
+        pipe.ltrim(_key(user_id), -CONVERSATION_MAX_TURNS, -1)
+        _touch(pipe, user_id, now)
+        *_, size = await pipe.execute()
+        _count("appends")
+        await _evict_overflow(redis, size)
+    except RedisError as e:
+        logging.warning(f"[{user_id}] Could not store conversation turn: {e}")
+        _count("errors")
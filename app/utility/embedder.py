@@ -1,4 +1,8 @@
+import hashlib
 import os
+import unicodedata
+import uuid
+from functools import lru_cache
 
 import chromadb
 from chromadb.errors import NotFoundError
@@ -10,22 +14,23 @@ from langchain_community.document_loaders import (
     Docx2txtLoader
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
-from app.utils import clean_text, batch_generator
+from app.utils import batch_generator
+from app.utility.clause_splitter import ClauseSplitter
+from app.utility.embedding_engine import get_embedding_engine
+from app.utility.text_normalization import normalize_documents
 
 
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2",
-    model_kwargs={
-        "device": "cpu",
-        "trust_remote_code": False
-    },
-    encode_kwargs={
-        "batch_size": 5
-    }
-)
+embedding_model = get_embedding_engine()
+
+CHROMA_WRITE_BATCH_SIZE = 4096
+# "recursive" (500-character chunks with 100 characters of overlap) or
+# "clause" (one chunk per contract clause or sub-clause)
+SPLITTER = os.getenv("SPLITTER", "recursive").lower()
+# Tokens per clause chunk, counted with the embedding model's tokenizer.
+# Capped at what fits the model's 256-token input, beyond which it truncates
+CLAUSE_CHUNK_TOKENS = int(os.getenv("CLAUSE_CHUNK_TOKENS", "256"))
 
 
 LOADER_MAP = {
@@ -47,23 +52,155 @@ def load_and_clean_documents(file_path: str):
     if not loader_cls:
         raise ValueError(f"Unsupported file type: {file_path}")
 
-    docs = loader_cls(file_path).load()
-
-    for doc in docs:
-        doc.page_content = clean_text(doc.page_content)
+    # The clause splitter reads numbering from line starts
+    return normalize_documents(loader_cls(file_path).load(), keep_newlines=SPLITTER == "clause")
 
-    return docs
 
-
-def split_documents(docs, chunk_size=500, chunk_overlap=100):
+def get_splitter(chunk_size=500, chunk_overlap=100):
     """
-    Split documents into chunks using a recursive text splitter.
+    Return the text splitter selected by SPLITTER.
     """
-    splitter = RecursiveCharacterTextSplitter(
+    if SPLITTER == "clause":
+        return ClauseSplitter(
+            chunk_size=min(CLAUSE_CHUNK_TOKENS, embedding_model.max_text_tokens),
+            length_function=embedding_model.count_tokens
+        )
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
-    return splitter.split_documents(docs)
+
+
+def split_documents(docs, chunk_size=500, chunk_overlap=100):
+    """
+    Split documents into chunks using the splitter selected by SPLITTER.
+    """
+    return get_splitter(chunk_size, chunk_overlap).split_documents(docs)
+
+
+@lru_cache(maxsize=None)
+def get_chroma_client(persist_dir: str):
+    """
+    Return one persistent Chroma client per directory for the worker process.
+    """
+    return chromadb.PersistentClient(path=persist_dir)
+
+
+def get_or_create_collection(user_id: str, persist_dir: str):
+    """
+    Retrieve or create the raw Chroma collection for a given user, for
+    writing pre-computed embeddings.
+    """
+    return get_chroma_client(persist_dir).get_or_create_collection(f"user_{user_id}")
+
+
+def get_collection_if_exists(user_id: str, persist_dir: str):
+    """
+    Return the user's raw Chroma collection for reading, or None if it does
+    not exist yet. Unlike `get_or_create_collection` it never writes.
+    """
+    try:
+        return get_chroma_client(persist_dir).get_collection(f"user_{user_id}")
+    except NotFoundError:
+        return None
+
+
+def add_embedded_chunks(collection, texts, metadatas, embeddings, ids=None):
+    """
+    Add chunks whose embeddings are already computed, in batches of
+    CHROMA_WRITE_BATCH_SIZE (below the Chroma client's per-call limit).
+
+    Returns:
+        list: The ids the chunks were stored under.
+    """
+    ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+    # Chroma rejects empty metadata dicts
+    metadatas = [metadata or None for metadata in metadatas]
+
+    for start in range(0, len(texts), CHROMA_WRITE_BATCH_SIZE):
+        end = start + CHROMA_WRITE_BATCH_SIZE
+        collection.add(
+            ids=ids[start:end],
+            embeddings=[list(map(float, vector)) for vector in embeddings[start:end]],
+            documents=list(texts[start:end]),
+            metadatas=metadatas[start:end]
+        )
+    return ids
+
+
+def compute_chunk_id(text: str, source: str) -> str:
+    """
+    Deterministic chunk id: SHA-256 of the source file name and the
+    NFKC-normalized, whitespace-collapsed chunk text. The same chunk of the
+    same file always gets the same id, so re-uploads can be diffed.
+    """
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    payload = f"{os.path.basename(source)}\n{normalized}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def assign_chunk_ids(chunks, file_path: str):
+    """
+    Give every chunk its content-addressed id, recorded as the `chunk_hash`
+    metadata field, and drop chunks repeated within the same document.
+
+    Returns:
+        tuple: (unique chunks, their ids), in document order.
+    """
+    unique_chunks = []
+    ids = []
+    seen = set()
+    for chunk in chunks:
+        source = chunk.metadata.setdefault("source", file_path)
+        chunk_id = compute_chunk_id(chunk.page_content, source)
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        chunk.metadata["chunk_hash"] = chunk_id
+        unique_chunks.append(chunk)
+        ids.append(chunk_id)
+    return unique_chunks, ids
+
+
+def plan_chunk_sync(collection, chunks, ids, source: str) -> dict:
+    """
+    Compare a document's chunk ids with what `collection` already holds.
+
+    Chunks whose id is already stored are skipped. Chunks stored earlier
+    for the same source but absent from this version of the file (edited
+    text, or random ids from before content addressing) are marked for
+    removal. A `collection` of None stands for one that does not exist yet.
+
+    Returns:
+        dict: new_chunks, new_ids, skipped (count) and removed_ids.
+    """
+    if collection is None:
+        return {"new_chunks": list(chunks), "new_ids": list(ids), "skipped": 0, "removed_ids": []}
+
+    existing = set()
+    for start in range(0, len(ids), CHROMA_WRITE_BATCH_SIZE):
+        existing.update(
+            collection.get(ids=ids[start:start + CHROMA_WRITE_BATCH_SIZE], include=[])["ids"]
+        )
+
+    current = set(ids)
+    previous = collection.get(where={"source": source}, include=[])["ids"]
+
+    new_pairs = [(chunk, i) for chunk, i in zip(chunks, ids) if i not in existing]
+    return {
+        "new_chunks": [chunk for chunk, _ in new_pairs],
+        "new_ids": [i for _, i in new_pairs],
+        "skipped": len(ids) - len(new_pairs),
+        "removed_ids": [i for i in previous if i not in current],
+    }
+
+
+def delete_chunks(collection, ids):
+    """
+    Delete chunks by id in batches of CHROMA_WRITE_BATCH_SIZE.
+    """
+    for start in range(0, len(ids), CHROMA_WRITE_BATCH_SIZE):
+        collection.delete(ids=ids[start:start + CHROMA_WRITE_BATCH_SIZE])
 
 
 def get_or_create_vectorstore(user_id: str, persist_dir: str):
@@ -71,7 +208,7 @@ def get_or_create_vectorstore(user_id: str, persist_dir: str):
     Retrieve or create a Chroma vectorstore collection for a given user.
     """
     collection_name = f"user_{user_id}"
-    client = chromadb.PersistentClient(path=persist_dir)
+    client = get_chroma_client(persist_dir)
 
     print(f"[INFO] Checking or creating collection for {collection_name}")
 
@@ -92,10 +229,17 @@ def embed_single_file_into_chroma(
     file_path: str,
     user_id: str,
     persist_dir: str,
-    batch_size: int = 32
+    batch_size: int = 256,
+    progress_callback=None
 ):
     """
     Load, clean, split, embed and store a document into Chroma vectorstore.
+
+    Chunks are stored under content-addressed ids; chunks already in the
+    collection are not embedded again and chunks dropped from a re-uploaded
+    file are removed. `progress_callback(fields)` is called with the page,
+    chunk and batch counts once the file is split, and with
+    `done_batches` after each embedded batch.
     """
     try:
         print(f"[INFO] Loading and cleaning document: {file_path}")
@@ -108,16 +252,45 @@ def embed_single_file_into_chroma(
         vectorstore = get_or_create_vectorstore(user_id, persist_dir)
         print(f"[INFO] Vectorstore for user_{user_id} ready")
 
-        for i, batch in enumerate(batch_generator(chunks, batch_size)):
-            total_batches = (len(chunks) + batch_size - 1) // batch_size
+        chunks, ids = assign_chunk_ids(chunks, file_path)
+        plan = plan_chunk_sync(vectorstore._collection, chunks, ids, file_path)
+        new_chunks, new_ids = plan["new_chunks"], plan["new_ids"]
+        print(
+            f"[INFO] {len(new_chunks)} new, {plan['skipped']} already embedded, "
+            f"{len(plan['removed_ids'])} to remove"
+        )
+
+        total_batches = (len(new_chunks) + batch_size - 1) // batch_size
+        if progress_callback:
+            progress_callback({
+                "state": "embedding",
+                "pages": len(docs),
+                "chunks": len(chunks),
+                "new": len(new_chunks),
+                "skipped": plan["skipped"],
+                "done_batches": 0,
+                "total_batches": total_batches
+            })
+        batches = zip(
+            batch_generator(new_chunks, batch_size),
+            batch_generator(new_ids, batch_size)
+        )
+        for i, (batch, batch_ids) in enumerate(batches):
             print(f"[INFO] Embedding batch {i + 1}/{total_batches}")
-            vectorstore.add_documents(batch)
+            vectorstore.add_documents(batch, ids=batch_ids)
+            if progress_callback:
+                progress_callback({"done_batches": i + 1})
+
+        delete_chunks(vectorstore._collection, plan["removed_ids"])
 
         print("[INFO] Embedding complete, saving to collection")
 
         return {
             "collection_name": f"user_{user_id}",
             "chunks": len(chunks),
+            "new": len(new_chunks),
+            "skipped": plan["skipped"],
+            "removed": len(plan["removed_ids"]),
             "filename": os.path.basename(file_path)
         }
 
@@ -0,0 +1,332 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+# Shared by every process on the host, like the Chroma directory
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", "app/document_embedding/embedding_cache.sqlite3"
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+# Vectors a process stores between two checks of the size cap
+EMBEDDING_CACHE_EVICT_EVERY = int(os.getenv("EMBEDDING_CACHE_EVICT_EVERY", "1000"))
+# Hits whose `last_used` update is held back and written in one statement,
+# and the longest one is held
+EMBEDDING_CACHE_TOUCH_BATCH = int(os.getenv("EMBEDDING_CACHE_TOUCH_BATCH", "256"))
+EMBEDDING_CACHE_TOUCH_INTERVAL = float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL", "60"))
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model_id TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model_id, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache shared across tenants and processes.
+
+    Vectors are stored in SQLite keyed by (model id, SHA-256 of the exact
+    text), so identical chunks from different users' uploads, or text that
+    is already in `legal_index`, are only encoded once. The store is capped
+    at ``max_entries``: every ``evict_every`` stored vectors a process
+    counts the rows and, past the cap, evicts the least recently used
+    tenth, so the store can briefly run over the cap by that many rows per
+    process. Lookups only read; the `last_used` times of hits are collected
+    and written in one batch every ``touch_batch`` hits or
+    ``touch_interval`` seconds. Cache errors are logged and treated as
+    misses, so a broken cache file never blocks embedding.
+
+    Args:
+        path (str): SQLite database file.
+        max_entries (int): Maximum number of cached vectors across models.
+        evict_every (int): Stored vectors between two checks of the cap.
+        touch_batch (int): Hits collected before their `last_used` is written.
+        touch_interval (float): Longest a hit's `last_used` is held back.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        evict_every: int = EMBEDDING_CACHE_EVICT_EVERY,
+        touch_batch: int = EMBEDDING_CACHE_TOUCH_BATCH,
+        touch_interval: float = EMBEDDING_CACHE_TOUCH_INTERVAL
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        # None, so the first store of a process checks the cap
+        self._stored_since_check = None
+        self._touched = {}
+        self._touched_since = None
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, nor with
+        # the worker processes Celery forks after import
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def get_many(self, model_id: str, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached vectors for `texts`.
+
+        Returns:
+            dict: Position in `texts` -> vector, for the texts that were found.
+        """
+        positions = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(text_hash(text), []).append(i)
+
+        found = {}
+        hit_keys = []
+        hashes = list(positions)
+        try:
+            conn = self._connection()
+            for start in range(0, len(hashes), _LOOKUP_BATCH_SIZE):
+                chunk = hashes[start:start + _LOOKUP_BATCH_SIZE]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model_id = ? AND text_hash IN ({marks})",
+                    [model_id, *chunk]
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    for i in positions[key]:
+                        found[i] = vector
+                    hit_keys.append(key)
+        except sqlite3.Error as e:
+            logging.warning(f"Embedding cache lookup failed: {e}")
+            self._count(errors=1, misses=len(texts))
+            return {}
+
+        self._count(hits=len(found), misses=len(texts) - len(found))
+        if hit_keys:
+            self._mark_used(model_id, hit_keys)
+        return found
+
+    def _mark_used(self, model_id: str, keys):
+        now = time.time()
+        with self._pending_lock:
+            for key in keys:
+                self._touched[(model_id, key)] = now
+            if self._touched_since is None:
+                self._touched_since = now
+            due = (
+                len(self._touched) >= self.touch_batch
+                or now - self._touched_since >= self.touch_interval
+            )
+        if due:
+            self.flush_used()
+
+    def flush_used(self):
+        """
+        Write the collected `last_used` times of cache hits.
+        """
+        with self._pending_lock:
+            touched, self._touched = self._touched, {}
+            self._touched_since = None
+        if not touched:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model_id = ? AND text_hash = ?",
+                    [(used, model_id, key) for (model_id, key), used in touched.items()]
+                )
+        except sqlite3.Error as e:
+            # Only the eviction order suffers
+            logging.warning(f"Embedding cache last_used update failed: {e}")
+            self._count(errors=1)
+
+    def put_many(self, model_id: str, texts: List[str], vectors: np.ndarray):
+        """
+        Store vectors for `texts`, evicting old entries past the size cap.
+        """
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            key = text_hash(text)
+            rows[key] = (model_id, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+        with self._pending_lock:
+            stored = (self._stored_since_check or 0) + len(rows)
+            check = self._stored_since_check is None or stored >= self.evict_every
+            self._stored_since_check = 0 if check else stored
+        if check:
+            # Recent hits count before the least recently used are chosen
+            self.flush_used()
+
+        evicted = 0
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows.values()
+                )
+                size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] if check else 0
+                if size > self.max_entries:
+                    # Drop down to 90% of the cap so eviction does not run on every store
+                    evicted = size - int(self.max_entries * 0.9)
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN "
+                        "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (evicted,)
+                    )
+        except sqlite3.Error as e:
+            logging.warning(f"Embedding cache store failed: {e}")
+            self._count(errors=1)
+            return
+
+        self._count(stores=len(rows), evictions=evicted)
+
+    def size(self) -> int:
+        """
+        Return the number of cached vectors, or -1 if the store is unreadable.
+        """
+        try:
+            return self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        except sqlite3.Error:
+            return -1
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss/eviction counters of this process and the store size.
+        """
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+            stores, evictions, errors = self.stores, self.evictions, self.errors
+        with self._pending_lock:
+            pending_touches = len(self._touched)
+        lookups = hits + misses
+        return {
+            "enabled": True,
+            "path": self.path,
+            "size": self.size(),
+            "max_entries": self.max_entries,
+            "evict_every": self.evict_every,
+            "pending_touches": pending_touches,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "stores": stores,
+            "evictions": evictions,
+            "errors": errors,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """
+    Return the process-wide embedding cache, or None when
+    EMBEDDING_CACHE_ENABLED is false.
+    """
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def get_embedding_cache_stats() -> dict:
+    """
+    Return the embedding cache counters, or {"enabled": False}.
+    """
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+def seed_from_collection(collection, model_id: str, page_size: int = 1000) -> int:
+    """
+    Copy the documents and stored vectors of a Chroma collection into the
+    cache, so text that is already embedded there (such as `legal_index`)
+    is never encoded again. The collection must have been embedded with
+    the model `model_id` names.
+
+    Returns:
+        int: The number of vectors copied.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return 0
+
+    copied = 0
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "embeddings"], limit=page_size, offset=offset
+        )
+        if not page["ids"]:
+            break
+        texts = [text for text in page["documents"] if text]
+        vectors = [v for text, v in zip(page["documents"], page["embeddings"]) if text]
+        cache.put_many(model_id, texts, np.asarray(vectors, dtype=np.float32))
+        copied += len(texts)
+        offset += len(page["ids"])
+    return copied
+
+
+if __name__ == "__main__":
+    # python -m app.utility.embedding_cache [collection_name] [persist_dir]
+    import chromadb
+
+    from app.utility.embedding_engine import get_embedding_engine
+
+    name = sys.argv[1] if len(sys.argv) > 1 else "legal_index"
+    persist_dir = sys.argv[2] if len(sys.argv) > 2 else "app/document_embedding/legal_chroma_db"
+    collection = chromadb.PersistentClient(path=persist_dir).get_collection(name)
+    count = seed_from_collection(collection, get_embedding_engine().model_id)
+    print(f"[INFO] Seeded embedding cache with {count} vectors from {name}")
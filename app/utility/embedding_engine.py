@@ -0,0 +1,367 @@
+import os
+import resource
+import sys
+import threading
+import time
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+from app.utility.embedding_cache import get_embedding_cache
+
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# "torch" (sentence-transformers) or "onnx" (ONNX Runtime, int8 by default)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "app/document_embedding/minilm_onnx_int8")
+# 0 keeps the library default (all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Padded tokens per batch when batches are planned by length; 0 falls back
+# to fixed batches of EMBEDDING_BATCH_SIZE in input order
+EMBEDDING_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "8192"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))
+EMBEDDING_MAX_SEQ_LENGTH = 256
+
+
+# ---------------------- Backends ----------------------
+class TorchBackend:
+    """
+    sentence-transformers on PyTorch, the path the project has always used.
+    """
+
+    name = "torch"
+
+    def __init__(self, model_name: str, threads: int):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu", trust_remote_code=False)
+        self.tokenizer = self.model.tokenizer
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime on CPU, reading a model exported with `export_onnx_model`.
+
+    Mean pooling and L2 normalization are applied here, matching the
+    Pooling and Normalize modules of the sentence-transformers model, so
+    vectors stay comparable with collections embedded by the torch backend.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, threads: int):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx requires the onnxruntime package"
+            ) from e
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, "model.onnx")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=EMBEDDING_MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feed = {
+                name: value.astype(np.int64)
+                for name, value in encoded.items()
+                if name in self.input_names
+            }
+            hidden = self.session.run(None, feed)[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            outputs.append(pooled)
+
+        vectors = np.concatenate(outputs).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+
+def export_onnx_model(output_dir: str = EMBEDDING_ONNX_PATH, quantize: bool = True):
+    """
+    Export the embedding model to ONNX and, by default, quantize its weights
+    to int8 for the onnx backend. Needs the `optimum[onnxruntime]` extra.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+
+    model = ORTModelForFeatureExtraction.from_pretrained(EMBEDDING_MODEL_NAME, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME).save_pretrained(output_dir)
+
+    if quantize:
+        quantize_dynamic(
+            os.path.join(output_dir, "model.onnx"),
+            os.path.join(output_dir, "model_quantized.onnx"),
+            weight_type=QuantType.QInt8
+        )
+    print(f"[INFO] Exported {EMBEDDING_MODEL_NAME} to {output_dir}")
+
+
+# ---------------------- Engine ----------------------
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Process-wide embedding engine shared by ingestion and retrieval.
+
+    Implements the LangChain `Embeddings` interface so it can be handed to
+    Chroma directly, and `encode()` for callers that want a normalized
+    numpy matrix. The backend is loaded on the first encode call. Vectors
+    found in the shared embedding cache are not encoded again.
+    """
+
+    def __init__(
+        self,
+        backend: str = EMBEDDING_BACKEND,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        threads: int = EMBEDDING_THREADS,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        token_budget: int = EMBEDDING_TOKEN_BUDGET
+    ):
+        self.backend_name = backend
+        self.model_name = model_name
+        self.threads = threads
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.cache = get_embedding_cache()
+
+        self._backend = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._load_seconds = 0.0
+        self._texts = 0
+        self._calls = 0
+        self._batches = 0
+        self._encode_seconds = 0.0
+
+    @property
+    def model_id(self) -> str:
+        # The int8 ONNX model gives slightly different vectors than torch,
+        # so each backend gets its own cache entries
+        return f"{self.model_name}@{self.backend_name}"
+
+    @property
+    def loaded(self) -> bool:
+        return self._backend is not None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._load_lock:
+                if self._backend is None:
+                    start = time.perf_counter()
+                    if self.backend_name == "onnx":
+                        self._backend = OnnxBackend(EMBEDDING_ONNX_PATH, self.threads)
+                    else:
+                        self._backend = TorchBackend(self.model_name, self.threads)
+                    self._load_seconds = time.perf_counter() - start
+                    print(
+                        f"[INFO] Loaded {self.backend_name} embedding backend "
+                        f"in {self._load_seconds:.2f}s"
+                    )
+        return self._backend
+
+    def encode(self, texts: List[str], batch_size: int = None, use_cache: bool = False) -> np.ndarray:
+        """
+        Encode texts into an (n, dim) float32 matrix of unit vectors, in
+        input order.
+
+        Unless a fixed `batch_size` is given, batches are planned by token
+        length (see `plan_batches`). With `use_cache`, vectors are read from
+        and written to the shared embedding cache; ingestion sets it for
+        document chunks, which recur across uploads and tenants. Queries,
+        query variants and compressor sentences are single-use and would
+        only evict reusable chunk vectors, so they are encoded directly.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.cache is None or not use_cache:
+            return self._encode(texts, batch_size)
+
+        cached = self.cache.get_many(self.model_id, texts)
+        if len(cached) == len(texts):
+            return np.stack([cached[i] for i in range(len(texts))])
+
+        # Repeated texts within the call are encoded once
+        missing = list(dict.fromkeys(text for i, text in enumerate(texts) if i not in cached))
+        encoded = self._encode(missing, batch_size)
+        self.cache.put_many(self.model_id, missing, encoded)
+
+        rows = {text: row for row, text in enumerate(missing)}
+        vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i] = cached[i] if i in cached else encoded[rows[text]]
+        return vectors
+
+    @property
+    def max_text_tokens(self) -> int:
+        """
+        Tokens of text that fit the model's input next to its special tokens.
+        """
+        return EMBEDDING_MAX_SEQ_LENGTH - self.backend.tokenizer.num_special_tokens_to_add()
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Return the number of tokens of `text`, without the special tokens
+        added to every input, so counts of pieces add up to the count of
+        the joined text.
+        """
+        return len(self.backend.tokenizer.tokenize(text))
+
+    def plan_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group text positions into batches of similar token length.
+
+        Texts are sorted by token count, and each batch grows until its
+        padded size (batch length x longest text in it) would exceed
+        `token_budget` tokens, so short headings are batched many at a time
+        instead of being padded to the length of full clauses.
+        """
+        lengths = [
+            len(ids) for ids in self.backend.tokenizer(
+                texts, truncation=True, max_length=EMBEDDING_MAX_SEQ_LENGTH
+            )["input_ids"]
+        ]
+        batches, batch = [], []
+        for i in sorted(range(len(texts)), key=lengths.__getitem__):
+            # Sorted ascending, so the newest text is the longest in the batch
+            if batch and (
+                (len(batch) + 1) * lengths[i] > self.token_budget
+                or len(batch) >= EMBEDDING_MAX_BATCH_SIZE
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _encode(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        backend = self.backend
+        start = time.perf_counter()
+        if batch_size or not self.token_budget or len(texts) == 1:
+            size = batch_size or self.batch_size
+            vectors = backend.encode(texts, size)
+            batches = (len(texts) + size - 1) // size
+        else:
+            plan = self.plan_batches(texts)
+            vectors = None
+            for positions in plan:
+                encoded = backend.encode([texts[i] for i in positions], len(positions))
+                if vectors is None:
+                    vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+                vectors[positions] = encoded
+            batches = len(plan)
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self._texts += len(texts)
+            self._calls += 1
+            self._batches += batches
+            self._encode_seconds += elapsed
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Called by LangChain vector stores while they add document chunks
+        return self.encode(texts, use_cache=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def stats(self) -> dict:
+        """
+        Return encode throughput and process memory use.
+        """
+        with self._stats_lock:
+            texts, calls, seconds = self._texts, self._calls, self._encode_seconds
+            batches = self._batches
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+        return {
+            "backend": self.backend_name,
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "threads": self.threads or "default",
+            "batch_size": self.batch_size,
+            "token_budget": self.token_budget,
+            "load_seconds": round(self._load_seconds, 3),
+            "calls": calls,
+            "batches": batches,
+            "texts_encoded": texts,
+            "encode_seconds": round(seconds, 3),
+            "texts_per_second": round(texts / seconds, 1) if seconds else 0.0,
+            "rss_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(peak_mb, 1),
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """
+    Return the process-wide embedding engine. Creating it is cheap; the
+    model weights are loaded on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
+
+
+if __name__ == "__main__":
+    # python -m app.utility.embedding_engine [output_dir]
+    export_onnx_model(*sys.argv[1:2])
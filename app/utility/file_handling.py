@@ -1,5 +1,4 @@
 import os
-import re
 
 import chromadb
 from chromadb.errors import NotFoundError
@@ -14,16 +13,9 @@ from langchain_community.document_loaders import (
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 
-
-def clean_text(text: str) -> str:
-    """
-    Clean and normalize input text by removing extra symbols and spaces.
-    """
-    text = re.sub(r"[^\w\s.,;:?!-]", "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+from app.utility.embedding_engine import get_embedding_engine
+from app.utility.text_normalization import normalize_text
 
 
 def embed_single_file_into_chroma(
@@ -70,7 +62,7 @@ def embed_single_file_into_chroma(
         raise ValueError(f"No content loaded from: {file_path}")
 
     for doc in docs:
-        doc.page_content = clean_text(doc.page_content)
+        doc.page_content = normalize_text(doc.page_content)
 
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=500,
@@ -83,9 +75,7 @@ def embed_single_file_into_chroma(
 
     print(f"✅ Extracted {len(chunks)} chunks.")
 
-    embedding_model = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+    embedding_model = get_embedding_engine()
 
     client = chromadb.PersistentClient(path=persist_dir)
     collection_name = f"{collection_prefix}{user_id}"
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Must be on storage shared by every worker, like the Chroma directory itself
+INGESTION_STAGING_DIR = os.getenv("INGESTION_STAGING_DIR", "app/document_embedding/staging")
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(INGESTION_STAGING_DIR, job_id)
+
+
+def stage_chunk_batches(job_id: str, chunks, ids, batch_size: int) -> int:
+    """
+    Write a document's chunks and their ids to the staging area in batches,
+    so Celery messages only carry (job_id, batch_index) instead of the text.
+
+    Returns:
+        int: The number of staged batches.
+    """
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    total = 0
+    for index, start in enumerate(range(0, len(chunks), batch_size)):
+        end = start + batch_size
+        batch = [
+            {"id": chunk_id, "page_content": chunk.page_content, "metadata": chunk.metadata}
+            for chunk, chunk_id in zip(chunks[start:end], ids[start:end])
+        ]
+        with open(os.path.join(job_dir, f"batch_{index}.json"), "w", encoding="utf-8") as f:
+            json.dump(batch, f)
+        total = index + 1
+    return total
+
+
+def load_chunk_batch(job_id: str, index: int) -> list:
+    """
+    Read a staged batch as a list of {"id", "page_content", "metadata"} dicts.
+    """
+    with open(os.path.join(_job_dir(job_id), f"batch_{index}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_job_manifest(job_id: str, manifest: dict):
+    """
+    Store job-level data the finalize step needs, such as ids to remove.
+    """
+    os.makedirs(_job_dir(job_id), exist_ok=True)
+    with open(os.path.join(_job_dir(job_id), "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def load_job_manifest(job_id: str) -> dict:
+    """
+    Read the job-level data written by `save_job_manifest`.
+    """
+    with open(os.path.join(_job_dir(job_id), "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_batch_embeddings(job_id: str, index: int, vectors: np.ndarray):
+    """
+    Store the embeddings of a staged batch. The file is written under a
+    temporary name and renamed so a half-written file is never read.
+    """
+    path = os.path.join(_job_dir(job_id), f"batch_{index}.npy")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, vectors.astype(np.float32))
+    os.replace(tmp_path, path)
+
+
+def load_batch_embeddings(job_id: str, index: int) -> np.ndarray:
+    """
+    Read the embeddings of a staged batch.
+    """
+    return np.load(os.path.join(_job_dir(job_id), f"batch_{index}.npy"))
+
+
+def discard_staged_job(job_id: str):
+    """
+    Remove everything staged for a job.
+    """
+    shutil.rmtree(_job_dir(job_id), ignore_errors=True)
@@ -1,5 +1,4 @@
-from app.models import Base
-from app.db import engine
+from app.db import run_migrations
 
-Base.metadata.create_all(bind=engine)
+run_migrations()
 print("Database initialized.")
@@ -1,10 +1,18 @@
-from transformers import pipeline
+import os
+from functools import lru_cache
 
-# Initialize the zero-shot classification pipeline
-classifier = pipeline(
-    "zero-shot-classification",
-    model="facebook/bart-large-mnli"
-)
+import numpy as np
+from dotenv import load_dotenv
+
+from app.utility.embedding_engine import get_embedding_engine
+
+
+load_dotenv()
+
+# "bart" (zero-shot NLI) or "embedding" (MiniLM centroids / linear head)
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "bart").lower()
+INTENT_HEAD_PATH = os.getenv("INTENT_HEAD_PATH")
+INTENT_SOFTMAX_TEMPERATURE = float(os.getenv("INTENT_SOFTMAX_TEMPERATURE", "0.05"))
 
 # Enhanced descriptive labels with clearer intent meaning
 label_mapping = {
@@ -19,19 +27,212 @@ intents = list(label_mapping.keys())
 # Prompt template to guide model
 hypothesis_template = "The user's legal query is best categorized as {}."
 
+# Example queries that, together with the descriptive label, form each
+# intent's centroid for the embedding classifier
+intent_examples = {
+    "DefinitionQuery": [
+        "What is force majeure?",
+        "Define indemnification.",
+        "What does limitation of liability mean?",
+        "Explain the meaning of a non-compete covenant.",
+        "What is a material breach?",
+        "What does governing law mean in a contract?",
+    ],
+    "ClauseRetrieval": [
+        "Find the termination clause in my contract.",
+        "Show me the confidentiality section of the agreement.",
+        "Where does the lease talk about the security deposit?",
+        "Which clause covers payment terms?",
+        "Retrieve the indemnity provision from the NDA.",
+        "What does my contract say about the notice period?",
+    ],
+    "ComparativeAnalysis": [
+        "Compare the liability clauses in these two agreements.",
+        "What is the difference between indemnity and guarantee?",
+        "Contrast the termination rights of both parties.",
+        "How does the arbitration clause differ from the jurisdiction clause?",
+        "Which of these confidentiality provisions is stronger?",
+        "Analyze the pros and cons of the two non-compete clauses.",
+    ],
+}
 
-def classify_intent(text):
-    result = classifier(
-        text,
+intent_names = list(intent_examples.keys())
+
+
+# ---------------------- Zero-shot BART Classifier ----------------------
+@lru_cache(maxsize=1)
+def get_bart_classifier():
+    """
+    Load the zero-shot classification pipeline on first use.
+    """
+    from transformers import pipeline
+
+    return pipeline(
+        "zero-shot-classification",
+        model="facebook/bart-large-mnli"
+    )
+
+
+def classify_intents_bart(texts):
+    """
+    Classify a batch of queries with the bart-large-mnli zero-shot pipeline.
+
+    Returns:
+        list: (intent, confidence) tuples in input order.
+    """
+    results = get_bart_classifier()(
+        list(texts),
         candidate_labels=intents,
         hypothesis_template=hypothesis_template
     )
+    if isinstance(results, dict):
+        results = [results]
+    return [
+        (label_mapping[result["labels"][0]], float(result["scores"][0]))
+        for result in results
+    ]
+
+
+# ---------------------- Embedding Classifier ----------------------
+def _encode(texts) -> np.ndarray:
+    return get_embedding_engine().encode(list(texts))
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+@lru_cache(maxsize=1)
+def get_intent_centroids() -> np.ndarray:
+    """
+    Compute one normalized centroid per intent from its descriptive label
+    and example queries. Rows follow `intent_names`.
+    """
+    descriptions = {intent: label for label, intent in label_mapping.items()}
+    centroids = []
+    for intent in intent_names:
+        vectors = _encode([descriptions[intent]] + intent_examples[intent])
+        centroid = vectors.mean(axis=0)
+        centroids.append(centroid / np.linalg.norm(centroid))
+    return np.stack(centroids)
+
+
+@lru_cache(maxsize=1)
+def get_intent_head():
+    """
+    Load the optional linear head configured by INTENT_HEAD_PATH.
+
+    Returns:
+        tuple: (weights, bias) or None when no head is configured.
+    """
+    if not INTENT_HEAD_PATH:
+        return None
+    data = np.load(INTENT_HEAD_PATH)
+    if list(data["labels"]) != intent_names:
+        raise ValueError(f"Intent head labels {list(data['labels'])} do not match {intent_names}")
+    return data["weights"], data["bias"]
 
-    descriptive_label = result['labels'][0]
-    confidence = result['scores'][0]
 
-    # Map back to original intent name
-    top_intent = label_mapping[descriptive_label]
+def train_intent_head(texts, labels, epochs: int = 300, lr: float = 0.5, l2: float = 1e-3):
+    """
+    Train a softmax-regression head on MiniLM embeddings.
+
+    Args:
+        texts (list[str]): Training queries.
+        labels (list[str]): Intent name for each query.
+        epochs (int): Full-batch gradient descent steps.
+        lr (float): Learning rate.
+        l2 (float): L2 regularization strength.
+
+    Returns:
+        tuple: (weights, bias) with weights shaped (n_intents, dim).
+    """
+    x = _encode(texts)
+    y = np.zeros((len(labels), len(intent_names)), dtype=np.float32)
+    y[np.arange(len(labels)), [intent_names.index(label) for label in labels]] = 1.0
+
+    # Start from the centroids so few examples still give a sensible head
+    weights = get_intent_centroids() / INTENT_SOFTMAX_TEMPERATURE
+    bias = np.zeros(len(intent_names), dtype=np.float32)
+
+    for _ in range(epochs):
+        grad = (_softmax(x @ weights.T + bias) - y) / len(x)
+        weights -= lr * (grad.T @ x + l2 * weights)
+        bias -= lr * grad.sum(axis=0)
+
+    return weights, bias
+
+
+def save_intent_head(path: str, weights: np.ndarray, bias: np.ndarray):
+    """
+    Save a trained head in the format read via INTENT_HEAD_PATH.
+    """
+    np.savez(path, weights=weights, bias=bias, labels=np.array(intent_names))
+
+
+def classify_intents_embedding(texts):
+    """
+    Classify a batch of queries by MiniLM similarity to the intent centroids,
+    or with the trained linear head when one is configured. The whole batch
+    is encoded in one call.
+
+    Returns:
+        list: (intent, confidence) tuples in input order.
+    """
+    vectors = _encode(texts)
+    head = get_intent_head()
+    if head is not None:
+        weights, bias = head
+        probabilities = _softmax(vectors @ weights.T + bias)
+    else:
+        probabilities = _softmax((vectors @ get_intent_centroids().T) / INTENT_SOFTMAX_TEMPERATURE)
+
+    best = probabilities.argmax(axis=1)
+    return [
+        (intent_names[index], float(probabilities[row, index]))
+        for row, index in enumerate(best)
+    ]
+
+
+# ---------------------- Public API ----------------------
+def warm_up_intent_classifier():
+    """
+    Load whatever the configured classifier needs ahead of traffic.
+    """
+    if INTENT_CLASSIFIER == "bart":
+        get_bart_classifier()
+    else:
+        get_intent_centroids()
+        get_intent_head()
+
+
+def intent_classifier_loaded() -> bool:
+    """
+    Return whether the configured classifier is ready to serve.
+    """
+    if INTENT_CLASSIFIER == "bart":
+        return get_bart_classifier.cache_info().currsize > 0
+    return get_intent_centroids.cache_info().currsize > 0
+
+
+def classify_intents(texts):
+    """
+    Classify a batch of queries with the configured classifier.
+
+    Returns:
+        list: (intent, confidence) tuples in input order.
+    """
+    if not texts:
+        return []
+    if INTENT_CLASSIFIER == "bart":
+        return classify_intents_bart(texts)
+    return classify_intents_embedding(texts)
+
+
+def classify_intent(text):
+    top_intent, confidence = classify_intents([text])[0]
 
     print(f"\nUser Input: {text}")
     print(f"Predicted Intent: {top_intent}")
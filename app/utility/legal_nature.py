@@ -1,28 +1,239 @@
+import asyncio
 import os
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
 
 from dotenv import load_dotenv
 from google import generativeai as genai
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Levenshtein
+
+from app.utility.embedding_engine import get_embedding_engine
 
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY_gen_ai_"))
-model = genai.GenerativeModel(model_name="gemini-2.5-flash")
 
+_model = None
 
-def detect_legal_nature(query: str) -> str:
+LEGAL_GATE_ENABLED = os.getenv("LEGAL_GATE_ENABLED", "true").lower() == "true"
+LEGAL_GATE_FUZZY_THRESHOLD = float(os.getenv("LEGAL_GATE_FUZZY_THRESHOLD", "90"))
+# Misspelled legal terms are only corrected for terms and words at least
+# this long, so everyday words ("please", "patient") are not taken for
+# short legal terms ("lease", "patent")
+LEGAL_GATE_FUZZY_MIN_LENGTH = int(os.getenv("LEGAL_GATE_FUZZY_MIN_LENGTH", "7"))
+LEGAL_GATE_LEGAL_SIMILARITY = float(os.getenv("LEGAL_GATE_LEGAL_SIMILARITY", "0.5"))
+LEGAL_GATE_NON_LEGAL_SIMILARITY = float(os.getenv("LEGAL_GATE_NON_LEGAL_SIMILARITY", "0.3"))
+LEGAL_GATE_MARGIN = float(os.getenv("LEGAL_GATE_MARGIN", "0.15"))
+# Ambiguous keywords ("law", "settlement", ...) lower the similarity needed to accept
+LEGAL_GATE_WEAK_KEYWORD_BONUS = float(os.getenv("LEGAL_GATE_WEAK_KEYWORD_BONUS", "0.15"))
+
+legal_keywords = [
+    "law", "legal", "contract", "agreement", "clause", "compliance",
+    "liability", "indemnity", "jurisdiction", "breach", "force majeure",
+    "obligation", "settlement", "statute", "regulation", "remedy",
+    "termination", "dispute", "confidentiality", "arbitration"
+]
+
+# Terms that are legal on their own, whatever the rest of the query says
+strong_legal_terms = [
+    "contract", "clause", "compliance", "liability", "indemnity",
+    "indemnification", "jurisdiction", "force majeure", "statute",
+    "confidentiality", "arbitration", "non-disclosure", "nda", "warranty",
+    "governing law", "lawsuit", "litigation", "plaintiff", "defendant",
+    "tort", "negligence", "copyright", "trademark", "patent", "gdpr",
+    "subpoena", "injunction", "attorney", "lawyer", "legislation",
+    "regulatory", "covenant",
+    "severability", "sublicense", "assignment clause", "terms and conditions",
+    "non-compete", "breach of contract", "intellectual property",
+]
+
+# Keywords that are usually legal but also common in everyday language
+weak_legal_terms = [
+    "law", "legal", "agreement", "breach", "obligation", "settlement",
+    "regulation", "remedy", "termination", "dispute", "rights", "policy",
+    "terms", "penalty", "notice", "consent", "license", "court", "damages",
+    "lease", "tenant", "landlord",
+]
+
+greetings = [
+    "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+    "thanks", "thank you", "greetings", "how are you",
+]
+
+legal_anchors = [
+    "What does this indemnity clause mean?",
+    "Find the termination clause in my contract.",
+    "Compare the limitation of liability provisions in these agreements.",
+    "Is a non-compete enforceable under employment law?",
+    "What are my obligations under the confidentiality agreement?",
+    "Explain the governing law and jurisdiction section.",
+    "What remedies are available for breach of contract?",
+    "Does this policy comply with data protection regulations?",
+    "What is the notice period required to end the lease?",
+    "Define force majeure.",
+]
+
+non_legal_anchors = [
+    "What's the weather like today?",
+    "Give me a recipe for chocolate cake.",
+    "Who won the football match last night?",
+    "Write a poem about the ocean.",
+    "How do I fix a bug in my Python code?",
+    "Recommend a good movie to watch.",
+    "What is the capital of France?",
+    "Explain how photosynthesis works.",
+    "Tell me a joke.",
+    "How many calories are in a banana?",
+]
+
+
+def _phrase_pattern(terms):
+    alternatives = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\b")
+
+
+_strong_pattern = _phrase_pattern(strong_legal_terms)
+_weak_pattern = _phrase_pattern(weak_legal_terms)
+_greeting_pattern = re.compile(
+    rf"^(?:{'|'.join(re.escape(g) for g in greetings)})(?:\s+there)?[\s!.,?]*$"
+)
+_token_pattern = re.compile(r"[a-z][a-z\-]+")
+_fuzzy_terms = [
+    t for t in strong_legal_terms if " " not in t and len(t) >= LEGAL_GATE_FUZZY_MIN_LENGTH
+]
+
+_stats_lock = threading.Lock()
+_gate_stats = defaultdict(lambda: defaultdict(int))
+
+
+def get_model():
     """
-    Uses Gemini model to determine if a query is legal in nature.
+    Configure Gemini and create the legal-check model on first use.
+    """
+    global _model
+    if _model is None:
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY_gen_ai_"))
+        _model = genai.GenerativeModel(model_name="gemini-2.5-flash")
+    return _model
+
+
+def _record(tier: str, decision: str):
+    with _stats_lock:
+        _gate_stats[tier][decision] += 1
+
+
+def get_legal_gate_stats() -> dict:
+    """
+    Return how many queries each tier of the legal-nature gate decided,
+    broken down by decision, plus the thresholds in use.
+    """
+    with _stats_lock:
+        decisions = {tier: dict(counts) for tier, counts in _gate_stats.items()}
+    total = sum(sum(counts.values()) for counts in decisions.values())
+    remote = sum(decisions.get("gemini", {}).values())
+    return {
+        "enabled": LEGAL_GATE_ENABLED,
+        "total": total,
+        "local_rate": round((total - remote) / total, 4) if total else 0.0,
+        "decisions": decisions,
+        "thresholds": {
+            "fuzzy": LEGAL_GATE_FUZZY_THRESHOLD,
+            "fuzzy_min_length": LEGAL_GATE_FUZZY_MIN_LENGTH,
+            "legal_similarity": LEGAL_GATE_LEGAL_SIMILARITY,
+            "non_legal_similarity": LEGAL_GATE_NON_LEGAL_SIMILARITY,
+            "margin": LEGAL_GATE_MARGIN,
+            "weak_keyword_bonus": LEGAL_GATE_WEAK_KEYWORD_BONUS,
+        },
+    }
+
+
+@lru_cache(maxsize=1)
+def _anchor_embeddings():
+    vectors = get_embedding_engine().encode(legal_anchors + non_legal_anchors)
+    return vectors[:len(legal_anchors)], vectors[len(legal_anchors):]
+
+
+def warm_up_legal_gate():
+    """
+    Encode the reference queries of the embedding tier ahead of traffic.
+    """
+    _anchor_embeddings()
+
+
+def _embedding_scores(query: str):
+    legal, non_legal = _anchor_embeddings()
+    vector = get_embedding_engine().encode([query])[0]
+    return float((legal @ vector).max()), float((non_legal @ vector).max())
+
+
+def _is_typo_of(token: str, term: str) -> bool:
+    # One character dropped or added ("indemnty"), or two neighbouring
+    # characters swapped ("liabilty", "contarct"). Substitutions are not
+    # accepted: they mostly produce real words ("contrast", "statues").
+    if abs(len(token) - len(term)) == 1:
+        return Levenshtein.distance(token, term, score_cutoff=1) == 1
+    if len(token) != len(term):
+        return False
+    diffs = [i for i, (a, b) in enumerate(zip(token, term)) if a != b]
+    return (
+        len(diffs) == 2 and diffs[1] == diffs[0] + 1
+        and token[diffs[0]] == term[diffs[1]] and token[diffs[1]] == term[diffs[0]]
+    )
+
+
+def _is_misspelled_legal_term(token: str) -> bool:
+    if len(token) < LEGAL_GATE_FUZZY_MIN_LENGTH:
+        return False
+    return any(_is_typo_of(token, term) for term in _fuzzy_terms)
+
+
+def local_legal_gate(query: str):
+    """
+    Try to settle the legal-nature check locally, without a network call.
+
+    Tiers, cheapest first:
+    1. keyword: exact match of a greeting or an unambiguous legal term.
+    2. fuzzy: long legal terms with one dropped, added or swapped
+       character, or misspelled greetings.
+    3. embedding: MiniLM similarity to legal vs non-legal reference queries.
 
     Returns:
-    - "LEGAL" or "NON-LEGAL"
+        tuple: (decision, tier) where decision is "LEGAL", "NON-LEGAL" or
+        None when the query is ambiguous and should go to Gemini.
     """
-    legal_keywords = [
-        "law", "legal", "contract", "agreement", "clause", "compliance",
-        "liability", "indemnity", "jurisdiction", "breach", "force majeure",
-        "obligation", "settlement", "statute", "regulation", "remedy",
-        "termination", "dispute", "confidentiality", "arbitration"
-    ]
+    text = " ".join(query.lower().split())
+    if not text:
+        return None, None
+
+    if _greeting_pattern.match(text) or _strong_pattern.search(text):
+        return "LEGAL", "keyword"
+
+    if any(_is_misspelled_legal_term(token) for token in _token_pattern.findall(text)):
+        return "LEGAL", "fuzzy"
+    if len(text.split()) <= 3 and process.extractOne(
+        text, greetings, scorer=fuzz.ratio, score_cutoff=LEGAL_GATE_FUZZY_THRESHOLD
+    ):
+        return "LEGAL", "fuzzy"
 
+    legal_score, non_legal_score = _embedding_scores(text)
+    legal_threshold = LEGAL_GATE_LEGAL_SIMILARITY
+    if _weak_pattern.search(text):
+        legal_threshold -= LEGAL_GATE_WEAK_KEYWORD_BONUS
+
+    if legal_score >= legal_threshold and legal_score - non_legal_score >= LEGAL_GATE_MARGIN:
+        return "LEGAL", "embedding"
+    if legal_score <= LEGAL_GATE_NON_LEGAL_SIMILARITY and non_legal_score - legal_score >= LEGAL_GATE_MARGIN:
+        return "NON-LEGAL", "embedding"
+
+    return None, None
+
+
+def build_check_prompt(query: str) -> str:
+    """
+    Build the Gemini prompt that asks whether a query is legal in nature.
+    """
     check_prompt = f"""
     If it is a greeting than consider it legal,
 
@@ -34,7 +245,45 @@ Query: "{query}"
 
 Respond only with one word: LEGAL or NON-LEGAL.
 """
+    return check_prompt
+
+
+def detect_legal_nature(query: str) -> str:
+    """
+    Determine if a query is legal in nature, using the local gate first and
+    Gemini only for ambiguous queries.
+
+    Returns:
+    - "LEGAL" or "NON-LEGAL"
+    """
+    if LEGAL_GATE_ENABLED:
+        decision, tier = local_legal_gate(query)
+        if decision is not None:
+            _record(tier, decision)
+            return decision
+
+    response = get_model().generate_content(build_check_prompt(query))
+    result = response.text.strip().upper()
+    _record("gemini", result)
+    return result
+
+
+async def adetect_legal_nature(query: str) -> str:
+    """
+    Async variant of `detect_legal_nature`. The local gate runs in a worker
+    thread since the embedding tier is CPU-bound; Gemini is called through
+    its async client.
+
+    Returns:
+    - "LEGAL" or "NON-LEGAL"
+    """
+    if LEGAL_GATE_ENABLED:
+        decision, tier = await asyncio.to_thread(local_legal_gate, query)
+        if decision is not None:
+            _record(tier, decision)
+            return decision
 
-    response = model.generate_content(check_prompt)
+    response = await get_model().generate_content_async(build_check_prompt(query))
     result = response.text.strip().upper()
+    _record("gemini", result)
     return result
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import re
+from typing import Any, List, Optional
+
+from langchain.retrievers.multi_query import DEFAULT_QUERY_PROMPT, LineListOutputParser
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+
+_word_pattern = re.compile(r"\w+")
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of whitespace- and case-normalized text, used to spot the same
+    chunk stored under different ids or in different collections.
+    """
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _word_pattern.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def reciprocal_rank_fusion(ranked_lists, weights=None, rrf_k: int = 60):
+    """
+    Merge ranked result lists with weighted reciprocal-rank fusion.
+
+    Args:
+        ranked_lists (list): Lists of (key, item) pairs, best first.
+        weights (list): Optional weight per list (defaults to 1.0).
+        rrf_k (int): Rank offset; larger values flatten the rank bonus.
+
+    Returns:
+        list: (key, item, score) tuples sorted by fused score, with one
+        entry per key.
+    """
+    scores = {}
+    items = {}
+    for list_index, ranked in enumerate(ranked_lists):
+        weight = weights[list_index] if weights else 1.0
+        for rank, (key, item) in enumerate(ranked):
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank + 1)
+            items.setdefault(key, item)
+    return sorted(
+        ((key, items[key], score) for key, score in scores.items()),
+        key=lambda entry: -entry[2]
+    )
+
+
+class BatchedMultiQueryRetriever(BaseRetriever):
+    """
+    Multi-query retriever that searches every collection once per request.
+
+    The LLM writes query variants as in MultiQueryRetriever. The original
+    query and all variants are embedded in one batch and each Chroma
+    collection receives a single multi-embedding query. Results from every
+    (collection, query) list are merged with reciprocal-rank fusion,
+    de-duplicated by content hash and filtered for near-duplicates, so
+    overlapping copies of a chunk never reach the compressor.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstores: List[Any]
+    embeddings: Any
+    llm: Any
+    weights: Optional[List[float]] = None
+    k: int = 5
+    rrf_k: int = 60
+    max_documents: int = 12
+    near_duplicate_threshold: float = 0.9
+
+    def _query_chain(self):
+        return DEFAULT_QUERY_PROMPT | self.llm | LineListOutputParser()
+
+    @staticmethod
+    def _with_original(query: str, variants) -> list:
+        queries = []
+        seen = set()
+        for candidate in [query] + list(variants):
+            candidate = candidate.strip()
+            key = candidate.lower()
+            if candidate and key not in seen:
+                seen.add(key)
+                queries.append(candidate)
+        return queries
+
+    def _search(self, queries) -> List[Document]:
+        # Query variants are single-use, so they bypass the embedding cache
+        vectors = self.embeddings.encode(queries).tolist()
+
+        ranked_lists = []
+        weights = []
+        for index, vectorstore in enumerate(self.vectorstores):
+            result = vectorstore._collection.query(
+                query_embeddings=vectors,
+                n_results=self.k,
+                include=["documents", "metadatas"]
+            )
+            weight = self.weights[index] if self.weights else 1.0
+            for documents, metadatas in zip(result["documents"], result["metadatas"]):
+                ranked_lists.append([
+                    (content_hash(text), Document(page_content=text, metadata=metadata or {}))
+                    for text, metadata in zip(documents, metadatas)
+                    if text
+                ])
+                weights.append(weight)
+
+        selected = []
+        selected_shingles = []
+        for _, document, score in reciprocal_rank_fusion(ranked_lists, weights, self.rrf_k):
+            shingles = _shingles(document.page_content)
+            if any(
+                len(shingles & kept) / len(shingles | kept) >= self.near_duplicate_threshold
+                for kept in selected_shingles
+            ):
+                continue
+            document.metadata = {**document.metadata, "rrf_score": round(score, 6)}
+            selected.append(document)
+            selected_shingles.append(shingles)
+            if len(selected) >= self.max_documents:
+                break
+        return selected
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        variants = self._query_chain().invoke(
+            {"question": query}, config={"callbacks": run_manager.get_child()}
+        )
+        return self._search(self._with_original(query, variants))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        variants = await self._query_chain().ainvoke(
+            {"question": query}, config={"callbacks": run_manager.get_child()}
+        )
+        return await asyncio.to_thread(self._search, self._with_original(query, variants))
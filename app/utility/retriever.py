@@ -1,31 +1,87 @@
+import asyncio
 import os
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
 from typing import Optional, List, Any
 
+import chromadb
 from langchain_chroma import Chroma
 from langchain.retrievers import ContextualCompressionRetriever, MultiQueryRetriever
 from langchain.retrievers.document_compressors import LLMChainExtractor
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.llms.base import LLM
-from groq import Groq
+from groq import Groq, AsyncGroq
+
+from app.utility.collection_versions import get_collection_version
+from app.utility.compressors import EmbeddingSentenceExtractor
+from app.utility.embedding_engine import get_embedding_engine
+from app.utility.multi_query_search import BatchedMultiQueryRetriever
+from app.utility.retriever_pool import RetrieverPool
 
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_KEY_API")
 
+PERSIST_DIR = "app/document_embedding/legal_chroma_db"
+BASE_COLLECTION_NAME = "legal_index"
+
+RETRIEVER_POOL_MAX_SIZE = int(os.getenv("RETRIEVER_POOL_MAX_SIZE", "128"))
+RETRIEVER_POOL_IDLE_TTL = float(os.getenv("RETRIEVER_POOL_IDLE_TTL", "1800"))
+
+# "batched" (one multi-embedding search per collection, fused with RRF) or
+# "ensemble" (MultiQueryRetriever over an EnsembleRetriever)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "batched").lower()
+RETRIEVAL_MAX_DOCUMENTS = int(os.getenv("RETRIEVAL_MAX_DOCUMENTS", "12"))
+
+# "llm" (one Groq call per document) or "local" (batched MiniLM sentence extraction)
+CONTEXT_COMPRESSOR = os.getenv("CONTEXT_COMPRESSOR", "llm").lower()
+LOCAL_COMPRESSOR_MAX_CHARS = int(os.getenv("LOCAL_COMPRESSOR_MAX_CHARS", "4000"))
+LOCAL_COMPRESSOR_MIN_SIMILARITY = float(os.getenv("LOCAL_COMPRESSOR_MIN_SIMILARITY", "0.25"))
+
 
 # ---------------------- Custom LLM Wrapper for Groq ----------------------
+@lru_cache(maxsize=1)
+def get_groq_client() -> Groq:
+    """
+    Return the shared Groq client, created on first use.
+    """
+    return Groq(api_key=GROQ_API_KEY)
+
+
+@lru_cache(maxsize=1)
+def get_async_groq_client() -> AsyncGroq:
+    """
+    Return the shared async Groq client, created on first use.
+    """
+    return AsyncGroq(api_key=GROQ_API_KEY)
+
+
 class GroqLLM(LLM):
     model: str = "llama3-70b-8192"
     temperature: float = 0.7
     max_completion_tokens: int = 1024
-    client: Any = Groq(api_key=GROQ_API_KEY)
+    client: Any = None
+    async_client: Any = None
 
     @property
     def _llm_type(self) -> str:
         return "groq-custom"
 
     def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        response = self.client.chat.completions.create(
+        client = self.client or get_groq_client()
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=self.max_completion_tokens,
+            top_p=1,
+            stream=False,
+            stop=stop,
+        )
+        return response.choices[0].message.content
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        async_client = self.async_client or get_async_groq_client()
+        response = await async_client.chat.completions.create(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
             temperature=self.temperature,
@@ -38,55 +94,154 @@ class GroqLLM(LLM):
 
 
 # ---------------------- Embedding Model ----------------------
-embedding = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+embedding = get_embedding_engine()
 
 
-# ---------------------- Retriever Builder ----------------------
-def build_contextual_compression_retriever(user_id: str, persist_dir: str = "app/document_embedding/legal_chroma_db"):
+# ---------------------- Shared Retrieval Resources ----------------------
+@lru_cache(maxsize=None)
+def get_chroma_client(persist_dir: str = PERSIST_DIR):
     """
-    Combines base and user-specific Chroma collections with multi-query and compression logic.
+    Return one persistent Chroma client per directory for the whole process.
     """
-    base_vectorstore = Chroma(
-        persist_directory=persist_dir,
+    return chromadb.PersistentClient(path=persist_dir)
+
+
+@lru_cache(maxsize=None)
+def get_base_vectorstore(persist_dir: str = PERSIST_DIR):
+    """
+    Return the vectorstore over the shared `legal_index` collection.
+
+    It is identical for every user, so it is opened once and shared by all
+    pooled per-user retrievers.
+    """
+    return Chroma(
+        client=get_chroma_client(persist_dir),
         embedding_function=embedding,
-        collection_name="legal_index"
+        collection_name=BASE_COLLECTION_NAME
+    )
+
+
+@lru_cache(maxsize=None)
+def get_base_retriever(persist_dir: str = PERSIST_DIR):
+    """
+    Return the retriever over the shared `legal_index` collection.
+    """
+    return get_base_vectorstore(persist_dir).as_retriever(search_kwargs={"k": 5})
+
+
+_llm_lock = threading.Lock()
+_shared_llms = {}
+
+
+def get_shared_llm(role: str) -> GroqLLM:
+    """
+    Return the GroqLLM instance used for a pipeline role
+    ("multi_query" or "compressor").
+
+    The wrapper is stateless, so one instance per role is reused across
+    requests instead of constructing new ones per query.
+    """
+    with _llm_lock:
+        if role not in _shared_llms:
+            _shared_llms[role] = GroqLLM()
+        return _shared_llms[role]
+
+
+@lru_cache(maxsize=None)
+def get_compressor(kind: str = CONTEXT_COMPRESSOR):
+    """
+    Return the shared document compressor of the given kind.
+
+    Args:
+        kind (str): "llm" for LLMChainExtractor over Groq,
+            "local" for the embedding sentence extractor.
+    """
+    if kind != "local":
+        return LLMChainExtractor.from_llm(get_shared_llm("compressor"))
+    return EmbeddingSentenceExtractor(
+        embeddings=embedding,
+        max_chars=LOCAL_COMPRESSOR_MAX_CHARS,
+        min_similarity=LOCAL_COMPRESSOR_MIN_SIMILARITY
     )
 
+
+# ---------------------- Retriever Builder ----------------------
+def build_contextual_compression_retriever(user_id: str, persist_dir: str = PERSIST_DIR):
+    """
+    Combines base and user-specific Chroma collections with multi-query and compression logic.
+    """
     user_collection_name = f"user_{user_id}"
     user_vectorstore = Chroma(
-        persist_directory=persist_dir,
+        client=get_chroma_client(persist_dir),
         embedding_function=embedding,
         collection_name=user_collection_name
     )
 
-    from langchain.retrievers import EnsembleRetriever
+    if RETRIEVAL_MODE == "ensemble":
+        from langchain.retrievers import EnsembleRetriever
 
-    base_retriever = base_vectorstore.as_retriever(search_kwargs={"k": 5})
-    user_retriever = user_vectorstore.as_retriever(search_kwargs={"k": 5})
+        base_retriever = get_base_retriever(persist_dir)
+        user_retriever = user_vectorstore.as_retriever(search_kwargs={"k": 5})
 
-    combined_retriever = EnsembleRetriever(
-        retrievers=[base_retriever, user_retriever],
-        weights=[0.5, 0.5]
-    )
-
-    multi_query_retriever = MultiQueryRetriever.from_llm(
-        retriever=combined_retriever,
-        llm=GroqLLM()
-    )
+        combined_retriever = EnsembleRetriever(
+            retrievers=[base_retriever, user_retriever],
+            weights=[0.5, 0.5]
+        )
 
-    compressor = LLMChainExtractor.from_llm(GroqLLM())
+        multi_query_retriever = MultiQueryRetriever.from_llm(
+            retriever=combined_retriever,
+            llm=get_shared_llm("multi_query")
+        )
+    else:
+        multi_query_retriever = BatchedMultiQueryRetriever(
+            vectorstores=[get_base_vectorstore(persist_dir), user_vectorstore],
+            embeddings=embedding,
+            llm=get_shared_llm("multi_query"),
+            weights=[0.5, 0.5],
+            k=5,
+            max_documents=RETRIEVAL_MAX_DOCUMENTS
+        )
 
     return ContextualCompressionRetriever(
-        base_compressor=compressor,
+        base_compressor=get_compressor(CONTEXT_COMPRESSOR),
         base_retriever=multi_query_retriever
     )
 
 
+# ---------------------- Retriever Pool ----------------------
+retriever_pool = RetrieverPool(
+    factory=build_contextual_compression_retriever,
+    version_getter=lambda user_id: get_collection_version(f"user_{user_id}"),
+    max_size=RETRIEVER_POOL_MAX_SIZE,
+    idle_ttl=RETRIEVER_POOL_IDLE_TTL
+)
+
+
+def get_retriever_pool_stats() -> dict:
+    """
+    Return hit/miss/eviction counters of the per-user retriever pool.
+    """
+    return retriever_pool.stats()
+
+
 # ---------------------- Retrieve Compressed Context ----------------------
 def get_compressed_context(user_query: str, user_id: str) -> str:
     """
     Retrieves compressed and relevant chunks from both global and user-specific collections.
     """
-    compression_retriever = build_contextual_compression_retriever(user_id=user_id)
+    compression_retriever = retriever_pool.get(user_id)
     compressed_documents = compression_retriever.invoke(user_query)
     return "\n\n".join([doc.page_content for doc in compressed_documents])
+
+
+async def aget_compressed_context(user_query: str, user_id: str) -> str:
+    """
+    Async variant of `get_compressed_context`.
+
+    The pool lookup (a Redis read and, on a miss, opening the Chroma
+    collection) runs in a worker thread; the Groq calls go through the async
+    client and the per-document compression calls run concurrently.
+    """
+    compression_retriever = await asyncio.to_thread(retriever_pool.get, user_id)
+    compressed_documents = await compression_retriever.ainvoke(user_query)
+    return "\n\n".join([doc.page_content for doc in compressed_documents])
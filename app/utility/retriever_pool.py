@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+@dataclass
+class _PoolEntry:
+    retriever: Any
+    version: Optional[int]
+    last_used: float
+
+
+class RetrieverPool:
+    """
+    Long-lived, bounded pool of per-user retrievers.
+
+    Entries are kept in least-recently-used order. A lookup returns the cached
+    retriever unless its collection version has changed since it was built,
+    in which case it is rebuilt. The pool is capped at ``max_size`` entries
+    and entries idle for longer than ``idle_ttl`` seconds are dropped.
+
+    Args:
+        factory (Callable[[str], Any]): Builds a retriever for a user id.
+        version_getter (Callable[[str], Optional[int]]): Returns the current
+            collection version for a user id. ``None`` means "unknown" and
+            keeps whatever is cached.
+        max_size (int): Maximum number of cached user retrievers.
+        idle_ttl (float): Seconds after which an unused entry is evicted.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        version_getter: Callable[[str], Optional[int]],
+        max_size: int = 128,
+        idle_ttl: float = 1800.0
+    ):
+        self._factory = factory
+        self._version_getter = version_getter
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str):
+        """
+        Return the retriever for a user, building it on a miss.
+        """
+        version = self._version_getter(user_id)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(user_id)
+
+            if entry is not None and (version is None or entry.version == version):
+                entry.last_used = now
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry.retriever
+
+            if entry is not None:
+                del self._entries[user_id]
+                self.invalidations += 1
+            self.misses += 1
+
+        # Build outside the lock so a slow build does not stall other users
+        retriever = self._factory(user_id)
+
+        with self._lock:
+            self._entries[user_id] = _PoolEntry(retriever, version, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return retriever
+
+    def invalidate(self, user_id: str):
+        """
+        Drop the cached retriever for a user, if any.
+        """
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop every cached retriever.
+        """
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss/eviction counters and the current pool size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _evict_idle(self, now: float):
+        # Oldest entries are at the front, so stop at the first fresh one
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.idle_ttl:
+                break
+            del self._entries[user_id]
+            self.evictions += 1
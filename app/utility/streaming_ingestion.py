@@ -0,0 +1,259 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from app.utility.clause_splitter import ClauseSplitter
+from app.utility.embedder import (
+    LOADER_MAP,
+    SPLITTER,
+    add_embedded_chunks,
+    compute_chunk_id,
+    delete_chunks,
+    embedding_model,
+    get_or_create_collection,
+    get_splitter,
+)
+from app.utility.text_normalization import iter_normalized_documents
+
+
+load_dotenv()
+
+# Items (pages or chunk batches) each stage may run ahead of the next one
+STREAMING_QUEUE_SIZE = int(os.getenv("STREAMING_QUEUE_SIZE", "4"))
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageTimings:
+    """
+    Thread-safe per-stage busy time and item counts of a pipeline run.
+    Busy time excludes time spent waiting on the neighbouring queues.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds = {}
+        self._items = {}
+
+    def add(self, stage: str, seconds: float, items: int = 1):
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._items[stage] = self._items.get(stage, 0) + items
+
+    @contextmanager
+    def measure(self, stage: str, items: int = 1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"seconds": round(seconds, 3), "items": self._items[stage]}
+                for stage, seconds in self._seconds.items()
+            }
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _threaded(name: str, source, stop: threading.Event, maxsize: int = STREAMING_QUEUE_SIZE):
+    """
+    Run the iterator `source` in its own thread and yield its items through
+    a bounded queue, so it can work ahead of the consumer by at most
+    `maxsize` items. Exceptions are re-raised in the consumer.
+    """
+    q = queue.Queue(maxsize=maxsize)
+
+    def run():
+        try:
+            for item in source:
+                if not _put(q, item, stop):
+                    return
+        except BaseException as e:
+            _put(q, _Failure(e), stop)
+        finally:
+            _put(q, _DONE, stop)
+
+    threading.Thread(target=run, name=f"ingest-{name}", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+def _parse(file_path: str, timings: StageTimings):
+    ext = os.path.splitext(file_path)[1].lower()
+    loader_cls = LOADER_MAP.get(ext)
+    if not loader_cls:
+        raise ValueError(f"Unsupported file type: {file_path}")
+
+    pages = iter_normalized_documents(
+        loader_cls(file_path).lazy_load(), keep_newlines=SPLITTER == "clause"
+    )
+    while True:
+        with timings.measure("parse"):
+            page = next(pages, None)
+        if page is None:
+            return
+        yield page
+
+
+def _split(pages, file_path: str, batch_size: int, seen: set, timings: StageTimings):
+    waited = 0.0
+
+    def timed_pages():
+        nonlocal waited
+        while True:
+            start = time.perf_counter()
+            page = next(pages, None)
+            waited += time.perf_counter() - start
+            if page is None:
+                return
+            yield page
+
+    splitter = get_splitter()
+    if isinstance(splitter, ClauseSplitter):
+        # Clauses run across page breaks, so pages go through one stream
+        chunks = splitter.split_stream(timed_pages())
+    else:
+        chunks = (chunk for page in timed_pages() for chunk in splitter.split_documents([page]))
+
+    batch = []
+    while True:
+        # Split time is the time spent in next() minus waiting for pages
+        start, waited_before = time.perf_counter(), waited
+        chunk = next(chunks, None)
+        timings.add("split", time.perf_counter() - start - (waited - waited_before), 0)
+        if chunk is None:
+            break
+
+        source = chunk.metadata.setdefault("source", file_path)
+        chunk_id = compute_chunk_id(chunk.page_content, source)
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        chunk.metadata["chunk_hash"] = chunk_id
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            timings.add("split", 0.0, len(batch))
+            yield batch
+            batch = []
+    if batch:
+        timings.add("split", 0.0, len(batch))
+        yield batch
+
+
+def _embed(batches, collection, counts: dict, timings: StageTimings):
+    for batch in batches:
+        with timings.measure("embed", len(batch)):
+            ids = [chunk.metadata["chunk_hash"] for chunk in batch]
+            existing = set(collection.get(ids=ids, include=[])["ids"])
+            new = [chunk for chunk in batch if chunk.metadata["chunk_hash"] not in existing]
+            counts["skipped"] += len(batch) - len(new)
+            vectors = (
+                embedding_model.encode([chunk.page_content for chunk in new], use_cache=True)
+                if new else None
+            )
+        if new:
+            yield new, vectors
+
+
+def stream_file_into_chroma(
+    file_path: str,
+    user_id: str,
+    persist_dir: str,
+    batch_size: int = 64,
+    progress_callback=None
+):
+    """
+    Embed a document into the user's collection as a pipeline of threads
+    connected by bounded queues: parse (page by page via `lazy_load`) and
+    clean, split, embed, store.
+
+    Stages overlap, and at most a few pages and chunk batches are held in
+    memory at once whatever the document size; only the chunk ids seen so
+    far are kept for the whole run. Chunk ids, skipping and removal of
+    stale chunks follow `embed_single_file_into_chroma`. Chunks are written
+    as they are embedded, so a failure part-way leaves the earlier batches
+    stored and the previous version of the file untouched.
+
+    `progress_callback(counts)` is called after each stored batch.
+
+    Returns:
+        dict: Chunk counts and per-stage timings (`stage_seconds`).
+    """
+    collection = get_or_create_collection(user_id, persist_dir)
+    timings = StageTimings()
+    counts = {"pages": 0, "chunks": 0, "new": 0, "skipped": 0}
+    seen = set()
+    stop = threading.Event()
+    start = time.perf_counter()
+
+    def counted(pages):
+        for page in pages:
+            counts["pages"] += 1
+            yield page
+
+    try:
+        pages = _threaded("parse", _parse(file_path, timings), stop)
+        batches = _threaded(
+            "split", _split(counted(pages), file_path, batch_size, seen, timings), stop
+        )
+        embedded = _threaded("embed", _embed(batches, collection, counts, timings), stop)
+
+        for chunks, vectors in embedded:
+            with timings.measure("store", len(chunks)):
+                add_embedded_chunks(
+                    collection,
+                    texts=[chunk.page_content for chunk in chunks],
+                    metadatas=[chunk.metadata for chunk in chunks],
+                    embeddings=vectors,
+                    ids=[chunk.metadata["chunk_hash"] for chunk in chunks]
+                )
+            counts["new"] += len(chunks)
+            counts["chunks"] = len(seen)
+            if progress_callback:
+                progress_callback(dict(counts))
+    finally:
+        stop.set()
+
+    counts["chunks"] = len(seen)
+    if not counts["chunks"]:
+        raise ValueError(f"No usable chunks created from: {file_path}")
+
+    # Chunks stored for an earlier version of this file and not seen now
+    previous = collection.get(where={"source": file_path}, include=[])["ids"]
+    removed_ids = [chunk_id for chunk_id in previous if chunk_id not in seen]
+    with timings.measure("store", len(removed_ids)):
+        delete_chunks(collection, removed_ids)
+
+    return {
+        "collection_name": f"user_{user_id}",
+        **counts,
+        "removed": len(removed_ids),
+        "filename": os.path.basename(file_path),
+        "total_seconds": round(time.perf_counter() - start, 3),
+        "stage_seconds": timings.as_dict(),
+    }
@@ -0,0 +1,73 @@
+import re
+from typing import Iterable, Iterator, List
+
+
+# Word characters, whitespace, punctuation and the symbols legal text
+# relies on: section and paragraph signs, list markers such as "(a)" or
+# "[1]", percentages, amounts, quotes and "and/or"
+_ALLOWED = r"\w\s.,;:?!\-§¶()\[\]%$€£'\"/&"
+_DISALLOWED = re.compile(rf"[^{_ALLOWED}]+")
+
+# Typographic variants PDFs and Word documents use for allowed characters,
+# plus no-break spaces and soft hyphens
+_REPLACEMENTS = (
+    ("“", '"'), ("”", '"'), ("‘", "'"), ("’", "'"),
+    ("–", "-"), ("—", "-"), ("\u00a0", " "), ("\u00ad", ""),
+)
+
+
+def normalize_text(text: str, keep_newlines: bool = False) -> str:
+    """
+    Normalize extracted document text for chunking and embedding.
+
+    Typographic quotes and dashes are mapped to their ASCII forms, every
+    character outside word characters, basic punctuation and legal symbols
+    (§ ¶ ( ) [ ] % $ € £ quotes / &) is removed with one precompiled
+    regex, and whitespace runs are collapsed to single spaces.
+
+    Args:
+        text (str): Raw page or document text.
+        keep_newlines (bool): Keep one line break between non-empty lines,
+            for splitters that read document structure from line starts.
+
+    Returns:
+        str: The normalized text.
+    """
+    for variant, replacement in _REPLACEMENTS:
+        # `in` is a fast scan; most pages have none of these
+        if variant in text:
+            text = text.replace(variant, replacement)
+    text = _DISALLOWED.sub("", text)
+    if keep_newlines:
+        lines = (" ".join(line.split()) for line in text.splitlines())
+        return "\n".join(line for line in lines if line)
+    return " ".join(text.split())
+
+
+def normalize_texts(texts: Iterable[str], keep_newlines: bool = False) -> List[str]:
+    """
+    Normalize a batch of texts.
+    """
+    return [normalize_text(text, keep_newlines) for text in texts]
+
+
+def normalize_documents(docs, keep_newlines: bool = False):
+    """
+    Normalize the `page_content` of LangChain documents in place.
+
+    Returns:
+        list: The same documents.
+    """
+    for doc in docs:
+        doc.page_content = normalize_text(doc.page_content, keep_newlines)
+    return docs
+
+
+def iter_normalized_documents(docs: Iterable, keep_newlines: bool = False) -> Iterator:
+    """
+    Normalize documents one at a time as they are yielded, for lazy loaders
+    and the streaming ingestion pipeline.
+    """
+    for doc in docs:
+        doc.page_content = normalize_text(doc.page_content, keep_newlines)
+        yield doc
@@ -0,0 +1,56 @@
+import hashlib
+import logging
+
+from redis.exceptions import RedisError
+
+from app.celery.progress import get_progress, PROGRESS_TTL
+from app.redis_client import get_redis
+
+
+UPLOAD_HASH_KEY_PREFIX = "upload_hash:"
+
+
+def _key(user_id: str, filename: str) -> str:
+    # One entry per source document. The file name is hashed, so no other
+    # user id and file name pair can produce the same key
+    name_hash = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+    return f"{UPLOAD_HASH_KEY_PREFIX}{user_id}:{name_hash}"
+
+
+def find_duplicate_upload(user_id: str, filename: str, sha256: str):
+    """
+    Return the id of the task that ingested this exact content as the
+    user's current version of `filename`, or None. Uploads whose ingestion
+    failed do not count, and neither do versions replaced by a later
+    upload of different content under the same name.
+    """
+    try:
+        stored_sha256, task_id = get_redis().hmget(
+            _key(user_id, filename), ["sha256", "task_id"]
+        )
+    except RedisError as e:
+        logging.warning(f"Could not check upload hash for user {user_id}: {e}")
+        return None
+    if task_id is None or stored_sha256 is None or stored_sha256.decode() != sha256:
+        return None
+
+    task_id = task_id.decode()
+    if (get_progress(task_id) or {}).get("state") == "failed":
+        return None
+    return task_id
+
+
+def record_upload(user_id: str, filename: str, sha256: str, task_id: str):
+    """
+    Remember which content of `filename` was ingested last and by which
+    task, for as long as its progress record is kept. Replaces the entry
+    of the previous version.
+    """
+    key = _key(user_id, filename)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping={"sha256": sha256, "task_id": task_id})
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except RedisError as e:
+        logging.warning(f"Could not record upload hash for user {user_id}: {e}")
@@ -1,12 +1,12 @@
-import re
+from app.utility.text_normalization import normalize_text
 
 
 def clean_text(text: str) -> str:
     """
     Cleans the input text by removing unwanted characters and extra spaces.
 
-    Removes all characters except word characters, spaces, and basic punctuation
-    (.,;:?!-). Also collapses multiple spaces into a single space and strips leading/trailing whitespace.
+    Kept for existing callers; see `app.utility.text_normalization.normalize_text`
+    for which characters are kept.
 
     Args:
         text (str): The input text to clean.
@@ -14,9 +14,7 @@ def clean_text(text: str) -> str:
     Returns:
         str: The cleaned text.
     """
-    text = re.sub(r"[^\w\s.,;:?!-]", "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    return normalize_text(text)
 
 
 def batch_generator(data, batch_size):
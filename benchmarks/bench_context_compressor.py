@@ -0,0 +1,107 @@
+"""
+Compare the local embedding sentence extractor with LLMChainExtractor on the
+documents the multi-query retriever returns for a set of queries: latency,
+compressed context size and how much of the LLM extract the local one keeps.
+
+Usage:
+    python -m benchmarks.bench_context_compressor --user-id <id> [--queries queries.txt]
+
+Requires GROQ_KEY_API (for query expansion and the LLM extractor) and the
+Chroma store under app/document_embedding/legal_chroma_db.
+"""
+import argparse
+import re
+import statistics
+import time
+
+from langchain.retrievers import EnsembleRetriever, MultiQueryRetriever
+from langchain_chroma import Chroma
+
+from app.utility.retriever import (
+    get_base_retriever,
+    get_chroma_client,
+    get_compressor,
+    get_shared_llm,
+    embedding,
+    PERSIST_DIR,
+)
+
+
+SAMPLE_QUERIES = [
+    "What is force majeure?",
+    "What does the indemnification clause cover?",
+    "When can either party terminate the agreement?",
+    "Compare limitation of liability and indemnity.",
+    "What are the confidentiality obligations?",
+]
+
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _build_retriever(user_id):
+    user_retriever = Chroma(
+        client=get_chroma_client(PERSIST_DIR),
+        embedding_function=embedding,
+        collection_name=f"user_{user_id}"
+    ).as_retriever(search_kwargs={"k": 5})
+    return MultiQueryRetriever.from_llm(
+        retriever=EnsembleRetriever(
+            retrievers=[get_base_retriever(PERSIST_DIR), user_retriever],
+            weights=[0.5, 0.5]
+        ),
+        llm=get_shared_llm("multi_query")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--queries", help="File with one query per line")
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = SAMPLE_QUERIES
+
+    retriever = _build_retriever(args.user_id)
+    compressors = {"local": get_compressor("local"), "llm": get_compressor("llm")}
+    timings = {name: [] for name in compressors}
+    sizes = {name: [] for name in compressors}
+    recalls = []
+
+    for query in queries:
+        documents = retriever.invoke(query)
+        outputs = {}
+        for name, compressor in compressors.items():
+            start = time.perf_counter()
+            compressed = compressor.compress_documents(documents, query)
+            timings[name].append(time.perf_counter() - start)
+            outputs[name] = " ".join(doc.page_content for doc in compressed)
+            sizes[name].append(len(outputs[name]))
+
+        llm_words = _words(outputs["llm"])
+        if llm_words:
+            recalls.append(len(llm_words & _words(outputs["local"])) / len(llm_words))
+        print(
+            f"{query[:50]:<50} docs={len(documents):3d}  "
+            f"local={timings['local'][-1] * 1000:8.1f} ms/{sizes['local'][-1]:5d} chars  "
+            f"llm={timings['llm'][-1] * 1000:8.1f} ms/{sizes['llm'][-1]:5d} chars"
+        )
+
+    print()
+    for name in compressors:
+        print(
+            f"{name:<6} mean={statistics.mean(timings[name]) * 1000:8.1f} ms  "
+            f"max={max(timings[name]) * 1000:8.1f} ms  "
+            f"mean context={statistics.mean(sizes[name]):7.0f} chars"
+        )
+    if recalls:
+        print(f"Word recall of LLM extract in local extract: {statistics.mean(recalls):.1%}")
+
+
+if __name__ == "__main__":
+    main()
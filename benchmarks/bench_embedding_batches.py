@@ -0,0 +1,68 @@
+"""
+Compare embedding throughput (chunks per second) of fixed-size batches in
+document order with the engine's length-bucketed, token-budget batches.
+
+The corpus is the chunks of the given files, split the way ingestion splits
+them, or the generated contract corpus in benchmarks/contract_corpus.py
+when no files are given.
+
+Usage:
+    python -m benchmarks.bench_embedding_batches [--files a.pdf b.docx] [--repeat 3]
+"""
+import argparse
+import statistics
+import time
+
+from app.utility.embedder import load_and_clean_documents, split_documents
+from app.utility.embedding_engine import EMBEDDING_TOKEN_BUDGET, EmbeddingEngine
+from benchmarks.contract_corpus import generate_contracts
+
+
+def _run(engine, chunks, group_size, batch_size=None):
+    # Ingestion hands the engine `group_size` chunks at a time, in document order
+    start = time.perf_counter()
+    for i in range(0, len(chunks), group_size):
+        engine.encode(chunks[i:i + group_size], batch_size=batch_size)
+    return len(chunks) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", nargs="*", help="Documents to split into the corpus")
+    parser.add_argument("--contracts", type=int, default=40, help="Generated contracts if no files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        docs = [doc for path in args.files for doc in load_and_clean_documents(path)]
+    else:
+        docs, _ = generate_contracts(args.contracts)
+    chunks = [chunk.page_content for chunk in split_documents(docs)]
+
+    engine = EmbeddingEngine(token_budget=EMBEDDING_TOKEN_BUDGET or 8192)
+    # Measure the model, not the embedding cache
+    engine.cache = None
+    engine.encode(chunks[:8])
+
+    lengths = sorted(len(chunk) for chunk in chunks)
+    print(
+        f"{len(chunks)} chunks, chars min/median/max = "
+        f"{lengths[0]}/{lengths[len(lengths) // 2]}/{lengths[-1]}, backend={engine.backend_name}"
+    )
+
+    configs = [
+        ("fixed batch 5, groups of 32 (original)", 32, 5),
+        ("fixed batch 32, groups of 32", 32, 32),
+        (f"token budget {engine.token_budget}, groups of 32", 32, None),
+        (f"token budget {engine.token_budget}, groups of 256", 256, None),
+    ]
+    baseline = None
+    for name, group_size, batch_size in configs:
+        rates = [_run(engine, chunks, group_size, batch_size) for _ in range(args.repeat)]
+        rate = statistics.median(rates)
+        baseline = baseline or rate
+        print(f"{name:<42} {rate:8.1f} chunks/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the MiniLM embedding intent classifier with the bart-large-mnli
+zero-shot pipeline: per-query latency, batched throughput and agreement.
+
+Usage:
+    python -m benchmarks.bench_intent_classifier [--queries queries.txt] [--repeat 3]
+
+`queries.txt` holds one query per line; a built-in sample is used otherwise.
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from app.utility.intent_classification import (
+    classify_intents_bart,
+    classify_intents_embedding,
+    get_bart_classifier,
+    get_intent_centroids,
+)
+
+
+SAMPLE_QUERIES = [
+    "What is an indemnity clause?",
+    "Define consequential damages.",
+    "What does 'time is of the essence' mean?",
+    "Explain the term liquidated damages.",
+    "What is a waiver of subrogation?",
+    "Find the governing law clause in my agreement.",
+    "Where is the termination for convenience provision?",
+    "Show me the payment terms in the contract I uploaded.",
+    "Which section covers data protection obligations?",
+    "Locate the assignment clause.",
+    "Compare the warranty clauses of the two supplier contracts.",
+    "How do the confidentiality terms differ between the NDA and the MSA?",
+    "Contrast the limitation of liability caps in both agreements.",
+    "Is arbitration or litigation better for resolving this dispute?",
+    "Analyze the differences between the two force majeure clauses.",
+    "What are my obligations under the non-compete?",
+    "Does the lease allow subletting?",
+    "What notice do I need to give to terminate?",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _bench_single(name, classify, queries, repeat):
+    latencies = []
+    predictions = []
+    for _ in range(repeat):
+        predictions = []
+        for query in queries:
+            start = time.perf_counter()
+            predictions.append(classify([query])[0])
+            latencies.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{name:<10} single  mean={statistics.mean(latencies):8.2f} ms  "
+        f"p50={_percentile(latencies, 50):8.2f} ms  p95={_percentile(latencies, 95):8.2f} ms"
+    )
+    return predictions
+
+
+def _bench_batch(name, classify, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        classify(queries)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} batch   {len(queries) * repeat / elapsed:8.1f} queries/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = SAMPLE_QUERIES
+
+    # Load both models up front so load time is not counted as latency
+    start = time.perf_counter()
+    get_intent_centroids()
+    print(f"embedding  warm-up {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    get_bart_classifier()
+    print(f"bart       warm-up {time.perf_counter() - start:.2f} s")
+
+    embedding_predictions = _bench_single("embedding", classify_intents_embedding, queries, args.repeat)
+    bart_predictions = _bench_single("bart", classify_intents_bart, queries, args.repeat)
+    _bench_batch("embedding", classify_intents_embedding, queries, args.repeat)
+    _bench_batch("bart", classify_intents_bart, queries, args.repeat)
+
+    agreements = sum(
+        e[0] == b[0] for e, b in zip(embedding_predictions, bart_predictions)
+    )
+    print(f"\nAgreement with BART: {agreements}/{len(queries)} ({agreements / len(queries):.1%})")
+
+    disagreements = Counter(
+        (b[0], e[0]) for e, b in zip(embedding_predictions, bart_predictions) if e[0] != b[0]
+    )
+    for (bart_intent, embedding_intent), count in disagreements.most_common():
+        print(f"  bart={bart_intent:<20} embedding={embedding_intent:<20} x{count}")
+
+
+if __name__ == "__main__":
+    main()
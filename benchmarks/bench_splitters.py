@@ -0,0 +1,116 @@
+"""
+Compare the recursive and clause-aware splitters: index size (chunks and
+embedded characters relative to the source), split and embedding time, and
+retrieval hit rate.
+
+A question is a hit when one of the top-k chunks retrieved for it contains
+the whole expected sentence, i.e. the answer was not cut across chunks.
+Questions come from the generated contract corpus, or from a JSONL file of
+{"query", "expected"} objects when --files is given.
+
+Usage:
+    python -m benchmarks.bench_splitters [--files a.pdf] [--questions q.jsonl] [--k 4]
+"""
+import argparse
+import copy
+import json
+import time
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.utility.clause_splitter import ClauseSplitter
+from app.utility.embedder import CLAUSE_CHUNK_TOKENS, LOADER_MAP, embedding_model
+from app.utility.embedding_engine import EmbeddingEngine
+from app.utility.text_normalization import normalize_documents, normalize_text
+from benchmarks.contract_corpus import generate_contracts
+
+
+SPLITTERS = {
+    "recursive": lambda: RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100),
+    "clause": lambda: ClauseSplitter(
+        chunk_size=min(CLAUSE_CHUNK_TOKENS, embedding_model.max_text_tokens),
+        length_function=embedding_model.count_tokens
+    ),
+}
+
+
+def _load(paths):
+    docs = []
+    for path in paths:
+        loader_cls = LOADER_MAP[path[path.rfind("."):].lower()]
+        docs.extend(loader_cls(path).load())
+    return docs
+
+
+def _evaluate(name, raw_docs, questions, engine, k):
+    # Each splitter gets the normalization ingestion would use with it
+    docs = normalize_documents(copy.deepcopy(raw_docs), keep_newlines=name == "clause")
+    source_chars = sum(len(normalize_text(doc.page_content)) for doc in raw_docs)
+
+    start = time.perf_counter()
+    chunks = SPLITTERS[name]().split_documents(docs)
+    split_seconds = time.perf_counter() - start
+
+    texts = [chunk.page_content for chunk in chunks]
+    start = time.perf_counter()
+    vectors = engine.encode(texts)
+    embed_seconds = time.perf_counter() - start
+
+    hits = 0
+    if questions:
+        scores = engine.encode([query for query, _ in questions]) @ vectors.T
+        for (_, expected), row in zip(questions, scores):
+            top = np.argsort(-row)[:k]
+            expected = normalize_text(expected)
+            hits += any(expected in texts[i] for i in top)
+
+    embedded_chars = sum(len(text) for text in texts)
+    return {
+        "chunks": len(chunks),
+        "embedded_chars": embedded_chars,
+        "chars_vs_source": embedded_chars / source_chars if source_chars else 0.0,
+        "split_seconds": split_seconds,
+        "embed_seconds": embed_seconds,
+        "hit_rate": hits / len(questions) if questions else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", nargs="*", help="Documents to split")
+    parser.add_argument("--questions", help="JSONL file of {\"query\", \"expected\"} for --files")
+    parser.add_argument("--contracts", type=int, default=40, help="Generated contracts if no files")
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.files:
+        docs = _load(args.files)
+        questions = []
+        if args.questions:
+            with open(args.questions, encoding="utf-8") as f:
+                questions = [
+                    (row["query"], row["expected"]) for row in map(json.loads, f) if row
+                ]
+    else:
+        docs, questions = generate_contracts(args.contracts)
+
+    engine = EmbeddingEngine()
+    # Measure the model, not the embedding cache
+    engine.cache = None
+    engine.encode(["warm up"])
+
+    print(f"{len(docs)} documents, {len(questions)} questions, k={args.k}\n")
+    for name in SPLITTERS:
+        result = _evaluate(name, docs, questions, engine, args.k)
+        hit_rate = f"{result['hit_rate']:.1%}" if result["hit_rate"] is not None else "n/a"
+        print(
+            f"{name:<10} chunks={result['chunks']:6d}  "
+            f"embedded chars={result['embedded_chars']:9d} ({result['chars_vs_source']:.2f}x source)  "
+            f"split={result['split_seconds']:6.2f}s  embed={result['embed_seconds']:7.2f}s  "
+            f"hit@{args.k}={hit_rate}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measure cold import time of the API and worker entry points, each in a
+fresh interpreter, and list the slowest imports.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat 5] [--top 15]
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+TARGETS = ["app.main", "app.celery.worker"]
+
+
+def _time_import(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start
+
+
+def _slowest_imports(module: str, top: int):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), match.group(4)))
+    # Cumulative times include children; report top-level packages only once
+    seen = set()
+    slowest = []
+    for micros, name in sorted(rows, reverse=True):
+        root = name.split(".")[0]
+        if root in seen:
+            continue
+        seen.add(root)
+        slowest.append((micros / 1e6, name))
+        if len(slowest) >= top:
+            break
+    return slowest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in TARGETS:
+        timings = [_time_import(module) for _ in range(args.repeat)]
+        print(
+            f"{module:<20} mean={statistics.mean(timings):6.2f} s  "
+            f"min={min(timings):6.2f} s  max={max(timings):6.2f} s"
+        )
+        for seconds, name in _slowest_imports(module, args.top):
+            print(f"    {seconds:6.2f} s  {name}")
+
+
+if __name__ == "__main__":
+    main()
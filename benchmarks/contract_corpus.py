@@ -0,0 +1,88 @@
+"""
+Generated contract corpus shared by the benchmarks.
+
+Each contract has numbered articles with headings, numbered clauses with
+titles and lettered sub-clauses, one line per clause like extracted PDF
+text. Every contract also has one key sentence per article that names
+the contract's counterparty, with a question about it, so retrieval can be
+scored against a known answer.
+"""
+import random
+
+from langchain_core.documents import Document
+
+
+ARTICLES = [
+    (
+        "TERM AND TERMINATION", "Termination for Convenience",
+        "{party} may terminate this Agreement for convenience upon {days} days' prior written notice to the Supplier.",
+        "How much notice does {party} need to give to terminate for convenience?",
+    ),
+    (
+        "LIMITATION OF LIABILITY", "Liability Cap",
+        "The aggregate liability of the Supplier to {party} shall not exceed {pct}% of the Fees paid in the preceding twelve (12) months.",
+        "What is the Supplier's liability cap towards {party}?",
+    ),
+    (
+        "PAYMENT TERMS", "Invoices",
+        "{party} shall pay each undisputed invoice within {days} days of receipt, and late amounts bear interest at {pct}% per annum.",
+        "When must {party} pay invoices and what interest applies to late payment?",
+    ),
+    (
+        "CONFIDENTIALITY", "Duration",
+        "The confidentiality obligations of {party} under this Article survive for {years} years after termination of this Agreement.",
+        "How long do the confidentiality obligations of {party} last?",
+    ),
+    (
+        "GOVERNING LAW", "Jurisdiction",
+        "This Agreement with {party} is governed by the laws of {law}, and the courts of {law} have exclusive jurisdiction.",
+        "Which law governs the agreement with {party}?",
+    ),
+    (
+        "INDEMNIFICATION", "Third Party Claims",
+        "The Supplier shall indemnify {party} against third party claims alleging infringement of intellectual property rights, up to $ {amount}.",
+        "Does the Supplier indemnify {party} for infringement claims, and up to what amount?",
+    ),
+]
+BOILERPLATE = [
+    "Each party shall comply with all applicable laws in performing its obligations under this Agreement.",
+    "Any notice under this Agreement shall be in writing and delivered by hand, courier or email.",
+    "No failure or delay in exercising any right shall operate as a waiver of that right.",
+    "The headings in this Agreement are for convenience only and do not affect its interpretation.",
+    "This Agreement may be executed in counterparts, each of which is an original.",
+    "Neither party may assign this Agreement without the prior written consent of the other party.",
+    "The Supplier shall maintain adequate insurance with reputable insurers throughout the Term.",
+    "Any amendment to this Agreement must be in writing and signed by both parties.",
+]
+PARTIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell", "Cyberdyne", "Soylent"]
+LAWS = ["England and Wales", "New York", "Delaware", "Ontario", "Singapore", "Ireland"]
+
+
+def generate_contracts(count: int = 40, seed: int = 7):
+    """
+    Return (documents, questions): one Document per contract, and
+    (question, expected sentence) pairs.
+    """
+    rng = random.Random(seed)
+    docs, questions = [], []
+    for n in range(count):
+        party = f"{rng.choice(PARTIES)} {n + 1} Ltd"
+        values = {
+            "party": party,
+            "days": rng.choice([10, 15, 30, 45, 60, 90]),
+            "pct": rng.choice([5, 8, 100, 125, 150, 200]),
+            "years": rng.choice([2, 3, 5, 7]),
+            "law": rng.choice(LAWS),
+            "amount": f"{rng.randint(1, 50) * 10000:,}",
+        }
+        lines = [f"MASTER SERVICES AGREEMENT No. {n + 1}", f"This Agreement is made between the Supplier and {party}."]
+        for a, (heading, title, sentence, question) in enumerate(rng.sample(ARTICLES, len(ARTICLES)), start=1):
+            key = sentence.format(**values)
+            questions.append((question.format(**values), key))
+            lines.append(f"ARTICLE {a}. {heading}")
+            lines.append(f"{a}.1 {title}. {key} " + " ".join(rng.sample(BOILERPLATE, 2)))
+            for letter in "abc"[:rng.randint(1, 3)]:
+                lines.append(f"({letter}) {rng.choice(BOILERPLATE)}")
+            lines.append(f"{a}.2 General. " + " ".join(rng.sample(BOILERPLATE, rng.randint(2, 5))))
+        docs.append(Document(page_content="\n".join(lines), metadata={"source": f"msa_{n + 1}.txt"}))
+    return docs, questions
@@ -0,0 +1,61 @@
+import io
+import os
+import tarfile
+import zipfile
+
+from app.utility.bulk_ingestion import iter_archive_files
+
+
+def _zip(path, entries):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def _tar(path, entries):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in entries.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+def test_same_named_entries_of_two_archives_do_not_overwrite_each_other(tmp_path):
+    first = _zip(tmp_path / "a.zip", {"nda.txt": b"first"})
+    second = _tar(tmp_path / "b.tar.gz", {"nda.txt": b"second"})
+    target = tmp_path / "uploads"
+    target.mkdir()
+
+    entries = [
+        entry
+        for archive in (first, second)
+        for entry in iter_archive_files(archive, str(target), prefix="alice_")
+    ]
+
+    (_, first_path, first_source, _), (_, second_path, second_source, _) = entries
+    assert first_path != second_path
+    assert open(first_path, "rb").read() == b"first"
+    assert open(second_path, "rb").read() == b"second"
+    # Both are kept under the source a single upload of nda.txt would have
+    assert first_source == second_source == os.path.join(str(target), "alice_nda.txt")
+
+
+def test_entries_are_flattened_and_unsupported_ones_skipped(tmp_path):
+    archive = _zip(tmp_path / "a.zip", {
+        "clients/acme/nda.txt": b"text",
+        "../escape.txt": b"text",
+        "notes.exe": b"binary",
+        ".hidden.txt": b"text",
+    })
+
+    entries = list(iter_archive_files(archive, str(tmp_path), prefix="alice_"))
+
+    sources = {entry: source for entry, path, source, _ in entries if path}
+    assert sources == {
+        "clients/acme/nda.txt": os.path.join(str(tmp_path), "alice_clients__acme__nda.txt"),
+        "../escape.txt": os.path.join(str(tmp_path), "alice_escape.txt"),
+    }
+    skipped = {entry for entry, path, _, error in entries if path is None}
+    assert skipped == {"notes.exe", ".hidden.txt"}
@@ -0,0 +1,32 @@
+from datetime import date
+
+import pytest
+
+from app.utility.chat_history_retention import _add_months, _partitions_from, partition_name
+
+
+@pytest.mark.parametrize("month, months, expected", [
+    (date(2026, 1, 1), 0, date(2026, 1, 1)),
+    (date(2026, 1, 1), 1, date(2026, 2, 1)),
+    (date(2026, 11, 1), 2, date(2027, 1, 1)),
+    (date(2026, 12, 1), 1, date(2027, 1, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 3, 1), -14, date(2025, 1, 1)),
+    (date(2026, 6, 1), 24, date(2028, 6, 1)),
+])
+def test_add_months(month, months, expected):
+    assert _add_months(month, months) == expected
+
+
+def test_add_months_returns_first_of_month():
+    assert _add_months(date(2026, 1, 31), 1) == date(2026, 2, 1)
+
+
+def test_partition_name_round_trips():
+    names = [partition_name(date(2026, 1, 1)), partition_name(date(2025, 12, 1))]
+
+    assert names == ["chat_history_y2026m01", "chat_history_y2025m12"]
+    assert _partitions_from(names + ["chat_history_default", "chat_history"]) == {
+        "chat_history_y2026m01": date(2026, 1, 1),
+        "chat_history_y2025m12": date(2025, 12, 1),
+    }
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import DataError, OperationalError
+
+from app.utility import chat_log_writer
+from app.utility.chat_log_writer import DEAD_LETTER_FILE, ChatLogWriter
+
+
+def _rows(*queries):
+    return [
+        {"user_id": "u1", "user_query": q, "assistant_response": "ok", "timestamp": datetime(2026, 1, 1)}
+        for q in queries
+    ]
+
+
+@pytest.fixture
+def written(monkeypatch):
+    rows_written = []
+
+    async def insert_rows(rows):
+        # Postgres rejects NUL characters in text columns
+        if any("\x00" in row["user_query"] for row in rows):
+            raise DataError("INSERT", {}, Exception("invalid byte sequence 0x00"))
+        rows_written.extend(row["user_query"] for row in rows)
+
+    monkeypatch.setattr(chat_log_writer, "_insert_rows", insert_rows)
+    return rows_written
+
+
+def _dead_letters(spill_dir):
+    with open(spill_dir / DEAD_LETTER_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rejected_row_is_isolated_and_dead_lettered(written, tmp_path):
+    writer = ChatLogWriter(spill_dir=str(tmp_path))
+
+    asyncio.run(writer._write(_rows("a", "b", "bad\x00", "c", "d")))
+
+    assert written == ["a", "b", "c", "d"]
+    dead = _dead_letters(tmp_path)
+    assert [row["user_query"] for row in dead] == ["bad\x00"]
+    assert "0x00" in dead[0]["error"]
+    assert writer.stats()["dead_lettered"] == 1
+
+
+def test_connection_errors_are_retried_until_the_timeout(monkeypatch, tmp_path):
+    attempts = []
+
+    async def insert_rows(rows):
+        attempts.append(len(rows))
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(chat_log_writer, "_insert_rows", insert_rows)
+    monkeypatch.setattr(chat_log_writer.asyncio, "sleep", no_sleep)
+    writer = ChatLogWriter(spill_dir=str(tmp_path), retry_timeout=7)
+
+    asyncio.run(writer._write(_rows("a", "b")))
+
+    # Backoff of 2 and 4 seconds fits in 7, the next 8 does not
+    assert attempts == [2, 2, 2]
+    assert [row["user_query"] for row in _dead_letters(tmp_path)] == ["a", "b"]
+
+
+def test_pending_turns_cover_rows_until_they_are_written(written, tmp_path):
+    writer = ChatLogWriter(flush_interval=0)
+
+    async def run():
+        await writer.record("u1", "q1", "a1")
+        await writer.record("u2", "other", "a")
+        await writer.record("u1", "q2", "a2")
+        pending = writer.pending_turns("u1")
+        await writer.stop()
+        return pending
+
+    assert asyncio.run(run()) == [("q1", "a1"), ("q2", "a2")]
+    assert written == ["q1", "other", "q2"]
+    assert writer.pending_turns("u1") == []
+
+
+def test_spill_segments_are_replayed_and_deleted(written, tmp_path):
+    leftover = tmp_path / "chatlog-crashed.jsonl"
+    leftover.write_text(
+        json.dumps({"user_id": "u1", "user_query": "old", "assistant_response": "ok",
+                    "timestamp": "2026-01-01T00:00:00"}) + "\n" + '{"user_id": "u1", "user_q',
+        encoding="utf-8",
+    )
+    writer = ChatLogWriter(flush_interval=0, spill_dir=str(tmp_path))
+
+    async def run():
+        await writer.record("u1", "new", "ok")
+        await writer.stop()
+
+    asyncio.run(run())
+
+    assert written == ["old", "new"]
+    assert writer.stats()["replayed"] == 1
+    assert list(tmp_path.glob("chatlog-*.jsonl")) == []
@@ -0,0 +1,45 @@
+import base64
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column
+from sqlalchemy.sql import visitors
+
+from app.models import ChatHistory
+from app.routes.chatlog import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trips_timestamp_and_id():
+    chat = SimpleNamespace(timestamp=datetime(2026, 3, 1, 12, 30, 5, 123456), id=42)
+
+    cursor = _encode_cursor(chat)
+
+    assert _decode_cursor(cursor) == (chat.timestamp, 42)
+    # Safe to pass as a query parameter unescaped
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'["2026-03-01T12:30:05"]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", 1]').decode(),
+    base64.urlsafe_b64encode(b'["2026-03-01T12:30:05", "x"]').decode(),
+    base64.urlsafe_b64encode(b'{"id": 1}').decode(),
+    "é",
+])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_page_keys_use_only_indexed_columns():
+    keys = ChatHistory.user_turn_keys("alice", after=(datetime(2026, 3, 1), 42), limit=51)
+
+    # Nothing outside the index is referenced, so the scan is index-only
+    columns = {node.name for node in visitors.iterate(keys.element) if isinstance(node, Column)}
+    assert columns == {"user_id", "timestamp", "id"}
+    assert set(keys.c.keys()) == {"timestamp", "id"}
@@ -0,0 +1,81 @@
+from langchain_core.documents import Document
+
+from app.utility.embedder import assign_chunk_ids, compute_chunk_id, plan_chunk_sync
+
+
+class FakeCollection:
+    """
+    Answers the two `get` calls `plan_chunk_sync` makes from a dict of
+    stored id -> metadata.
+    """
+
+    def __init__(self, stored):
+        self.stored = stored
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is not None:
+            return {"ids": [i for i in ids if i in self.stored]}
+        return {"ids": [
+            i for i, metadata in self.stored.items()
+            if all(metadata.get(k) == v for k, v in where.items())
+        ]}
+
+
+def test_chunk_id_ignores_whitespace_and_unicode_form():
+    assert compute_chunk_id("Term  of\nthe lease", "a/lease.pdf") == \
+        compute_chunk_id("Term of the lease", "a/lease.pdf")
+    assert compute_chunk_id("ﬁnal clause", "lease.pdf") == compute_chunk_id("final clause", "lease.pdf")
+
+
+def test_chunk_id_depends_on_file_name_not_directory():
+    assert compute_chunk_id("Term", "uploads/lease.pdf") == compute_chunk_id("Term", "other/lease.pdf")
+    assert compute_chunk_id("Term", "uploads/lease.pdf") != compute_chunk_id("Term", "uploads/nda.pdf")
+    assert compute_chunk_id("Term", "lease.pdf") != compute_chunk_id("Renewal", "lease.pdf")
+
+
+def test_assign_chunk_ids_drops_repeated_chunks():
+    chunks = [Document(page_content=text) for text in ("Term", "Renewal", "Term ")]
+
+    unique, ids = assign_chunk_ids(chunks, "uploads/lease.pdf")
+
+    assert [chunk.page_content for chunk in unique] == ["Term", "Renewal"]
+    assert ids == [compute_chunk_id("Term", "uploads/lease.pdf"), compute_chunk_id("Renewal", "uploads/lease.pdf")]
+    assert unique[0].metadata == {"source": "uploads/lease.pdf", "chunk_hash": ids[0]}
+
+
+def test_plan_skips_stored_chunks_and_removes_stale_ones():
+    source = "uploads/lease.pdf"
+    old, unchanged = compute_chunk_id("Old term", source), compute_chunk_id("Renewal", source)
+    collection = FakeCollection({
+        old: {"source": source},
+        unchanged: {"source": source},
+        "other-file-chunk": {"source": "uploads/nda.pdf"},
+    })
+    chunks, ids = assign_chunk_ids(
+        [Document(page_content="New term"), Document(page_content="Renewal")], source
+    )
+
+    plan = plan_chunk_sync(collection, chunks, ids, source)
+
+    assert [chunk.page_content for chunk in plan["new_chunks"]] == ["New term"]
+    assert plan["new_ids"] == [compute_chunk_id("New term", source)]
+    assert plan["skipped"] == 1
+    assert plan["removed_ids"] == [old]
+
+
+def test_plan_for_unchanged_file_does_nothing():
+    source = "uploads/lease.pdf"
+    chunks, ids = assign_chunk_ids([Document(page_content="Term")], source)
+    collection = FakeCollection({ids[0]: {"source": source}})
+
+    plan = plan_chunk_sync(collection, chunks, ids, source)
+
+    assert plan == {"new_chunks": [], "new_ids": [], "skipped": 1, "removed_ids": []}
+
+
+def test_plan_without_collection_treats_every_chunk_as_new():
+    chunks, ids = assign_chunk_ids([Document(page_content="Term")], "uploads/lease.pdf")
+
+    plan = plan_chunk_sync(None, chunks, ids, "uploads/lease.pdf")
+
+    assert plan == {"new_chunks": chunks, "new_ids": ids, "skipped": 0, "removed_ids": []}
@@ -0,0 +1,32 @@
+from langchain_core.documents import Document
+
+from app.utility.clause_splitter import ClauseSplitter
+
+
+def _words(text):
+    return len(text.split())
+
+
+def test_chunks_are_capped_by_the_length_function():
+    clause = "1. Confidentiality. " + " ".join(f"word{i}" for i in range(100))
+    text = "\n".join([clause, "(a) short sub-clause", "2. Term. Ten years."])
+    splitter = ClauseSplitter(chunk_size=30, min_chars=50, length_function=_words)
+
+    chunks = splitter.split_documents([Document(page_content=text)])
+
+    assert all(_words(chunk.page_content) <= 30 for chunk in chunks)
+    assert {chunk.metadata["clause_number"] for chunk in chunks} == {"1", "1(a)", "2"}
+    # Nothing is lost when the long clause is split
+    assert sum(_words(chunk.page_content) for chunk in chunks) == _words(text)
+
+
+def test_short_sub_clauses_are_merged_while_they_fit():
+    text = "1. Payment. Fees are due monthly.\n(a) in euros\n(b) by transfer"
+    merged = ClauseSplitter(length_function=_words).split_documents([Document(page_content=text)])
+    capped = ClauseSplitter(chunk_size=8, length_function=_words).split_documents([Document(page_content=text)])
+
+    assert [chunk.page_content for chunk in merged] == [text.replace("\n", " ")]
+    # (a) no longer fits after the 6-word clause, but (b) fits after (a)
+    assert [chunk.page_content for chunk in capped] == [
+        "1. Payment. Fees are due monthly.", "(a) in euros (b) by transfer"
+    ]
@@ -0,0 +1,168 @@
+import asyncio
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.utility import conversation_memory
+from app.utility.conversation_memory import LRU_KEY, _key, estimate_tokens, fit_token_budget
+
+
+def _turn(chars):
+    return ("q" * chars, "a" * chars)
+
+
+def test_fit_token_budget_keeps_newest_turns_in_order():
+    turns = [("first", "1"), ("second", "2"), ("third", "3")]
+    cost = estimate_tokens("second") + estimate_tokens("2")
+    budget = cost + estimate_tokens("third") + estimate_tokens("3")
+
+    assert fit_token_budget(turns, budget) == [("second", "2"), ("third", "3")]
+    assert fit_token_budget(turns, 10_000) == turns
+
+
+def test_fit_token_budget_stops_at_first_turn_that_does_not_fit():
+    # An older short turn is not kept once a newer long one was dropped,
+    # so the history never has gaps
+    turns = [_turn(4), _turn(400), _turn(4)]
+    kept = fit_token_budget(turns, 2 * estimate_tokens("q" * 4) + 50)
+
+    assert kept == [_turn(4)]
+
+
+def test_fit_token_budget_empty():
+    assert fit_token_budget([], 100) == []
+    assert fit_token_budget([_turn(400)], 10) == []
+
+
+def test_user_keys_cannot_name_the_lru_index():
+    assert _key("lru") != LRU_KEY
+    assert _key("alice").startswith(conversation_memory.KEY_PREFIX)
+
+
+class _DownRedis:
+    def pipeline(self, transaction=True):
+        raise RedisConnectionError("redis is down")
+
+    async def zrem(self, *args):
+        raise RedisConnectionError("redis is down")
+
+
+def test_history_is_empty_when_redis_and_database_both_fail(monkeypatch):
+    async def database_down(user_id, limit):
+        raise OSError("database is down")
+
+    monkeypatch.setattr(conversation_memory, "get_async_redis", lambda: _DownRedis())
+    monkeypatch.setattr(conversation_memory, "_load_from_database", database_down)
+
+    assert asyncio.run(conversation_memory.get_recent_turns("alice")) == []
+
+
+def test_history_falls_back_to_database_when_redis_fails(monkeypatch):
+    async def database(user_id, limit):
+        return [("q1", "a1"), ("q2", "a2")]
+
+    monkeypatch.setattr(conversation_memory, "get_async_redis", lambda: _DownRedis())
+    monkeypatch.setattr(conversation_memory, "_load_from_database", database)
+
+    assert asyncio.run(conversation_memory.get_recent_turns("alice")) == [("q1", "a1"), ("q2", "a2")]
+
+
+def test_merge_turns_keeps_overlap_once():
+    db = [("q1", "a1"), ("q2", "a2")]
+
+    assert conversation_memory.merge_turns(db, [("q2", "a2"), ("q3", "a3")]) == db + [("q3", "a3")]
+    assert conversation_memory.merge_turns(db, [("q3", "a3")]) == db + [("q3", "a3")]
+    assert conversation_memory.merge_turns(db, db) == db
+    assert conversation_memory.merge_turns([], db) == db
+
+
+class _Pipeline:
+    # Records commands and runs them on `execute`, like a redis pipeline
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+        self.watching = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, key):
+        self.watching = True
+
+    def lrange(self, key, start, end):
+        if not self.watching:
+            self.commands.append(("lrange", (key, start, end)))
+            return None
+
+        # Reads made while watching run immediately
+        async def read():
+            return self.redis.lrange(key, start, end)
+        return read()
+
+    def multi(self):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+        return queue
+
+    async def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
+class _Redis:
+    def __init__(self, lists=None):
+        self.lists = lists or {}
+        self.scores = {}
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    def zscore(self, key, member):
+        return self.scores.get(member)
+
+    def zadd(self, key, mapping):
+        self.scores.update(mapping)
+
+    def zcard(self, key):
+        return len(self.scores)
+
+    def zremrangebyscore(self, key, low, high):
+        pass
+
+    def expire(self, key, seconds):
+        pass
+
+    def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+
+class _Writer:
+    def pending_turns(self, user_id):
+        return [("q2", "a2"), ("q3", "a3")]
+
+
+def test_rebuild_merges_queued_rows_and_turns_appended_meanwhile(monkeypatch):
+    async def database(user_id, limit):
+        return [("q1", "a1"), ("q2", "a2")]
+
+    # Another process appended a turn while this one was loading
+    redis = _Redis({_key("alice"): ['["q4", "a4"]']})
+    monkeypatch.setattr(conversation_memory, "get_async_redis", lambda: redis)
+    monkeypatch.setattr(conversation_memory, "_load_from_database", database)
+    monkeypatch.setattr(conversation_memory, "get_chat_log_writer", lambda: _Writer())
+
+    turns = asyncio.run(conversation_memory.get_recent_turns("alice"))
+
+    expected = [("q1", "a1"), ("q2", "a2"), ("q3", "a3"), ("q4", "a4")]
+    assert turns == expected
+    assert [tuple(conversation_memory.json.loads(raw)) for raw in redis.lists[_key("alice")]] == expected
@@ -0,0 +1,73 @@
+import numpy as np
+
+from app.utility.embedding_cache import EmbeddingCache, text_hash
+from app.utility.embedding_engine import EmbeddingEngine
+
+
+def _vectors(n, dim=4):
+    return np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def _last_used(cache, text):
+    return cache._connection().execute(
+        "SELECT last_used FROM embeddings WHERE text_hash = ?", (text_hash(text),)
+    ).fetchone()[0]
+
+
+def test_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("m", ["a", "b"], _vectors(2))
+
+    found = cache.get_many("m", ["b", "x", "a"])
+
+    assert sorted(found) == [0, 2]
+    np.testing.assert_array_equal(found[2], _vectors(2)[0])
+    assert cache.get_many("other-model", ["a"]) == {}
+
+
+def test_cap_is_checked_every_n_stores(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=5, evict_every=20)
+    texts = [f"t{i}" for i in range(21)]
+
+    # The first store checks; later ones are counted until 20 more arrive
+    cache.put_many("m", texts[:1], _vectors(1))
+    cache.put_many("m", texts[1:9], _vectors(8))
+    assert cache.size() == 9
+
+    cache.put_many("m", texts[9:], _vectors(12))
+    assert cache.size() == 4
+    assert cache.evictions == 17
+
+
+def test_hits_update_last_used_in_batches(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), touch_batch=3, touch_interval=3600)
+    cache.put_many("m", ["a", "b", "c"], _vectors(3))
+    stored = _last_used(cache, "a")
+
+    cache.get_many("m", ["a", "b"])
+    assert _last_used(cache, "a") == stored
+    assert cache.stats()["pending_touches"] == 2
+
+    cache.get_many("m", ["c"])
+    assert _last_used(cache, "a") > stored
+    assert cache.stats()["pending_touches"] == 0
+
+
+def test_only_cached_encodes_touch_the_cache(tmp_path):
+    engine = EmbeddingEngine()
+    engine.cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    encoded = []
+
+    def encode(texts, batch_size):
+        encoded.extend(texts)
+        return _vectors(len(texts))
+
+    engine._encode = encode
+
+    engine.encode(["query", "variant"])
+    assert engine.cache.size() == 0
+
+    engine.encode(["chunk a", "chunk b"], use_cache=True)
+    engine.embed_documents(["chunk a", "chunk c"])
+    assert engine.cache.size() == 3
+    assert encoded == ["query", "variant", "chunk a", "chunk b", "chunk c"]
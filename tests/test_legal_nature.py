@@ -0,0 +1,59 @@
+import pytest
+
+from app.utility import legal_nature
+from app.utility.legal_nature import local_legal_gate
+
+
+@pytest.fixture(autouse=True)
+def ambiguous_embeddings(monkeypatch):
+    # Neither clearly legal nor clearly non-legal, so only the keyword and
+    # fuzzy tiers can decide
+    monkeypatch.setattr(legal_nature, "_embedding_scores", lambda text: (0.4, 0.4))
+
+
+@pytest.mark.parametrize("query", [
+    "What does the indemnity clause say?",
+    "Is this non-compete enforceable?",
+    "Explain force majeure.",
+    "Hello there!",
+])
+def test_keyword_tier_accepts_legal_terms_and_greetings(query):
+    assert local_legal_gate(query) == ("LEGAL", "keyword")
+
+
+@pytest.mark.parametrize("query", [
+    "Explain the indemnty provisions",
+    "Is the arbitraton binding?",
+    "Which jurisdicton applies?",
+    "Read the contarct again",
+    "Check the warrantys",
+])
+def test_fuzzy_tier_accepts_misspelled_legal_terms(query):
+    assert local_legal_gate(query) == ("LEGAL", "fuzzy")
+
+
+@pytest.mark.parametrize("query", [
+    "Please tell me a joke",
+    "How should a nurse talk to a patient?",
+    "What layer of the cake goes first?",
+    "Which basketball court is nearest?",
+    "How much damages did the storm cause?",
+    "Is my landlord nice?",
+    "What is the contrast ratio of this screen?",
+    "We saw old statues in the museum",
+    "The statue in the square",
+])
+def test_everyday_words_are_not_accepted_locally(query):
+    assert local_legal_gate(query) == (None, None)
+
+
+def test_weak_terms_lower_the_embedding_threshold(monkeypatch):
+    threshold = legal_nature.LEGAL_GATE_LEGAL_SIMILARITY - legal_nature.LEGAL_GATE_WEAK_KEYWORD_BONUS
+    monkeypatch.setattr(legal_nature, "_embedding_scores", lambda text: (threshold, 0.0))
+
+    assert local_legal_gate("Can my landlord keep the deposit?") == ("LEGAL", "embedding")
+    assert local_legal_gate("Can my neighbour keep the ladder?") == (None, None)
+
+
+def test_empty_query_is_undecided():
+    assert local_legal_gate("   ") == (None, None)
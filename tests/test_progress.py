@@ -0,0 +1,24 @@
+from app.celery.progress import _decode
+
+
+def _raw(**fields):
+    return {key.encode(): str(value).encode() for key, value in fields.items()}
+
+
+def test_only_counter_fields_are_decoded_as_ints():
+    progress = _decode(_raw(
+        user_id="0042", filename="2024.pdf", **{"file:123.txt": "123"},
+        state="embedding", version=3, done_batches=1, total_batches=4,
+        started_at=100, updated_at=110
+    ))
+
+    assert progress["user_id"] == "0042"
+    assert progress["filename"] == "2024.pdf"
+    assert progress["file:123.txt"] == "123"
+    assert progress["version"] == 3
+    assert progress["percent"] == 25.0
+    assert progress["eta_seconds"] == 30.0
+
+
+def test_empty_record_is_none():
+    assert _decode({}) is None
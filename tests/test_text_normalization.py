@@ -0,0 +1,32 @@
+from langchain_core.documents import Document
+
+from app.utility.text_normalization import iter_normalized_documents, normalize_text, normalize_texts
+
+
+def test_keeps_legal_symbols():
+    text = "See § 4.2(a) and/or [1]: 15% of $1,000 or €900 & “net” amounts."
+    assert normalize_text(text) == 'See § 4.2(a) and/or [1]: 15% of $1,000 or €900 & "net" amounts.'
+
+
+def test_maps_typographic_variants_and_drops_other_symbols():
+    text = "Tenant\u2019s deposit \u2013 refund\u00adable\u00a0in full \u2713 \u2605"
+    assert normalize_text(text) == "Tenant's deposit - refundable in full"
+
+
+def test_collapses_whitespace():
+    assert normalize_text("  Clause 1.\n\n\tTerm  \n") == "Clause 1. Term"
+
+
+def test_keep_newlines_keeps_one_break_between_non_empty_lines():
+    text = "1. Definitions  \n\n\n  2.  Term\n   \n(a) Renewal"
+    assert normalize_text(text, keep_newlines=True) == "1. Definitions\n2. Term\n(a) Renewal"
+
+
+def test_batch_and_streaming_helpers_match_normalize_text():
+    texts = ["A’s  §1", "(b)\n\n 50%"]
+    assert normalize_texts(texts) == [normalize_text(text) for text in texts]
+
+    docs = iter_normalized_documents(
+        (Document(page_content=text) for text in texts), keep_newlines=True
+    )
+    assert [doc.page_content for doc in docs] == ["A's §1", "(b)\n50%"]
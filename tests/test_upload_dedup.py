@@ -0,0 +1,72 @@
+import pytest
+
+from app.utility import upload_dedup
+from app.utility.upload_dedup import _key, find_duplicate_upload, record_upload
+
+
+class FakeRedis:
+    """
+    The few hash commands the dedup module uses, kept in a dict.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hmget(self, key, fields):
+        stored = self.hashes.get(key, {})
+        return [stored.get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(
+            {field: str(value).encode() for field, value in mapping.items()}
+        )
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+@pytest.fixture
+def states(monkeypatch):
+    fake = FakeRedis()
+    task_states = {}
+    monkeypatch.setattr(upload_dedup, "get_redis", lambda: fake)
+    monkeypatch.setattr(
+        upload_dedup, "get_progress",
+        lambda task_id: {"state": task_states[task_id]} if task_id in task_states else None
+    )
+    return task_states
+
+
+def test_identical_reupload_returns_earlier_task(states):
+    record_upload("alice", "lease.pdf", "v1", "task-1")
+    assert find_duplicate_upload("alice", "lease.pdf", "v1") == "task-1"
+
+
+def test_reverting_to_earlier_version_is_not_a_duplicate(states):
+    record_upload("alice", "lease.pdf", "v1", "task-1")
+    record_upload("alice", "lease.pdf", "v2", "task-2")
+
+    assert find_duplicate_upload("alice", "lease.pdf", "v1") is None
+    assert find_duplicate_upload("alice", "lease.pdf", "v2") == "task-2"
+
+
+def test_same_content_under_another_name_is_not_a_duplicate(states):
+    record_upload("alice", "lease.pdf", "v1", "task-1")
+    assert find_duplicate_upload("alice", "lease-copy.pdf", "v1") is None
+    assert find_duplicate_upload("bob", "lease.pdf", "v1") is None
+
+
+def test_failed_ingestion_does_not_count(states):
+    record_upload("alice", "lease.pdf", "v1", "task-1")
+    states["task-1"] = "failed"
+    assert find_duplicate_upload("alice", "lease.pdf", "v1") is None
+
+
+def test_keys_do_not_collide_across_user_and_file_name():
+    assert _key("a:b", "c.pdf") != _key("a", "b:c.pdf")